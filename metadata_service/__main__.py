@@ -17,31 +17,64 @@
 Entrypoint of the metadata_service package.
 """
 
+import asyncio
 from typing import Optional
 import typer
 from ghga_service_chassis_lib.api import run_server
 from metadata_service.config import get_config
 from metadata_service.api import app  # noqa: F401 pylint: disable=unused-import
+from metadata_service.core.indexes import ensure_indexes, index_drift
 
+cli = typer.Typer()
 
+
+@cli.callback(invoke_without_command=True)
 def run(
-    config: Optional[str] = typer.Option(None, help="Path to config yaml.")
+    ctx: typer.Context,
+    config: Optional[str] = typer.Option(None, help="Path to config yaml."),
 ) -> None:
     """
     Start the backend server.
 
     Args:
+        ctx: The context of the command line invocation
         config: The path to the application configuration
 
     """
-    run_server(app="metadata_service.__main__:app", config=get_config())
+    if ctx.invoked_subcommand is None:
+        run_server(app="metadata_service.__main__:app", config=get_config())
+
+
+@cli.command()
+def indexes(
+    check: bool = typer.Option(
+        False, help="Only report index drift, without creating indexes."
+    )
+) -> None:
+    """
+    Create the indexes derived from the models and report index drift.
+
+    Args:
+        check: Whether to only report drift. Exits with status 1 on drift.
+
+    """
+    drift = asyncio.run(index_drift() if check else ensure_indexes())
+    for collection_name, changes in drift.items():
+        typer.echo(
+            f"{collection_name}: missing {changes['missing']}, "
+            f"unexpected {changes['unexpected']}"
+        )
+    if not drift:
+        typer.echo("Indexes are up to date.")
+    elif check:
+        raise typer.Exit(code=1)
 
 
 def run_cli() -> None:
     """
-    Command line interface for running the server.
+    Command line interface for running the server and managing indexes.
     """
-    typer.run(run)
+    cli()
 
 
 if __name__ == "__main__":
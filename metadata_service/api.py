@@ -18,10 +18,16 @@ This module define the API endpoints that collectively
 form the Metadata Service API.
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from pymongo.errors import DuplicateKeyError
 from ghga_service_chassis_lib.api import configure_app
 
 from metadata_service.config import get_config
+from metadata_service.core.compression import CompressionMiddleware
+from metadata_service.core.bulk import DUPLICATE_ID_MESSAGE
+from metadata_service.core.changes import start_change_feed, stop_change_feed
+from metadata_service.core.indexes import ensure_indexes
 from metadata_service.database import DBConnect
 from metadata_service.routes.studies import studies_router
 from metadata_service.routes.datasets import dataset_router
@@ -47,6 +53,14 @@ app = FastAPI(
 
 configure_app(app, config=CONFIG)
 
+if CONFIG.compression_minimum_size is not None:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=CONFIG.compression_minimum_size,
+        level=CONFIG.compression_level,
+        zstd_level=CONFIG.compression_zstd_level,
+    )
+
 app.include_router(studies_router)
 app.include_router(dataset_router)
 app.include_router(experiment_router)
@@ -58,4 +72,15 @@ app.include_router(data_access_committee_router)
 app.include_router(health_router)
 db_connect = DBConnect()
 app.add_event_handler("startup", db_connect.get_db)
+app.add_event_handler("startup", ensure_indexes)
+app.add_event_handler("startup", start_change_feed)
+app.add_event_handler("shutdown", stop_change_feed)
 app.add_event_handler("shutdown", db_connect.close_db)
+
+
+@app.exception_handler(DuplicateKeyError)
+async def duplicate_key_handler(
+    request: Request, exc: DuplicateKeyError  # pylint: disable=unused-argument
+) -> JSONResponse:
+    """Reject writes that violate a unique index, such as the one on ``id``."""
+    return JSONResponse(status_code=409, content={"detail": DUPLICATE_ID_MESSAGE})
@@ -18,6 +18,7 @@ This module provides Configuration for the API
 """
 
 from functools import lru_cache
+from typing import List, Literal, Optional
 from ghga_service_chassis_lib.config import config_from_yaml
 from ghga_service_chassis_lib.api import ApiConfigBase
 
@@ -32,6 +33,41 @@ class Config(ApiConfigBase):
     # are inherited from ApiConfigBase
     db_url: str = "mongodb://localhost:27017"
     db_name: str = "metadata"
+    # options for the connection pool of the process-wide database client
+    db_max_pool_size: int = 100
+    db_min_pool_size: int = 0
+    db_max_idle_time_ms: Optional[int] = None
+    db_wait_queue_timeout_ms: Optional[int] = None
+    # number of IDs each worker reserves from the counter at once
+    id_block_size: int = 1
+    # maximum number of concurrent queries while embedding references
+    embed_concurrency: int = 8
+    # engine for embedded reads: client-side walk or server-side $lookup
+    embed_engine: Literal["client", "lookup"] = "client"
+    # collections whose fully embedded documents are kept in a materialized view
+    materialized_views: List[str] = []
+    # page sizes of list endpoints, all documents are returned if no page size is set
+    default_page_size: Optional[int] = None
+    max_page_size: Optional[int] = 1000
+    # number of documents per database round trip and chunk of streamed responses
+    stream_batch_size: int = 1000
+    # maximum number of IDs per batch request
+    max_batch_size: int = 1000
+    # serialize read documents without validating them against the response model
+    trusted_reads: bool = False
+    # per-worker read cache of documents, disabled if the size is 0
+    cache_max_size: int = 10000
+    cache_ttl: float = 60
+    # per-worker cache of IDs that were not found, disabled if the size is 0
+    negative_cache_max_size: int = 10000
+    negative_cache_ttl: float = 10
+    # polling of the changes of other workers, disabled if the interval is None
+    changes_poll_interval: Optional[float] = 1.0
+    changes_retention: int = 3600
+    # response compression, disabled if the minimum size is None
+    compression_minimum_size: Optional[int] = 1000
+    compression_level: int = 6
+    compression_zstd_level: int = 3
     fastapi_options: dict = {
         "root_path": "/",
         "openapi_url": "/openapi.json",
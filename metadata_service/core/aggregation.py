@@ -0,0 +1,208 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Server-side embedding of references using MongoDB aggregation pipelines.
+"""
+import logging
+from typing import Dict, FrozenSet, List, Optional, Type
+from pydantic import BaseModel
+from metadata_service.config import get_config
+from metadata_service.core.utils import EmbedPaths
+from metadata_service.database import DBConnect
+
+LOOKUP_ENGINE = "lookup"
+
+
+def use_lookup_engine(engine: Optional[str] = None) -> bool:
+    """Whether embedded reads should use the ``$lookup`` engine.
+
+    Args:
+        engine: The engine requested by the client. If ``None``,
+            the ``embed_engine`` setting is used.
+
+    Returns
+        ``True`` if the ``$lookup`` engine is selected
+
+    """
+    return (engine or get_config().embed_engine) == LOOKUP_ENGINE
+
+
+def build_embed_pipeline(
+    document_type: Type[BaseModel],
+    paths: Optional[EmbedPaths] = None,
+    depth: Optional[int] = None,
+    _path: FrozenSet[str] = frozenset(),
+) -> List[Dict]:
+    """Compile the ``__references__`` of a model into nested ``$lookup`` stages.
+
+    The referenced documents of each field are looked up into a temporary
+    field which is stitched back in place by ``stitch_references``. Models
+    that already occur on the path are not looked up again, so cyclic
+    references between models cannot produce an infinite pipeline. Leaf
+    lookups match ``localField`` against the ``id`` index of the referenced
+    collection. Lookups with nested levels use the ``let``/``$expr`` form,
+    which MongoDB 4.4 supports together with nested pipelines but which
+    cannot use the index. ``_id`` is removed on every level.
+
+    Args:
+        document_type: An instance of ``pydantic.BaseModel``
+        paths: The reference paths to embed, as returned by ``resolve_embed_paths``.
+            All references are embedded if ``None``.
+        depth: The maximum number of reference levels to embed. Unlimited if ``None``.
+
+    Returns
+        A list of aggregation stages
+
+    """
+    if depth is not None and depth < 1:
+        return []
+    path = _path | {document_type.__collection__}
+    stages = []
+    leaf_ids = []
+    for field, referenced_obj in sorted(
+        document_type.__references__, key=lambda ref: ref[0]
+    ):
+        if paths is not None and field not in paths:
+            continue
+        if referenced_obj.__collection__ in path:
+            continue
+        sub_pipeline = build_embed_pipeline(
+            referenced_obj,
+            None if paths is None else paths[field],
+            None if depth is None else depth - 1,
+            path,
+        )
+        stages.append(_lookup_stage(field, referenced_obj, sub_pipeline))
+        if not sub_pipeline:
+            leaf_ids.append(f"{_lookup_field(field)}._id")
+    if leaf_ids:
+        stages.append({"$project": {field: 0 for field in leaf_ids}})
+    return stages
+
+
+def _lookup_stage(
+    field: str, referenced_obj: Type[BaseModel], sub_pipeline: List[Dict]
+) -> Dict:
+    """Return the ``$lookup`` stage of a reference field, which may hold a
+    single ID or a list of IDs."""
+    if not sub_pipeline:
+        return {
+            "$lookup": {
+                "from": referenced_obj.__collection__,
+                "localField": field,
+                "foreignField": "id",
+                "as": _lookup_field(field),
+            }
+        }
+    refs = {"$ifNull": ["$$refs", []]}
+    return {
+        "$lookup": {
+            "from": referenced_obj.__collection__,
+            "let": {"refs": f"${field}"},
+            "pipeline": [
+                {
+                    "$match": {
+                        "$expr": {
+                            "$in": [
+                                "$id",
+                                {"$cond": [{"$isArray": refs}, refs, [refs]]},
+                            ]
+                        }
+                    }
+                },
+                {"$project": {"_id": 0}},
+                *sub_pipeline,
+            ],
+            "as": _lookup_field(field),
+        }
+    }
+
+
+def stitch_references(document: Dict, document_type: Type[BaseModel]) -> Dict:
+    """Replace the references of a document produced by ``build_embed_pipeline``
+    with the looked up documents, preserving the order of list references.
+    Dangling references are replaced by ``None``.
+
+    Args:
+        document: The document returned by the aggregation
+        document_type: An instance of ``pydantic.BaseModel``
+
+    Returns
+        The denormalized/embedded document
+
+    """
+    for field, referenced_obj in document_type.__references__:
+        lookup_field = _lookup_field(field)
+        if lookup_field not in document:
+            continue
+        found = {}
+        for doc in document.pop(lookup_field):
+            found[doc["id"]] = stitch_references(doc, referenced_obj)
+        value = document.get(field)
+        if not value:
+            continue
+        refs = [value] if isinstance(value, str) else value
+        for ref in refs:
+            if ref not in found:
+                logging.warning(
+                    "Reference with ID %s not found in collection %s",
+                    ref,
+                    referenced_obj.__collection__,
+                )
+        if isinstance(value, str):
+            document[field] = found.get(value)
+        else:
+            document[field] = [found.get(ref) for ref in value]
+    return document
+
+
+async def aggregate_embedded(
+    document_id: str,
+    document_type: Type[BaseModel],
+    paths: Optional[EmbedPaths] = None,
+    depth: Optional[int] = None,
+    projection: Optional[Dict] = None,
+) -> Optional[Dict]:
+    """Given a document ID and a document type, fetch the document with its
+    references embedded in a single aggregation round trip.
+
+    Args:
+        document_id: The ID of the document
+        document_type: An instance of ``pydantic.BaseModel``
+        paths: The reference paths to embed. All references are embedded if ``None``.
+        depth: The maximum number of reference levels to embed. Unlimited if ``None``.
+        projection: The projection of the document, applied before the lookups
+
+    Returns
+        The denormalized/embedded document, or ``None`` if it does not exist
+
+    """
+    db_connect = DBConnect()
+    collection = await db_connect.get_collection(document_type.__collection__)
+    pipeline = [
+        {"$match": {"id": document_id}},
+        {"$limit": 1},
+        {"$project": projection or {"_id": 0}},
+        *build_embed_pipeline(document_type, paths, depth),
+    ]
+    docs = await collection.aggregate(pipeline).to_list(None)  # type: ignore
+    if not docs:
+        return None
+    return stitch_references(docs[0], document_type)
+
+
+def _lookup_field(field: str) -> str:
+    """Return the name of the temporary field that holds looked up documents."""
+    return f"__{field}"
@@ -0,0 +1,124 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Bulk creation of documents with a single ID reservation and write.
+"""
+import logging
+from typing import Dict, List, Optional, Sequence, Type
+from fastapi.exceptions import HTTPException
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pydantic import BaseModel
+from pymongo.errors import BulkWriteError
+from metadata_service.config import get_config
+from metadata_service.core.changes import publish_changes
+from metadata_service.core.utils import get_timestamp
+from metadata_service.core.views import refresh_views
+from metadata_service.database import DBConnect, format_id
+
+# Error code of MongoDB for writes that violate a unique index
+DUPLICATE_KEY_ERROR = 11000
+DUPLICATE_ID_MESSAGE = "A record with this id already exists"
+
+
+async def insert_documents(
+    records: Sequence[BaseModel],
+    document_type: Type[BaseModel],
+    prefix: Optional[str] = None,
+) -> List[Dict]:
+    """Add many records of the same type to the metadata store.
+
+    A contiguous range of IDs is reserved with a single counter increment,
+    all records are stamped with the same timestamp and written with one
+    unordered ``insert_many``, so a failing record does not stop the others.
+
+    Args:
+        records: The records to add
+        document_type: An instance of ``pydantic.BaseModel``
+        prefix: The prefix of generated IDs. If ``None``, the records keep the
+            IDs they were given.
+
+    Returns
+        One result per record, in request order, with the ``id`` of the
+        record, whether it was ``created`` and the ``error`` if it was not
+
+    """
+    if not records:
+        return []
+    max_batch_size = get_config().max_batch_size
+    if len(records) > max_batch_size:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {max_batch_size} records can be added at once",
+        )
+    collection_name = document_type.__collection__
+    documents = await _stamp(records, collection_name, prefix)
+    collection = await DBConnect().get_collection(collection_name)
+    errors = await _insert_many(collection, documents)
+    results = _results(documents, errors)
+    created = [result["id"] for result in results if result["created"]]
+    await publish_changes(collection_name, created)
+    await refresh_views(collection_name, created)
+    return results
+
+
+async def _stamp(
+    records: Sequence[BaseModel], collection_name: str, prefix: Optional[str]
+) -> List[Dict]:
+    """Return the records as documents with reserved IDs, if ``prefix`` is
+    given, and one timestamp."""
+    documents = [record.dict() for record in records]
+    if prefix is not None:
+        values = await DBConnect().reserve_ids(collection_name, len(documents))
+        for document, value in zip(documents, values):
+            document["id"] = format_id(prefix, value)
+    timestamp = await get_timestamp()
+    for document in documents:
+        document["creation_date"] = timestamp
+        document["update_date"] = timestamp
+    return documents
+
+
+def _results(documents: List[Dict], errors: Dict[int, str]) -> List[Dict]:
+    """Return the result of every document, given the errors by index."""
+    return [
+        {"id": doc["id"], "created": index not in errors, "error": errors.get(index)}
+        for index, doc in enumerate(documents)
+    ]
+
+
+async def _insert_many(
+    collection: AsyncIOMotorCollection, documents: List[Dict]
+) -> Dict[int, str]:
+    """Write documents with an unordered ``insert_many`` and return the error
+    message of every document that could not be inserted, by its index. The
+    messages returned to clients are stable; the raw errors, which include the
+    key values, are only logged."""
+    try:
+        await collection.insert_many(documents, ordered=False)  # type: ignore
+    except BulkWriteError as error:
+        errors = {}
+        for write_error in error.details["writeErrors"]:
+            logging.warning(
+                "Could not insert record %s: %s",
+                write_error["index"],
+                write_error["errmsg"],
+            )
+            errors[write_error["index"]] = (
+                DUPLICATE_ID_MESSAGE
+                if write_error.get("code") == DUPLICATE_KEY_ERROR
+                else "The record could not be added"
+            )
+        return errors
+    return {}
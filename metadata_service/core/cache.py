@@ -0,0 +1,143 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+In-process read cache for documents, keyed by ``(collection, id)``.
+
+Each worker process holds its own cache. Entries are evicted in LRU order
+once ``cache_max_size`` is reached and expire ``cache_ttl`` seconds after
+they were read from the metadata store, which bounds how stale a document
+written through another worker can be. Writes through this worker
+invalidate the written document immediately.
+
+A separate, smaller negative cache remembers IDs that were not found, so
+that repeated lookups of missing IDs and dangling references are answered
+without a query.
+"""
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from metadata_service.config import get_config
+
+CacheKey = Tuple[str, str]
+
+
+class DocumentCache:
+    """
+    A size bounded LRU cache whose entries expire after a TTL.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: "OrderedDict[CacheKey, Tuple[float, Dict]]" = OrderedDict()
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def get(self, key: CacheKey) -> Optional[Dict]:
+        """Return a copy of the cached document, or ``None`` on a miss."""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] <= self.clock():
+            del self.entries[key]
+            self.counters["expirations"] += 1
+            entry = None
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.counters["hits"] += 1
+        return dict(entry[1])
+
+    def put(self, key: CacheKey, document: Dict) -> None:
+        """Cache a copy of a document, evicting the least recently used
+        entries if the cache is full."""
+        if self.max_size <= 0:
+            return
+        self.entries[key] = (self.clock() + self.ttl, dict(document))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def invalidate(self, key: CacheKey) -> None:
+        """Drop the entry of a document that was written."""
+        if self.entries.pop(key, None) is not None:
+            self.counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the counters and the current size of the cache."""
+        return {**self.counters, "size": len(self.entries), "max_size": self.max_size}
+
+
+_CACHE: Optional[DocumentCache] = None
+_NEGATIVE_CACHE: Optional[DocumentCache] = None
+
+
+def get_cache() -> DocumentCache:
+    """Return the document cache of this worker process."""
+    global _CACHE  # pylint: disable=global-statement
+    if _CACHE is None:
+        config = get_config()
+        _CACHE = DocumentCache(config.cache_max_size, config.cache_ttl)
+    return _CACHE
+
+
+def get_negative_cache() -> DocumentCache:
+    """Return the cache of IDs that were not found in the metadata store.
+    Each hit is a lookup that was suppressed."""
+    global _NEGATIVE_CACHE  # pylint: disable=global-statement
+    if _NEGATIVE_CACHE is None:
+        config = get_config()
+        _NEGATIVE_CACHE = DocumentCache(
+            config.negative_cache_max_size, config.negative_cache_ttl
+        )
+    return _NEGATIVE_CACHE
+
+
+def is_missing(collection_name: str, document_id: str) -> bool:
+    """Whether a document was recently looked up and not found."""
+    return get_negative_cache().get((collection_name, document_id)) is not None
+
+
+def mark_missing(collection_name: str, document_id: str) -> None:
+    """Remember that a document was looked up and not found."""
+    get_negative_cache().put((collection_name, document_id), {})
+
+
+def invalidate(collection_name: str, document_id: str) -> None:
+    """Invalidate the cached document, or the record of its absence, after it
+    was added or updated.
+
+    Args:
+        collection_name: The collection of the written document
+        document_id: The ID of the written document
+
+    """
+    get_cache().invalidate((collection_name, document_id))
+    get_negative_cache().invalidate((collection_name, document_id))
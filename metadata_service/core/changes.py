@@ -0,0 +1,194 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Invalidation feed that keeps the document caches of several workers coherent.
+
+Every write appends the written ``(collection, id)`` to the ``changes``
+collection under a sequence number. Each worker polls the collection every
+``changes_poll_interval`` seconds for entries above its watermark and evicts
+them from its own document cache and negative cache, so a document written
+through another worker is stale for at most about one poll interval.
+"""
+import asyncio
+import datetime
+import logging
+import time
+from typing import Callable, Iterable, List, Optional, Set
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from metadata_service.config import get_config
+from metadata_service.core.cache import invalidate
+from metadata_service.core.singleflight import document_reads
+from metadata_service.database import DBConnect
+
+CHANGES = "changes"
+
+
+def change_indexes() -> List[IndexModel]:
+    """Return the indexes of the ``changes`` collection. Entries expire after
+    ``changes_retention`` seconds."""
+    return [
+        IndexModel([("seq", ASCENDING)], unique=True),
+        IndexModel(
+            [("at", ASCENDING)], expireAfterSeconds=get_config().changes_retention
+        ),
+    ]
+
+
+async def publish_changes(collection_name: str, document_ids: Iterable[str]) -> None:
+    """Invalidate written documents in the cache of this worker, keep later
+    reads from joining reads of them that are in flight, and append them to
+    the ``changes`` collection for the other workers.
+
+    Args:
+        collection_name: The collection of the written documents
+        document_ids: The IDs of the written documents
+
+    """
+    document_ids = list(document_ids)
+    for document_id in document_ids:
+        invalidate(collection_name, document_id)
+        document_reads.forget((collection_name, document_id))
+    if not document_ids or get_config().changes_poll_interval is None:
+        return
+    db_connect = DBConnect()
+    seqs = await db_connect.reserve_ids(CHANGES, len(document_ids))
+    now = datetime.datetime.utcnow()
+    changes = await db_connect.get_collection(CHANGES)
+    await changes.insert_many(  # type: ignore
+        [
+            {"seq": seq, "collection": collection_name, "id": document_id, "at": now}
+            for seq, document_id in zip(seqs, document_ids)
+        ]
+    )
+
+
+async def publish_change(collection_name: str, document_id: str) -> None:
+    """Publish a single written document, see ``publish_changes``."""
+    await publish_changes(collection_name, [document_id])
+
+
+class ChangeFeed:
+    """
+    Polls the ``changes`` collection and evicts the changed documents from the
+    cache of this worker.
+
+    Sequence numbers are reserved before their entries are inserted, so a
+    poll can see a later entry before an earlier one. The watermark therefore
+    only advances over contiguous sequence numbers. A gap that is not filled
+    within the TTL of the enabled caches is skipped, as any entry it could
+    invalidate has expired by then.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.watermark = 0
+        self.seen: Set[int] = set()
+        self.gap_since: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self, interval: float) -> None:
+        """Skip the changes made before this worker started and start polling
+        every ``interval`` seconds."""
+        changes = await DBConnect().get_collection(CHANGES)
+        latest = await changes.find_one(  # type: ignore
+            {}, {"seq": 1}, sort=[("seq", DESCENDING)]
+        )
+        self.watermark = latest["seq"] if latest else 0
+        self.task = asyncio.get_event_loop().create_task(self.run(interval))
+
+    async def stop(self) -> None:
+        """Stop polling."""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def run(self, interval: float) -> None:
+        """Poll the ``changes`` collection every ``interval`` seconds until the
+        feed is stopped."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.poll()
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("Could not poll the changes collection")
+
+    async def poll(self) -> int:
+        """Evict the documents changed above the watermark from the caches
+        and let later reads of them start anew instead of joining reads in
+        flight.
+
+        Returns:
+            The number of new changes
+
+        """
+        changes = await DBConnect().get_collection(CHANGES)
+        cursor = changes.find(  # type: ignore
+            {"seq": {"$gt": self.watermark}}, {"_id": 0}
+        ).sort("seq", ASCENDING)
+        count = 0
+        async for change in cursor:
+            if change["seq"] in self.seen:
+                continue
+            self.seen.add(change["seq"])
+            invalidate(change["collection"], change["id"])
+            document_reads.forget((change["collection"], change["id"]))
+            count += 1
+        self._advance()
+        return count
+
+    def _advance(self) -> None:
+        """Move the watermark over contiguous sequence numbers and skip gaps
+        that stayed open for longer than the TTL of the enabled caches."""
+        while self.watermark + 1 in self.seen:
+            self.watermark += 1
+            self.seen.discard(self.watermark)
+        if not self.seen:
+            self.gap_since = None
+        elif self.gap_since is None:
+            self.gap_since = self.clock()
+        elif self.clock() - self.gap_since >= _cache_ttl():
+            self.watermark = min(self.seen) - 1
+            self.gap_since = None
+            self._advance()
+
+
+def _cache_ttl() -> float:
+    """Return the longest TTL of the enabled caches, or 0 if all are disabled."""
+    config = get_config()
+    ttls = [
+        ttl
+        for size, ttl in (
+            (config.cache_max_size, config.cache_ttl),
+            (config.negative_cache_max_size, config.negative_cache_ttl),
+        )
+        if size > 0
+    ]
+    return max(ttls, default=0)
+
+
+_FEED = ChangeFeed()
+
+
+async def start_change_feed() -> None:
+    """Start polling the changes of other workers, unless the feed or both the
+    document cache and the negative cache are disabled."""
+    config = get_config()
+    if config.changes_poll_interval is not None and _cache_ttl() > 0:
+        await _FEED.start(config.changes_poll_interval)
+
+
+async def stop_change_feed() -> None:
+    """Stop polling the changes of other workers."""
+    await _FEED.stop()
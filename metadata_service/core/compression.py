@@ -0,0 +1,171 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Negotiated response compression with gzip, deflate and, if ``zstandard`` is
+installed, zstd.
+
+Responses are compressed chunk by chunk as they are sent, so streamed
+responses are never buffered as a whole. Responses whose body is a single
+chunk smaller than ``compression_minimum_size`` are sent uncompressed.
+"""
+import zlib
+from typing import Any, Dict, List, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore  # pylint: disable=invalid-name
+
+
+def supported_encodings() -> List[str]:
+    """Return the supported content codings, most preferred first."""
+    encodings = ["gzip", "deflate"]
+    if zstandard is not None:
+        encodings.insert(0, "zstd")
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Choose the content coding of a response from an ``Accept-Encoding``
+    header. Among the acceptable codings with the highest quality, the most
+    preferred supported one is chosen.
+
+    Args:
+        accept_encoding: The value of the ``Accept-Encoding`` header
+
+    Returns
+        The content coding, or ``None`` if the response is sent uncompressed
+
+    """
+    qualities: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        if coding:
+            qualities[coding.strip().lower()] = quality
+    wildcard = qualities.get("*", 0.0)
+    candidates = [
+        (qualities.get(encoding, wildcard), -rank, encoding)
+        for rank, encoding in enumerate(supported_encodings())
+    ]
+    quality, _, encoding = max(candidates)
+    return encoding if quality > 0 else None
+
+
+def _compressor(encoding: str, level: int, zstd_level: int) -> Any:
+    """Return a compressor with ``compress`` and ``flush`` methods."""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=zstd_level).compressobj()
+    if encoding == "gzip":
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return zlib.compressobj(level)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware that compresses responses with the content coding
+    negotiated from the ``Accept-Encoding`` header of the request.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1000,
+        level: int = 6,
+        zstd_level: int = 3,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            encoding = negotiate_encoding(headers.get("accept-encoding", ""))
+            if encoding is not None:
+                responder = _CompressionResponder(self, encoding, send)
+                await self.app(scope, receive, responder.send)
+                return
+        await self.app(scope, receive, send)
+
+
+class _CompressionResponder:
+    """
+    Compresses the body messages of a single response. The start message is
+    held back until the first body message shows whether the response is
+    compressed.
+    """
+
+    def __init__(
+        self, middleware: CompressionMiddleware, encoding: str, send: Send
+    ) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.start_message: Optional[Message] = None
+        self.compressor: Any = None
+
+    async def send(self, message: Message) -> None:
+        """Intercept the messages of the response."""
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.downstream(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        start_message, self.start_message = self.start_message, None
+        headers = None
+        if start_message is not None:
+            headers = MutableHeaders(raw=start_message["headers"])
+            self._start(headers, body, more_body)
+        if self.compressor is not None:
+            body = self.compressor.compress(body)
+            if not more_body:
+                body += self.compressor.flush()
+                if headers is not None:
+                    headers["Content-Length"] = str(len(body))
+            message = {**message, "body": body}
+        if start_message is not None:
+            await self.downstream(start_message)
+        await self.downstream(message)
+
+    def _start(self, headers: MutableHeaders, body: bytes, more_body: bool) -> None:
+        """Decide from the first body message whether the response is
+        compressed and update its headers."""
+        if "content-encoding" in headers:
+            return
+        if not more_body and len(body) < self.middleware.minimum_size:
+            return
+        self.compressor = _compressor(
+            self.encoding, self.middleware.level, self.middleware.zstd_level
+        )
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        del headers["Content-Length"]
+        if headers.get("etag", "").startswith('"'):
+            # The compressed body is not byte-identical to the one the strong
+            # ETag was computed for
+            headers["ETag"] = "W/" + headers["etag"]
@@ -0,0 +1,364 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Conditional GET with ETags and Last-Modified dates derived from ``update_date``.
+
+The version of a response is the set of ``(collection, id, update_date)`` of
+every document it contains. The ETag hashes this version together with the
+query parameters and the media type. Full responses take their version from
+the documents they serve, which are read through the document cache, so the
+ETag always describes the body it is sent with. Only conditional requests
+read the current version with projection-only queries first, so that a
+``304 Not Modified`` is answered without loading the documents themselves.
+"""
+import datetime
+import hashlib
+from collections import defaultdict
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type
+from fastapi import Request, Response
+from pydantic import BaseModel
+from metadata_service.core.cache import is_missing
+from metadata_service.core.projection import resolve_projection
+from metadata_service.core.retrieval import find_documents
+from metadata_service.core.serialization import MSGPACK_MEDIA_TYPE, wants_msgpack
+from metadata_service.core.utils import EmbedPaths, _reference_ids, resolve_embed_paths
+from metadata_service.database import DBConnect
+
+Version = Tuple[str, str, str]
+
+
+async def document_version(  # pylint: disable=too-many-arguments,too-many-locals
+    document_id: str,
+    document_type: Type[BaseModel],
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+    fields: Optional[str] = None,
+) -> Optional[Set[Version]]:
+    """Read the version of a document and, if references are embedded, of the
+    documents embedded in it. Only ``id``, ``update_date`` and the followed
+    reference fields are read, one query per collection and level.
+    Reference fields of the document that are not among ``fields`` are not
+    followed, since they are not served.
+
+    Args:
+        document_id: The ID of the document
+        document_type: An instance of ``pydantic.BaseModel``
+        embedded: Whether or not references are embedded
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+        fields: Comma separated fields that are served. All fields are
+            served if ``None``.
+
+    Returns
+        The versions of all documents in the response, or ``None`` if the
+        document does not exist
+
+    """
+    if is_missing(document_type.__collection__, document_id):
+        return None
+    projected = resolve_projection(document_type, fields)
+    paths = resolve_embed_paths(document_type, embed)
+    embedded = embedded or paths is not None or depth is not None
+    max_depth = depth if embedded else 0
+    db_connect = DBConnect()
+    versions: Set[Version] = set()
+    visited: Set[Tuple[str, str, int]] = set()
+    level: Dict[Tuple[str, int], Tuple[Type[BaseModel], Optional[EmbedPaths], Set[str]]]
+    level = {
+        (document_type.__collection__, id(paths)): (document_type, paths, {document_id})
+    }
+    current_depth = 0
+    while level:
+        next_level: Dict = defaultdict(lambda: (None, None, set()))
+        for (collection_name, paths_id), (model, subpaths, ids) in level.items():
+            ids = {i for i in ids if (collection_name, i, paths_id) not in visited}
+            visited.update((collection_name, i, paths_id) for i in ids)
+            if not ids:
+                continue
+            follow = max_depth is None or current_depth < max_depth
+            references = [
+                (field, referenced_obj)
+                for field, referenced_obj in model.__references__
+                if follow
+                and (subpaths is None or field in subpaths)
+                and (current_depth > 0 or fields is None or projected.get(field))
+            ]
+            projection = {"_id": 0, "id": 1, "update_date": 1}
+            projection.update({field: 1 for field, _ in references})
+            collection = await db_connect.get_collection(collection_name)
+            docs = await collection.find(  # type: ignore
+                {"id": {"$in": list(ids)}}, projection
+            ).to_list(None)
+            for doc in docs:
+                versions.add((collection_name, doc["id"], doc.get("update_date") or ""))
+                for field, referenced_obj in references:
+                    child_paths = None if subpaths is None else subpaths[field]
+                    key = (referenced_obj.__collection__, id(child_paths))
+                    entry = next_level[key]
+                    next_level[key] = (referenced_obj, child_paths, entry[2])
+                    entry[2].update(_reference_ids(doc, field))
+        level = next_level
+        current_depth += 1
+    if (document_type.__collection__, document_id) not in {v[:2] for v in versions}:
+        return None
+    return versions
+
+
+async def page_version(
+    document_type: Type[BaseModel],
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> Set[Version]:
+    """Read the version of a page of a list endpoint with a projection-only
+    query on ``update_date``.
+
+    Args:
+        document_type: An instance of ``pydantic.BaseModel``
+        limit: The page size
+        cursor: The cursor returned with the previous page
+        filters: The filters of the list endpoint
+
+    Returns
+        The versions of all documents on the page
+
+    """
+    docs = await find_documents(document_type, limit, cursor, "update_date", filters)
+    collection_name = document_type.__collection__
+    return {(collection_name, doc["id"], doc.get("update_date") or "") for doc in docs}
+
+
+def make_etag(request: Request, versions: Iterable[Version]) -> str:
+    """Return a strong ETag for a response with the given versions to a request
+    with the query parameters and the media type of ``request``."""
+    digest = hashlib.sha1()
+    if wants_msgpack(request):
+        digest.update(f"{MSGPACK_MEDIA_TYPE}\n".encode())
+    for name, value in sorted(request.query_params.multi_items()):
+        digest.update(f"{name}={value}\n".encode())
+    for version in sorted(versions):
+        digest.update("\t".join(version).encode() + b"\n")
+    return f'"{digest.hexdigest()}"'
+
+
+def last_modified(versions: Iterable[Version]) -> Optional[datetime.datetime]:
+    """Return the latest ``update_date`` of the given versions."""
+    dates = [version[2] for version in versions if version[2]]
+    if not dates:
+        return None
+    latest = datetime.datetime.fromisoformat(max(dates))
+    return latest.replace(tzinfo=datetime.timezone.utc, microsecond=0)
+
+
+def is_conditional(request: Request) -> bool:
+    """Whether the request has an ``If-None-Match`` or an ``If-Modified-Since``
+    header."""
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+async def check_document(  # pylint: disable=too-many-arguments
+    request: Request,
+    document_id: str,
+    document_type: Type[BaseModel],
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+    fields: Optional[str] = None,
+) -> Optional[Response]:
+    """Answer a conditional GET of a document with ``304 Not Modified`` if the
+    client already has its current version. Unconditional requests are not
+    checked, so they read nothing but the document itself.
+
+    Args:
+        request: The GET request
+        document_id: The ID of the document
+        document_type: An instance of ``pydantic.BaseModel``
+        embedded: Whether or not references are embedded
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+        fields: Comma separated fields that are served
+
+    Returns
+        A ``304 Not Modified`` response, or ``None`` if the document needs to
+        be sent
+
+    """
+    if not is_conditional(request):
+        return None
+    versions = await document_version(
+        document_id, document_type, embedded, embed, depth, fields
+    )
+    return _not_modified_response(request, versions)
+
+
+async def check_page(
+    request: Request,
+    document_type: Type[BaseModel],
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> Optional[Response]:
+    """Answer a conditional GET of a page of a list endpoint with
+    ``304 Not Modified`` if the client already has its current version.
+    Unconditional requests are not checked.
+
+    Args:
+        request: The GET request
+        document_type: An instance of ``pydantic.BaseModel``
+        limit: The page size
+        cursor: The cursor returned with the previous page
+        filters: The filters of the list endpoint
+
+    Returns
+        A ``304 Not Modified`` response, or ``None`` if the page needs to be
+        sent
+
+    """
+    if not is_conditional(request):
+        return None
+    versions = await page_version(document_type, limit, cursor, filters)
+    return _not_modified_response(request, versions)
+
+
+def versioned_fields(fields: Optional[str]) -> Optional[str]:
+    """Add ``update_date`` to the fields to read, so that the version of a
+    projected document can be taken from the document itself. It is removed
+    again by ``add_version_headers`` unless it was requested."""
+    if fields is None or "update_date" in _field_names(fields):
+        return fields
+    return f"{fields},update_date"
+
+
+def add_version_headers(
+    request: Request,
+    response: Response,
+    document_type: Type[BaseModel],
+    content: Any,
+    fields: Optional[str] = None,
+) -> Any:
+    """Add the ``ETag`` and ``Last-Modified`` headers of the served documents
+    to the response.
+
+    Args:
+        request: The GET request
+        response: The response for the full document(s)
+        document_type: An instance of ``pydantic.BaseModel``
+        content: The document or list of documents that is served, read with
+            ``versioned_fields(fields)``
+        fields: Comma separated fields that were requested
+
+    Returns
+        The document or list of documents without ``update_date``, if it was
+        only read for its version
+
+    """
+    documents = content if isinstance(content, list) else [content]
+    versions: Set[Version] = set()
+    for document in documents:
+        served_version(document, document_type, versions)
+    response.headers.update(_version_headers(request, versions))
+    if fields is None or "update_date" in _field_names(fields):
+        return content
+    documents = [
+        {k: v for k, v in document.items() if k != "update_date"}
+        for document in documents
+    ]
+    return documents if isinstance(content, list) else documents[0]
+
+
+def served_version(
+    document: Dict, document_type: Type[BaseModel], versions: Set[Version]
+) -> Set[Version]:
+    """Collect the version of a served document and of the documents
+    embedded in it. References that are served as IDs have no version.
+
+    Args:
+        document: The served document
+        document_type: An instance of ``pydantic.BaseModel``
+        versions: The set the versions are added to
+
+    Returns
+        The set of versions
+
+    """
+    versions.add(
+        (
+            document_type.__collection__,
+            document["id"],
+            document.get("update_date") or "",
+        )
+    )
+    for field, referenced_obj in document_type.__references__:
+        value = document.get(field)
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, dict):
+                served_version(item, referenced_obj, versions)
+    return versions
+
+
+def _field_names(fields: str) -> Set[str]:
+    """Split comma separated fields."""
+    return {field.strip() for field in fields.split(",")}
+
+
+def _version_headers(request: Request, versions: Set[Version]) -> Dict[str, str]:
+    """Return the ``ETag`` and ``Last-Modified`` headers of a version."""
+    headers = {"ETag": make_etag(request, versions)}
+    modified = last_modified(versions)
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    return headers
+
+
+def _not_modified_response(
+    request: Request, versions: Optional[Set[Version]]
+) -> Optional[Response]:
+    """Return a ``304 Not Modified`` response if the client already has the
+    current version, as told by ``If-None-Match`` or, without it,
+    ``If-Modified-Since``. Missing documents have no version."""
+    if versions is None:
+        return None
+    headers = _version_headers(request, versions)
+    if _not_modified(request, headers["ETag"], last_modified(versions)):
+        return Response(status_code=304, headers=headers)
+    return None
+
+
+def _not_modified(
+    request: Request, etag: str, modified: Optional[datetime.datetime]
+) -> bool:
+    """Evaluate ``If-None-Match`` or, if it is absent, ``If-Modified-Since``."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = _parse_etags(if_none_match)
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=datetime.timezone.utc)
+    return modified <= since
+
+
+def _parse_etags(header: str) -> List[str]:
+    """Parse the ETags of an ``If-None-Match`` header, comparing weakly."""
+    tags = (tag.strip() for tag in header.split(","))
+    return [tag[2:] if tag.startswith("W/") else tag for tag in tags]
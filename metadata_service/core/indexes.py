@@ -0,0 +1,181 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Indexes derived from the models.
+
+Every collection gets a unique index on ``id``, an index on each reference
+field and a compound index on each filter field. The indexes are created at
+startup and with ``metadata-service indexes``, which also reports drift
+between the indexes in the metadata store and the ones derived here.
+"""
+import logging
+from typing import Dict, Iterable, List, Tuple, Type
+from pydantic import BaseModel
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from metadata_service.config import get_config
+from metadata_service.core.changes import CHANGES, change_indexes
+from metadata_service.core.views import view_name
+from metadata_service.database import DBConnect
+from metadata_service.models import MODELS
+
+IndexKeys = List[Tuple[str, int]]
+IndexDrift = Dict[str, Dict[str, List[str]]]
+
+ID_INDEX_KEYS: IndexKeys = [("id", ASCENDING)]
+
+
+def filter_index_keys(document_type: Type[BaseModel]) -> List[IndexKeys]:
+    """Return the keys of the indexes needed by the ``__filters__`` of a model.
+
+    Each filter field is indexed together with ``id``, so that a filtered page
+    is an index seek followed by an ordered scan in keyset order.
+
+    Args:
+        document_type: An instance of ``pydantic.BaseModel``
+
+    Returns
+        A list of index keys
+
+    """
+    return [
+        [(field, ASCENDING), ("id", ASCENDING)]
+        for field in sorted(document_type.__filters__)
+    ]
+
+
+def reference_index_keys(document_type: Type[BaseModel]) -> List[IndexKeys]:
+    """Return the keys of the indexes on the reference fields of a model, which
+    serve the reverse lookups that refresh materialized views. Reference fields
+    that are also filters are covered by their filter index.
+
+    Args:
+        document_type: An instance of ``pydantic.BaseModel``
+
+    Returns
+        A list of index keys
+
+    """
+    return [
+        [(field, ASCENDING)]
+        for field, _ in sorted(document_type.__references__, key=lambda ref: ref[0])
+        if field not in document_type.__filters__
+    ]
+
+
+def expected_indexes(
+    models: Iterable[Type[BaseModel]] = tuple(MODELS),
+) -> Dict[str, List[IndexModel]]:
+    """Derive the indexes of every collection from the given models, including
+    the views of the collections listed in the ``materialized_views`` setting
+    and the ``changes`` collection.
+
+    Args:
+        models: The models to derive the indexes from
+
+    Returns
+        A dictionary that maps a collection name to its indexes
+
+    """
+    views = get_config().materialized_views
+    indexes: Dict[str, List[IndexModel]] = {CHANGES: change_indexes()}
+    for model in models:
+        indexes[model.__collection__] = [
+            IndexModel(ID_INDEX_KEYS, unique=True),
+            *(IndexModel(keys) for keys in reference_index_keys(model)),
+            *(IndexModel(keys) for keys in filter_index_keys(model)),
+        ]
+        if model.__collection__ in views:
+            indexes[view_name(model.__collection__)] = [
+                IndexModel(ID_INDEX_KEYS, unique=True)
+            ]
+    return indexes
+
+
+async def index_drift(models: Iterable[Type[BaseModel]] = tuple(MODELS)) -> IndexDrift:
+    """Compare the indexes in the metadata store with the expected indexes.
+
+    Args:
+        models: The models to derive the expected indexes from
+
+    Returns
+        A dictionary that maps the name of every drifted collection to the
+        names of its ``missing`` and ``unexpected`` indexes
+
+    """
+    db_connect = DBConnect()
+    drift: IndexDrift = {}
+    for collection_name, indexes in expected_indexes(models).items():
+        collection = await db_connect.get_collection(collection_name)
+        existing = {
+            _index_signature(info["key"], info.get("unique", False)): name
+            for name, info in (await collection.index_information()).items()  # type: ignore
+            if name != "_id_"
+        }
+        expected = {
+            _index_signature(
+                index.document["key"].items(), index.document.get("unique", False)
+            ): index.document["name"]
+            for index in indexes
+        }
+        missing = [name for key, name in expected.items() if key not in existing]
+        unexpected = [name for key, name in existing.items() if key not in expected]
+        if missing or unexpected:
+            drift[collection_name] = {"missing": missing, "unexpected": unexpected}
+    return drift
+
+
+async def ensure_indexes(
+    models: Iterable[Type[BaseModel]] = tuple(MODELS),
+) -> IndexDrift:
+    """Create the expected indexes that do not exist yet and log the remaining
+    drift. Indexes that cannot be built, e.g. a unique index over duplicate
+    IDs, are logged and skipped.
+
+    Args:
+        models: The models to derive the expected indexes from
+
+    Returns
+        The index drift after the indexes were created
+
+    """
+    db_connect = DBConnect()
+    for collection_name, indexes in expected_indexes(models).items():
+        collection = await db_connect.get_collection(collection_name)
+        for index in indexes:
+            try:
+                await collection.create_indexes([index])  # type: ignore
+            except OperationFailure as error:
+                logging.error(
+                    "Could not create index %s on collection %s: %s",
+                    index.document["name"],
+                    collection_name,
+                    error,
+                )
+    drift = await index_drift(models)
+    for collection_name, changes in drift.items():
+        logging.warning(
+            "Index drift in collection %s: missing %s, unexpected %s",
+            collection_name,
+            changes["missing"],
+            changes["unexpected"],
+        )
+    return drift
+
+
+def _index_signature(keys: Iterable[Tuple[str, int]], unique: bool) -> Tuple:
+    """Return a hashable signature that identifies an index by its keys and
+    uniqueness, independently of its name."""
+    return tuple((field, int(direction)) for field, direction in keys), bool(unique)
@@ -0,0 +1,92 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Cursor-based keyset pagination for list endpoints.
+
+Pages are ordered by the ``id`` field. The cursor is an opaque token that
+encodes the ``id`` of the last document of the previous page.
+"""
+import base64
+import binascii
+from typing import Dict, List, Optional
+from fastapi import Request, Response
+from fastapi.exceptions import HTTPException
+from metadata_service.config import get_config
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(document_id: str) -> str:
+    """Encode the ID of the last document of a page into an opaque cursor."""
+    return base64.urlsafe_b64encode(document_id.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    """Decode a cursor into the ID of the last document of the previous page.
+
+    Args:
+        cursor: The cursor returned with the previous page
+
+    Returns
+        The ID of the last document of the previous page
+
+    """
+    try:
+        return base64.b64decode(cursor, altchars=b"-_", validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError) as error:
+        raise HTTPException(
+            status_code=422, detail=f"Invalid cursor '{cursor}'"
+        ) from error
+
+
+def keyset_query(cursor: Optional[str] = None) -> Dict:
+    """Return the query that selects the documents after ``cursor``."""
+    if cursor is None:
+        return {}
+    return {"id": {"$gt": decode_cursor(cursor)}}
+
+
+def page_limit(limit: Optional[int] = None) -> Optional[int]:
+    """Apply the ``default_page_size`` and ``max_page_size`` settings to a
+    requested page size. ``None`` means that all documents are returned."""
+    config = get_config()
+    limit = limit or config.default_page_size
+    if limit is not None and config.max_page_size is not None:
+        limit = min(limit, config.max_page_size)
+    return limit
+
+
+def add_pagination_headers(
+    request: Request, response: Response, documents: List, limit: Optional[int]
+) -> None:
+    """If there may be a next page, add its cursor in the ``X-Next-Cursor``
+    header and its URL in the ``Link`` header of the response.
+
+    Args:
+        request: The request for the current page
+        response: The response for the current page
+        documents: The documents of the current page
+        limit: The page size of the current page
+
+    """
+    if not limit or len(documents) < limit:
+        return
+    cursor = encode_cursor(documents[-1]["id"])
+    path = request.scope.get("root_path", "").rstrip("/") + request.scope["path"]
+    url = request.url.replace(path=path).include_query_params(
+        cursor=cursor, limit=limit
+    )
+    response.headers[NEXT_CURSOR_HEADER] = cursor
+    response.headers["Link"] = f'<{url}>; rel="next"'
@@ -0,0 +1,173 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Partial updates of documents with field-level update operators.
+"""
+from typing import Any, Dict, List, Optional, Type
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import HTTPException
+from pydantic import BaseModel, ValidationError
+from pydantic.error_wrappers import ErrorList, ErrorWrapper
+from pydantic.fields import SHAPE_LIST
+from pymongo import ReturnDocument
+from metadata_service.core.changes import publish_change
+from metadata_service.core.utils import get_timestamp
+from metadata_service.core.views import refresh_views
+from metadata_service.database import DBConnect
+from metadata_service.models import PatchRequest
+
+# Fields that are maintained by the metadata store and cannot be patched
+READ_ONLY_FIELDS = {"id", "creation_date", "update_date"}
+
+
+def build_update(document_type: Type[BaseModel], patch: PatchRequest) -> List[Dict]:
+    """Translate a patch into a MongoDB update pipeline. Every value is
+    validated against the type of its field in the model.
+
+    Args:
+        document_type: An instance of ``pydantic.BaseModel``
+        patch: The fields to set and the list items to add or remove
+
+    Returns
+        An update pipeline with a single ``$set`` stage
+
+    """
+    seen = set()
+    errors: List[ErrorList] = []
+    stage: Dict[str, Dict] = {}
+    for operator, values in (
+        ("$set", patch.set),
+        ("$addToSet", patch.add_to_set),
+        ("$pull", patch.pull),
+    ):
+        for field, value in values.items():
+            if field in seen:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Field '{field}' can only be patched by one operation",
+                )
+            seen.add(field)
+            value = _validate(document_type, field, value, operator, errors)
+            stage[field] = _expression(operator, field, value)
+    if errors:
+        raise HTTPException(
+            status_code=422, detail=ValidationError(errors, document_type).errors()
+        )
+    return [{"$set": stage}]
+
+
+async def patch_document(
+    document_id: str, document_type: Type[BaseModel], patch: PatchRequest
+) -> Optional[Dict]:
+    """Given a document ID and a document type, apply a patch to the document
+    in a single find-and-modify with an update pipeline and return the
+    patched document.
+
+    Args:
+        document_id: The ID of the document
+        document_type: An instance of ``pydantic.BaseModel``
+        patch: The fields to set and the list items to add or remove
+
+    Returns
+        The patched document, or ``None`` if it does not exist
+
+    """
+    update = build_update(document_type, patch)
+    update[0]["$set"]["update_date"] = {"$literal": await get_timestamp()}
+    db_connect = DBConnect()
+    collection = await db_connect.get_collection(document_type.__collection__)
+    document = await collection.find_one_and_update(  # type: ignore
+        {"id": document_id},
+        update,
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if document:
+        await publish_change(document_type.__collection__, document_id)
+        await refresh_views(document_type.__collection__, [document_id])
+    return document
+
+
+def _expression(operator: str, field: str, value: Any) -> Dict:
+    """Return the aggregation expression that applies an update operator to a
+    field. Values are taken literally. Like ``$addToSet``, items are only
+    added if they are not in the list yet, and like ``$pull`` with ``$in``,
+    all occurrences of the items are removed. List fields of records added
+    without them are null and treated as empty lists."""
+    if operator == "$set":
+        return {"$literal": value}
+    current = {"$ifNull": [f"${field}", []]}
+    if operator == "$addToSet":
+        items: List = []
+        for item in value:
+            if item not in items:
+                items.append(item)
+        added = {
+            "$filter": {
+                "input": {"$literal": items},
+                "cond": {"$not": {"$in": ["$$this", current]}},
+            }
+        }
+        return {"$concatArrays": [current, added]}
+    return {
+        "$filter": {
+            "input": current,
+            "cond": {"$not": {"$in": ["$$this", {"$literal": value}]}},
+        }
+    }
+
+
+def _validate(
+    document_type: Type[BaseModel],
+    field: str,
+    value: Any,
+    operator: str,
+    errors: List[ErrorList],
+) -> Any:
+    """Validate the value of a patched field against the type of its field
+    in the model. Errors are collected in ``errors``."""
+    message = _invalid(document_type, field, value, operator)
+    if message is not None:
+        errors.append(ErrorWrapper(ValueError(message), (field,)))
+        return value
+    if field in dict(document_type.__references__):
+        return value
+    model_field = document_type.__fields__[field]
+    validated, error = model_field.validate(value, {}, loc=field)
+    if error:
+        errors.append(error)
+        return value
+    return jsonable_encoder(validated)
+
+
+def _invalid(
+    document_type: Type[BaseModel], field: str, value: Any, operator: str
+) -> Optional[str]:
+    """Return why a patched value is invalid, if it is. References must be
+    given as IDs, list operators only apply to list fields and take a list of
+    items."""
+    model_field = document_type.__fields__.get(field)
+    if model_field is None or field in READ_ONLY_FIELDS:
+        return "field cannot be patched"
+    is_list = model_field.shape == SHAPE_LIST
+    if operator != "$set" and not is_list:
+        return "field is not a list"
+    if operator != "$set" and not isinstance(value, list):
+        return "value is not a list"
+    if field in dict(document_type.__references__) and value is not None:
+        ids = value if is_list else [value]
+        if not isinstance(ids, list) or not all(isinstance(ref, str) for ref in ids):
+            return "references must be IDs"
+    return None
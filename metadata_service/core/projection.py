@@ -0,0 +1,57 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Field projection for read paths, so that only the requested fields of a
+document are read from the metadata store.
+"""
+from typing import Dict, Optional, Type
+from fastapi.exceptions import HTTPException
+from pydantic import BaseModel
+
+# The projection of every read: the ObjectId is never part of a response
+DEFAULT_PROJECTION = {"_id": 0}
+
+
+def resolve_projection(document_type: Type[BaseModel], fields: Optional[str]) -> Dict:
+    """Parse a comma separated list of fields, such as ``id,title,type``, into
+    a MongoDB projection. The ``id`` field is always included.
+
+    Args:
+        document_type: An instance of ``pydantic.BaseModel``
+        fields: The comma separated fields. All fields are included if ``None``.
+
+    Returns
+        A projection for ``find`` and ``find_one``
+
+    """
+    if fields is None:
+        return dict(DEFAULT_PROJECTION)
+    projection = {**DEFAULT_PROJECTION, "id": 1}
+    for field in filter(None, (field.strip() for field in fields.split(","))):
+        if field not in document_type.__fields__:
+            raise HTTPException(
+                status_code=422,
+                detail=f"{document_type.__name__} has no field '{field}'",
+            )
+        projection[field] = 1
+    return projection
+
+
+def apply_projection(document: Dict, projection: Dict) -> Dict:
+    """Apply a projection returned by ``resolve_projection`` to a document
+    that was read without it, e.g. from the cache."""
+    if not any(projection.values()):
+        return {k: v for k, v in document.items() if k not in projection}
+    return {k: v for k, v in document.items() if projection.get(k)}
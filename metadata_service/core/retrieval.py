@@ -0,0 +1,304 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Shared read path for retrieving documents from the metadata store.
+"""
+from typing import AsyncIterator, Dict, List, Optional, Type
+from fastapi.exceptions import HTTPException
+from pydantic import BaseModel
+from pymongo import ASCENDING
+from metadata_service.config import get_config
+from metadata_service.core.aggregation import aggregate_embedded, use_lookup_engine
+from metadata_service.core.pagination import keyset_query
+from metadata_service.core.cache import get_cache, is_missing, mark_missing
+from metadata_service.core.projection import (
+    DEFAULT_PROJECTION,
+    apply_projection,
+    resolve_projection,
+)
+from metadata_service.core.singleflight import document_reads
+from metadata_service.core.utils import (
+    embed_documents,
+    embed_references,
+    resolve_embed_paths,
+)
+from metadata_service.core.views import get_materialized, is_materialized
+from metadata_service.database import DBConnect
+
+
+async def get_document(  # pylint: disable=too-many-arguments
+    document_id: str,
+    document_type: Type[BaseModel],
+    embedded: bool = False,
+    engine: Optional[str] = None,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+    fields: Optional[str] = None,
+) -> Optional[Dict]:
+    """Given a document ID and a document type, get the document from the
+    metadata store and optionally embed its references.
+
+    References are embedded if ``embedded`` is set or if ``embed`` or ``depth``
+    is given. Fully embedded documents are read from the materialized view if
+    one is configured for the collection and no ``engine`` is requested.
+    Concurrent identical reads share a single in-flight read and its result.
+
+    Args:
+        document_id: The ID of the document
+        document_type: An instance of ``pydantic.BaseModel``
+        embedded: Whether or not to embed references. ``False``, by default.
+        engine: The embedding engine, ``client`` or ``lookup``. Defaults to
+            the ``embed_engine`` setting.
+        embed: Comma separated reference paths to embed, e.g.
+            ``has_study,has_data_access_policy.has_data_access_committee``.
+            All references are embedded if ``None``.
+        depth: The maximum number of reference levels to embed. Unlimited if ``None``.
+        fields: Comma separated fields to read, e.g. ``id,title,type``.
+            All fields are read if ``None``.
+
+    Returns
+        The document, or ``None`` if it does not exist
+
+    """
+    collection_name = document_type.__collection__
+    return await document_reads.run(
+        (collection_name, document_id, embedded, engine, embed, depth, fields),
+        lambda: _get_document(
+            document_id, document_type, embedded, engine, embed, depth, fields
+        ),
+    )
+
+
+async def _get_document(  # pylint: disable=too-many-arguments
+    document_id: str,
+    document_type: Type[BaseModel],
+    embedded: bool,
+    engine: Optional[str],
+    embed: Optional[str],
+    depth: Optional[int],
+    fields: Optional[str],
+) -> Optional[Dict]:
+    """Read a document as described in ``get_document``."""
+    paths = resolve_embed_paths(document_type, embed)
+    projection = resolve_projection(document_type, fields)
+    full = embedded and paths is None and depth is None
+    if full and engine is None and is_materialized(document_type.__collection__):
+        return await get_materialized(document_id, document_type, projection)
+    embedded = embedded or paths is not None or depth is not None
+    if embedded and use_lookup_engine(engine):
+        return await aggregate_embedded(
+            document_id, document_type, paths, depth, projection
+        )
+    document = await _find_one(document_id, document_type, projection)
+    if document and embedded:
+        document = await embed_references(document, document_type, paths, depth)
+    return document
+
+
+async def _find_one(
+    document_id: str, document_type: Type[BaseModel], projection: Dict
+) -> Optional[Dict]:
+    """Read a single document through the document cache. Cached documents are
+    projected in memory. On a miss, a projected read bypasses the cache, so
+    that unrequested fields are still never read from the metadata store.
+    IDs that were recently not found are not looked up again."""
+    cache = get_cache()
+    key = (document_type.__collection__, document_id)
+    document = cache.get(key)
+    if document is not None:
+        return apply_projection(document, projection)
+    if is_missing(*key):
+        return None
+    db_connect = DBConnect()
+    collection = await db_connect.get_collection(document_type.__collection__)
+    document = await collection.find_one({"id": document_id}, projection)  # type: ignore
+    if document is None:
+        mark_missing(*key)
+    elif projection == DEFAULT_PROJECTION:
+        cache.put(key, document)
+    return document
+
+
+async def get_documents(
+    document_ids: List[str],
+    document_type: Type[BaseModel],
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+) -> List[Dict]:
+    """Given a list of document IDs and a document type, get the documents from
+    the metadata store with a single ``$in`` query and optionally embed their
+    references with the batched embedder.
+
+    Args:
+        document_ids: The IDs of the documents
+        document_type: An instance of ``pydantic.BaseModel``
+        embedded: Whether or not to embed references. ``False``, by default.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+
+    Returns
+        One result per requested ID, in request order. Each result holds the
+        ``id``, whether the document was ``found`` and the ``record`` itself.
+
+    """
+    max_batch_size = get_config().max_batch_size
+    if len(document_ids) > max_batch_size:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {max_batch_size} IDs can be requested at once",
+        )
+    paths = resolve_embed_paths(document_type, embed)
+    db_connect = DBConnect()
+    collection = await db_connect.get_collection(document_type.__collection__)
+    docs = await collection.find(  # type: ignore
+        {"id": {"$in": list(set(document_ids))}}, {"_id": 0}
+    ).to_list(None)
+    if embedded or paths is not None or depth is not None:
+        await embed_documents(docs, document_type, paths, depth)
+    found = {doc["id"]: doc for doc in docs}
+    return [
+        {
+            "id": document_id,
+            "found": document_id in found,
+            "record": found.get(document_id),
+        }
+        for document_id in document_ids
+    ]
+
+
+async def find_documents(
+    document_type: Type[BaseModel],
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> List[Dict]:
+    """Retrieve a page of documents of a given type from the metadata store.
+
+    Pages are ordered by ``id`` and selected with a keyset query, so the cost
+    of a page does not depend on its position in the collection. Filters are
+    served by the indexes created by ``ensure_indexes``.
+
+    Args:
+        document_type: An instance of ``pydantic.BaseModel``
+        limit: The maximum number of documents. All documents are returned if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values that the filter fields declared in ``__filters__``
+            must match. Filters that are ``None`` are ignored.
+
+    Returns
+        A list of documents
+
+    """
+    projection = resolve_projection(document_type, fields)
+    db_connect = DBConnect()
+    collection = await db_connect.get_collection(document_type.__collection__)
+    query = {**filter_query(document_type, filters), **keyset_query(cursor)}
+    documents = collection.find(query, projection)  # type: ignore
+    if limit is not None or cursor is not None:
+        documents = documents.sort("id", ASCENDING)
+    if limit is not None:
+        documents = documents.limit(limit)
+    return await documents.to_list(None)
+
+
+async def iterate_documents(
+    document_type: Type[BaseModel],
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> AsyncIterator[Dict]:
+    """Iterate over documents of a given type directly from a database cursor,
+    fetching ``stream_batch_size`` documents per round trip.
+
+    Args:
+        document_type: An instance of ``pydantic.BaseModel``
+        limit: The maximum number of documents. All documents are returned if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values that the filter fields declared in ``__filters__``
+            must match. Filters that are ``None`` are ignored.
+
+    Yields
+        The projected documents
+
+    """
+    projection = resolve_projection(document_type, fields)
+    db_connect = DBConnect()
+    collection = await db_connect.get_collection(document_type.__collection__)
+    query = {**filter_query(document_type, filters), **keyset_query(cursor)}
+    documents = collection.find(query, projection)  # type: ignore
+    documents = documents.batch_size(get_config().stream_batch_size)
+    if limit is not None or cursor is not None:
+        documents = documents.sort("id", ASCENDING)
+    if limit is not None:
+        documents = documents.limit(limit)
+    async for document in documents:
+        yield document
+
+
+async def count_documents(
+    document_type: Type[BaseModel], filters: Optional[Dict] = None, exact: bool = True
+) -> Dict:
+    """Count the documents of a given type in the metadata store.
+
+    Unfiltered counts that need not be exact are estimated from the collection
+    metadata instead of scanning the ``id`` index. Filtered counts are always
+    exact, as they are served by the filter indexes.
+
+    Args:
+        document_type: An instance of ``pydantic.BaseModel``
+        filters: Values that the filter fields declared in ``__filters__``
+            must match. Filters that are ``None`` are ignored.
+        exact: Whether the count must be exact
+
+    Returns
+        A dictionary with the ``count`` and whether it is ``exact``
+
+    """
+    query = filter_query(document_type, filters)
+    db_connect = DBConnect()
+    collection = await db_connect.get_collection(document_type.__collection__)
+    if not exact and not query:
+        count = await collection.estimated_document_count()  # type: ignore
+        return {"count": count, "exact": False}
+    count = await collection.count_documents(query)  # type: ignore
+    return {"count": count, "exact": True}
+
+
+def filter_query(
+    document_type: Type[BaseModel], filters: Optional[Dict] = None
+) -> Dict:
+    """Translate filter values into a query on the fields declared in the
+    ``__filters__`` of a model. Filters that are ``None`` are ignored.
+
+    Args:
+        document_type: An instance of ``pydantic.BaseModel``
+        filters: A dictionary that maps filter fields to the values to match
+
+    Returns
+        The query that selects the matching documents
+
+    """
+    query = {}
+    for field, value in (filters or {}).items():
+        if field not in document_type.__filters__:
+            raise ValueError(f"{document_type.__name__} cannot be filtered by {field}")
+        if value is not None:
+            query[field] = value
+    return query
@@ -0,0 +1,208 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Serialization of documents read from the metadata store.
+
+By default, read routes return their documents through the ``response_model``
+of the route, which validates every document again, including each
+``Union[str, Model]`` reference. With the ``trusted_reads`` setting, the
+documents are serialized as read instead, with ``orjson`` if it is installed.
+The OpenAPI schema is unchanged, but fields that are absent from a document
+are omitted rather than returned as ``null``.
+
+If ``msgpack`` is installed, read routes also return ``application/msgpack``
+to clients that accept it. MessagePack responses are packed and streamed
+in chunks, descending into the lists of large documents.
+"""
+import json
+from typing import Any, Iterator, Optional
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from metadata_service.config import get_config
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore  # pylint: disable=invalid-name
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None  # type: ignore  # pylint: disable=invalid-name
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Approximate size of the chunks of a streamed MessagePack response
+MSGPACK_CHUNK_SIZE = 64 * 1024
+
+
+def _default(value: Any) -> Any:
+    """Serialize the values that have no JSON type, e.g. models, dates and
+    ObjectIds."""
+    if isinstance(value, BaseModel):
+        return value.dict(exclude_unset=True)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize documents to JSON, with ``orjson`` if it is installed.
+
+    Args:
+        content: A document, a list of documents or any JSON compatible value
+
+    Returns
+        The UTF-8 encoded JSON
+
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def strip_ids(content: Any) -> Any:
+    """Remove the ObjectId from a document or a list of documents, in case it
+    was not projected out by the query."""
+    if isinstance(content, dict):
+        content.pop("_id", None)
+    elif isinstance(content, list):
+        for document in content:
+            if isinstance(document, dict):
+                document.pop("_id", None)
+    return content
+
+
+class TrustedJSONResponse(JSONResponse):
+    """
+    A JSON response that serializes its content with ``dumps`` and without
+    any validation.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def trusted_response(content: Any, response: Response) -> TrustedJSONResponse:
+    """Build the response for documents that bypass the ``response_model`` of
+    the route.
+
+    Args:
+        content: The document or list of documents
+        response: The response whose headers are carried over
+
+    Returns
+        A JSON response with the documents as read from the metadata store
+
+    """
+    return TrustedJSONResponse(strip_ids(content), headers=dict(response.headers))
+
+
+def wants_msgpack(request: Request) -> bool:
+    """Whether the client asked for a MessagePack response in its ``Accept``
+    header and ``msgpack`` is installed."""
+    return msgpack is not None and MSGPACK_MEDIA_TYPE in request.headers.get(
+        "accept", ""
+    )
+
+
+def _pack(packer: Any, value: Any) -> Iterator[bytes]:
+    """Pack a value piece by piece. Lists are packed item by item, and so are
+    documents that contain lists, such as embedded references."""
+    if isinstance(value, list):
+        yield packer.pack_array_header(len(value))
+        for item in value:
+            yield from _pack(packer, item)
+    elif isinstance(value, dict) and any(
+        isinstance(item, (list, dict)) for item in value.values()
+    ):
+        yield packer.pack_map_header(len(value))
+        for key, item in value.items():
+            yield packer.pack(key)
+            yield from _pack(packer, item)
+    else:
+        yield packer.pack(value)
+
+
+def msgpack_chunks(content: Any) -> Iterator[bytes]:
+    """Serialize documents to MessagePack in chunks of about
+    ``MSGPACK_CHUNK_SIZE`` bytes.
+
+    Args:
+        content: A document, a list of documents or any JSON compatible value
+
+    Yields
+        The chunks of the MessagePack encoding of ``content``
+
+    """
+    packer = msgpack.Packer(default=_default)
+    buffer = bytearray()
+    for part in _pack(packer, content):
+        buffer += part
+        if len(buffer) >= MSGPACK_CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def msgpack_response(content: Any, response: Response) -> StreamingResponse:
+    """Stream documents to the client as MessagePack.
+
+    Args:
+        content: The document or list of documents
+        response: The response whose headers are carried over
+
+    Returns
+        A streaming response with the documents as read from the metadata store
+
+    """
+    return StreamingResponse(
+        msgpack_chunks(strip_ids(content)),
+        media_type=MSGPACK_MEDIA_TYPE,
+        headers=dict(response.headers),
+    )
+
+
+def read_response(
+    content: Any,
+    response: Response,
+    fields: Any = None,
+    request: Optional[Request] = None,
+) -> Any:
+    """Return the documents of a read route. MessagePack responses, projected
+    documents and, with the ``trusted_reads`` setting, all documents bypass the
+    ``response_model`` of the route, which would fill omitted fields with
+    ``None``.
+
+    Args:
+        content: The document or list of documents
+        response: The response whose headers are carried over
+        fields: The fields that were projected, if any
+        request: The request, whose ``Accept`` header selects MessagePack
+
+    Returns
+        Either ``content`` itself, a ``TrustedJSONResponse`` or a MessagePack
+        streaming response
+
+    """
+    if request is not None and wants_msgpack(request):
+        return msgpack_response(content, response)
+    if fields is not None or get_config().trusted_reads:
+        return trusted_response(content, response)
+    return content
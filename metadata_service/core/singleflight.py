@@ -0,0 +1,68 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Coalescing of concurrent identical reads into a single in-flight call.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers that arrive while a call
+    for the same key is in flight wait for that call and share its result or
+    exception instead of starting their own.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Tuple, asyncio.Future] = {}
+
+    async def run(self, key: Tuple, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``func``, or join the call in flight for ``key``.
+
+        A caller that is cancelled does not cancel the shared call, so the
+        other callers still receive its result.
+
+        Args:
+            key: Identifies identical calls
+            func: Starts the call
+
+        Returns
+            The result of the call. Dictionaries are copied for every caller,
+            so that callers can change their top-level fields independently.
+
+        """
+        future = self.calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self.calls[key] = future
+            future.add_done_callback(lambda done: self._done(key, done))
+        result = await asyncio.shield(future)
+        return dict(result) if isinstance(result, dict) else result
+
+    def forget(self, prefix: Tuple) -> None:
+        """Let later callers start a new call instead of joining the calls in
+        flight whose key starts with ``prefix``, e.g. after a write."""
+        for key in [key for key in self.calls if key[: len(prefix)] == prefix]:
+            del self.calls[key]
+
+    def _done(self, key: Tuple, future: asyncio.Future) -> None:
+        """Remove a finished call, unless it was already replaced."""
+        if self.calls.get(key) is future:
+            del self.calls[key]
+
+
+# Reads of single documents, keyed by collection and ID first
+document_reads = SingleFlight()
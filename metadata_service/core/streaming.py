@@ -0,0 +1,56 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Streaming of list responses as newline delimited JSON (NDJSON).
+"""
+from typing import AsyncIterator, Dict
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from metadata_service.config import get_config
+from metadata_service.core.serialization import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Whether the client asked for an NDJSON response in its ``Accept`` header."""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def _ndjson_lines(documents: AsyncIterator[Dict]) -> AsyncIterator[bytes]:
+    """Serialize documents to NDJSON, yielding one chunk per ``stream_batch_size``
+    documents."""
+    batch_size = get_config().stream_batch_size
+    lines = []
+    async for document in documents:
+        lines.append(dumps(document))
+        if len(lines) >= batch_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def ndjson_response(documents: AsyncIterator[Dict]) -> StreamingResponse:
+    """Stream documents to the client as they are read from the metadata store.
+
+    Args:
+        documents: An async iterator over the documents
+
+    Returns
+        A streaming response with one JSON document per line
+
+    """
+    return StreamingResponse(_ndjson_lines(documents), media_type=NDJSON_MEDIA_TYPE)
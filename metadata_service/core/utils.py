@@ -15,38 +15,74 @@
 """
 Core uilities for the functionality of Metadata Service API.
 """
+import asyncio
 import logging
 import datetime
-from typing import Dict
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Type, Union
+from fastapi.exceptions import HTTPException
 from pydantic import BaseModel
+from metadata_service.config import get_config
+from metadata_service.core.cache import get_cache, is_missing, mark_missing
 from metadata_service.database import DBConnect
 
+EmbedPaths = Dict[str, Dict]
 
-async def _get_reference(document_id: str, collection_name: str) -> Dict:
-    """Given a document ID and a collection name, query the metadata store
-    and return the document.
+
+async def _get_references(
+    document_ids: Iterable[str], collection_name: str, use_cache: bool = True
+) -> Dict[str, Dict]:
+    """Given document IDs and a collection name, return the documents found in
+    the document cache and query the metadata store for the others with a
+    single ``$in`` query. Dangling references are remembered in the negative
+    cache, so they are only queried and logged once per ``negative_cache_ttl``.
 
     Args:
-        document_id: The ID of the document
-        collection_name: The collection in the metadata store that has the document
+        document_ids: The IDs of the documents
+        collection_name: The collection in the metadata store that has the documents
+        use_cache: Whether documents may be read from the caches. Reads whose
+            result is persisted must not, as the caches may be stale.
 
     Returns
-        The document corresponding to ``document_id``
+        A dictionary that maps each found ID to its document
 
     """
+    cache = get_cache()
+    found = {}
+    missing = []
+    for document_id in document_ids:
+        document = cache.get((collection_name, document_id)) if use_cache else None
+        if document is not None:
+            found[document_id] = document
+        elif not use_cache or not is_missing(collection_name, document_id):
+            missing.append(document_id)
+    if not missing:
+        return found
     db_connect = DBConnect()
     collection = await db_connect.get_collection(collection_name)
-    doc = await collection.find_one({"id": document_id})  # type: ignore
-    if not doc:
-        logging.warning(
-            "Reference with ID %s not found in collection %s",
-            document_id,
-            collection_name,
-        )
-    return doc
+    docs = await collection.find(  # type: ignore
+        {"id": {"$in": missing}}, {"_id": 0}
+    ).to_list(None)
+    for doc in docs:
+        cache.put((collection_name, doc["id"]), doc)
+        found[doc["id"]] = doc
+    for document_id in missing:
+        if document_id not in found:
+            mark_missing(collection_name, document_id)
+            logging.warning(
+                "Reference with ID %s not found in collection %s",
+                document_id,
+                collection_name,
+            )
+    return found
 
 
-async def embed_references(parent_document: Dict, document_type: BaseModel) -> Dict:
+async def embed_references(
+    parent_document: Dict,
+    document_type: Type[BaseModel],
+    paths: Optional[EmbedPaths] = None,
+    depth: Optional[int] = None,
+) -> Dict:
     """Given a document and a document type, identify the references in ``parent_document``
     and query the metadata store. After retrieving the referenced objects, embed them in place
     of the reference in the parent document.
@@ -54,35 +90,243 @@ async def embed_references(parent_document: Dict, document_type: BaseModel) -> D
     Args:
         parent_document: The parent document that has one or more references
         document_type: An instance of ``pydantic.BaseModel``
+        paths: The reference paths to embed, as returned by ``resolve_embed_paths``.
+            All references are embedded if ``None``.
+        depth: The maximum number of reference levels to embed. Unlimited if ``None``.
 
     Returns
         The denormalize/embedded document
 
     """
+    await embed_documents([parent_document], document_type, paths, depth)
+    return parent_document
+
+
+class EmbedContext:
+    """
+    Request-scoped state shared while embedding references.
+
+    The context acts as an identity map keyed by ``(collection, id)``: each
+    referenced document is fetched from the metadata store at most once per
+    request, and documents referenced several times at the same depth share
+    one embedded subtree. A reference to a document that is already one of
+    its own ancestors is left as an ID, so cyclic references terminate.
+    """
+
+    def __init__(self, max_depth: Optional[int] = None, use_cache: bool = True):
+        self.max_depth = max_depth
+        self.use_cache = use_cache
+        self.semaphore = asyncio.Semaphore(get_config().embed_concurrency)
+        self.documents: Dict[Tuple[str, str], Optional[Dict]] = {}
+        self.embedded: Dict[Tuple[str, str, int, int], Dict] = {}
+
+    async def fetch(self, document_ids: Iterable[str], collection_name: str) -> None:
+        """Fetch all documents that are not yet in the identity map."""
+        missing = [
+            document_id
+            for document_id in document_ids
+            if (collection_name, document_id) not in self.documents
+        ]
+        if not missing:
+            return
+        async with self.semaphore:
+            found = await _get_references(missing, collection_name, self.use_cache)
+        for document_id in missing:
+            self.documents[(collection_name, document_id)] = found.get(document_id)
+
+    def place(  # pylint: disable=too-many-arguments
+        self,
+        document_id: str,
+        collection_name: str,
+        depth: int,
+        paths: Optional[EmbedPaths],
+        ancestors: FrozenSet[Tuple[str, str]],
+        created: List[Tuple[Dict, FrozenSet[Tuple[str, str]]]],
+    ) -> Union[None, str, Dict]:
+        """Return the embedded document for a reference at a given depth and
+        with the given paths below it. Documents that still need their own
+        references embedded are appended to ``created`` together with their
+        ancestors."""
+        key = (collection_name, document_id)
+        if key in ancestors:
+            logging.debug("Not embedding cyclic reference %s", key)
+            return document_id
+        document = self.documents.get(key)
+        if document is None:
+            return None
+        placement = (collection_name, document_id, depth, id(paths))
+        embedded = self.embedded.get(placement)
+        if embedded is None:
+            embedded = dict(document)
+            self.embedded[placement] = embedded
+            created.append((embedded, ancestors | {key}))
+        return embedded
+
+
+async def embed_documents(
+    documents: List[Dict],
+    document_type: Type[BaseModel],
+    paths: Optional[EmbedPaths] = None,
+    depth: Optional[int] = None,
+    use_cache: bool = True,
+) -> List[Dict]:
+    """Embed the references of several documents of the same type in place.
+
+    References are resolved level by level: all IDs that a reference field
+    holds at a given depth are fetched with one query, so the number of queries
+    grows with the reference depth, not with the number of references.
+    Sibling reference fields and their subtrees are resolved concurrently,
+    bounded by the ``embed_concurrency`` setting. Dangling references are
+    replaced by ``None``.
+
+    Args:
+        documents: The parent documents that have one or more references
+        document_type: An instance of ``pydantic.BaseModel``
+        paths: The reference paths to embed, as returned by ``resolve_embed_paths``.
+            All references are embedded if ``None``.
+        depth: The maximum number of reference levels to embed. Unlimited if ``None``.
+        use_cache: Whether referenced documents may be read from the caches
+
+    Returns
+        The denormalized/embedded documents
+
+    """
+    level = [
+        (document, frozenset({(document_type.__collection__, document["id"])}))
+        for document in documents
+        if document
+    ]
+    context = EmbedContext(depth, use_cache)
+    for document, _ in level:
+        key = (document_type.__collection__, document["id"])
+        context.documents[key] = dict(document)
+    await _embed_level(level, document_type, paths, 1, context)
+    return documents
+
+
+async def _embed_level(
+    level: List[Tuple[Dict, FrozenSet[Tuple[str, str]]]],
+    document_type: Type[BaseModel],
+    paths: Optional[EmbedPaths],
+    depth: int,
+    context: EmbedContext,
+) -> None:
+    """Concurrently embed the selected reference fields of the documents in
+    ``level``, grouping fields that point to the same collection and share the
+    same paths below them into one query."""
+    if context.max_depth is not None and depth > context.max_depth:
+        return
+    groups: Dict[Tuple[str, int], List[Tuple[str, Type[BaseModel]]]] = defaultdict(list)
+    subpaths: Dict[Tuple[str, int], Optional[EmbedPaths]] = {}
     for field, referenced_obj in document_type.__references__:
-        if field in parent_document and parent_document[field]:
-            if isinstance(parent_document[field], str):
-                referenced_doc = await _get_reference(
-                    parent_document[field], referenced_obj.__collection__
-                )
-                referenced_doc = await embed_references(referenced_doc, referenced_obj)
-                parent_document[field] = referenced_doc
-            elif isinstance(parent_document[field], (list, set, tuple)):
-                docs = []
-                for ref in parent_document[field]:
-                    referenced_doc = await _get_reference(
-                        ref, referenced_obj.__collection__
-                    )
-                    referenced_doc = await embed_references(
-                        referenced_doc, referenced_obj
-                    )
-                    docs.append(referenced_doc)
-                parent_document[field] = docs
-            else:
-                raise ValueError(
-                    f"Unexpected value type for field {field} in parent object {parent_document}"
+        if paths is not None and field not in paths:
+            continue
+        subtree = None if paths is None else paths[field]
+        group = (referenced_obj.__collection__, id(subtree))
+        groups[group].append((field, referenced_obj))
+        subpaths[group] = subtree
+    await asyncio.gather(
+        *(
+            _embed_fields(level, fields, subpaths[group], depth, context)
+            for group, fields in groups.items()
+        )
+    )
+
+
+async def _embed_fields(
+    level: List[Tuple[Dict, FrozenSet[Tuple[str, str]]]],
+    fields: List[Tuple[str, Type[BaseModel]]],
+    paths: Optional[EmbedPaths],
+    depth: int,
+    context: EmbedContext,
+) -> None:
+    """Fetch the documents referenced by ``fields``, embed them and descend
+    into the subtree of the referenced documents."""
+    referenced_obj = fields[0][1]
+    collection_name = referenced_obj.__collection__
+    ids = {
+        ref
+        for document, _ in level
+        for field, _ in fields
+        for ref in _reference_ids(document, field)
+    }
+    if not ids:
+        return
+    await context.fetch(ids, collection_name)
+    created = _place_fields(level, fields, paths, depth, context)
+    if created:
+        await _embed_level(created, referenced_obj, paths, depth + 1, context)
+
+
+def _place_fields(
+    level: List[Tuple[Dict, FrozenSet[Tuple[str, str]]]],
+    fields: List[Tuple[str, Type[BaseModel]]],
+    paths: Optional[EmbedPaths],
+    depth: int,
+    context: EmbedContext,
+) -> List[Tuple[Dict, FrozenSet[Tuple[str, str]]]]:
+    """Replace the references of ``fields`` with the fetched documents and
+    return the documents that still need their own references embedded."""
+    collection_name = fields[0][1].__collection__
+    created: List[Tuple[Dict, FrozenSet[Tuple[str, str]]]] = []
+    for document, ancestors in level:
+        for field, _ in fields:
+            value = document.get(field)
+            if not value:
+                continue
+            refs = [value] if isinstance(value, str) else value
+            docs = [
+                context.place(ref, collection_name, depth, paths, ancestors, created)
+                for ref in refs
+            ]
+            document[field] = docs[0] if isinstance(value, str) else docs
+    return created
+
+
+def resolve_embed_paths(
+    document_type: Type[BaseModel], embed: Optional[str]
+) -> Optional[EmbedPaths]:
+    """Parse a comma separated list of dotted reference paths, such as
+    ``has_study,has_data_access_policy.has_data_access_committee``, into a
+    tree of reference fields. Only the fields on these paths are embedded.
+
+    Args:
+        document_type: An instance of ``pydantic.BaseModel``
+        embed: The comma separated reference paths
+
+    Returns
+        A nested dictionary of reference fields, or ``None`` if ``embed`` is ``None``
+
+    """
+    if embed is None:
+        return None
+    tree: EmbedPaths = {}
+    for path in embed.split(","):
+        node, model = tree, document_type
+        for field in filter(None, path.strip().split(".")):
+            references = dict(model.__references__)
+            if field not in references:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"{model.__name__} has no reference field '{field}'",
                 )
-    return parent_document
+            node = node.setdefault(field, {})
+            model = references[field]
+    return tree
+
+
+def _reference_ids(document: Dict, field: str) -> List[str]:
+    """Return the IDs referenced by ``field`` of ``document`` as a list."""
+    value = document.get(field)
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, (list, set, tuple)):
+        return list(value)
+    raise ValueError(
+        f"Unexpected value type for field {field} in parent object {document}"
+    )
 
 
 async def get_timestamp() -> str:
@@ -0,0 +1,192 @@
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Materialized views that hold the fully embedded form of documents.
+
+For every collection listed in the ``materialized_views`` setting, a view
+collection named ``<collection>_embedded`` holds the denormalized documents.
+The views are refreshed incrementally whenever a document they depend on is
+added or updated.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Type
+from fastapi import Response
+from pydantic import BaseModel
+from pymongo import DeleteOne, ReplaceOne
+from metadata_service.config import get_config
+from metadata_service.core.utils import embed_documents, get_timestamp
+from metadata_service.database import DBConnect
+from metadata_service.models import MODELS
+
+MATERIALIZED_AT = "_materialized_at"
+MATERIALIZED_AT_HEADER = "X-Materialized-At"
+
+
+def view_name(collection_name: str) -> str:
+    """Return the name of the view collection for a collection."""
+    return f"{collection_name}_embedded"
+
+
+def is_materialized(collection_name: str) -> bool:
+    """Whether a materialized view is configured for a collection."""
+    return collection_name in get_config().materialized_views
+
+
+def reverse_references(
+    models: Iterable[Type[BaseModel]] = tuple(MODELS),
+) -> Dict[str, List[Tuple[Type[BaseModel], str]]]:
+    """Invert the ``__references__`` of the given models.
+
+    Args:
+        models: The models to inspect
+
+    Returns
+        A dictionary that maps a collection name to the models and fields
+        that reference documents of this collection
+
+    """
+    referenced_by: Dict[str, List[Tuple[Type[BaseModel], str]]] = defaultdict(list)
+    for model in models:
+        for field, referenced_obj in model.__references__:
+            referenced_by[referenced_obj.__collection__].append((model, field))
+    return referenced_by
+
+
+async def materialize(
+    document_ids: Iterable[str], document_type: Type[BaseModel]
+) -> None:
+    """Embed the given documents and write them to the view of their collection.
+    Documents that no longer exist are removed from the view.
+
+    Args:
+        document_ids: The IDs of the documents to materialize
+        document_type: An instance of ``pydantic.BaseModel``
+
+    """
+    document_ids = list(document_ids)
+    db_connect = DBConnect()
+    collection = await db_connect.get_collection(document_type.__collection__)
+    view = await db_connect.get_collection(view_name(document_type.__collection__))
+    docs = await collection.find(  # type: ignore
+        {"id": {"$in": document_ids}}, {"_id": 0}
+    ).to_list(None)
+    # The per-worker caches may not have seen writes through other workers
+    # yet, and a stale subtree would persist in the view
+    await embed_documents(docs, document_type, use_cache=False)
+    timestamp = await get_timestamp()
+    found = set()
+    operations: List = []
+    for doc in docs:
+        found.add(doc["id"])
+        doc[MATERIALIZED_AT] = timestamp
+        operations.append(ReplaceOne({"id": doc["id"]}, doc, upsert=True))
+    operations.extend(
+        DeleteOne({"id": document_id})
+        for document_id in document_ids
+        if document_id not in found
+    )
+    if operations:
+        await view.bulk_write(operations, ordered=False)  # type: ignore
+
+
+async def refresh_views(collection_name: str, document_ids: Iterable[str]) -> None:
+    """Refresh all materialized documents that embed one of the changed
+    documents.
+
+    Starting from the changed documents, the reverse references are followed
+    upwards until the collections with a materialized view are reached, with
+    one query per referencing field and level for all documents at once.
+
+    Args:
+        collection_name: The collection of the added or updated documents
+        document_ids: The IDs of the added or updated documents
+
+    """
+    views = set(get_config().materialized_views)
+    changed = set(document_ids)
+    if not views or not changed:
+        return
+    referenced_by = reverse_references()
+    models = {model.__collection__: model for model in MODELS}
+    stale: Dict[str, Set[str]] = defaultdict(set)
+    visited = {(collection_name, document_id) for document_id in changed}
+    pending = {collection_name: changed}
+    while pending:
+        next_pending: Dict[str, Set[str]] = defaultdict(set)
+        for name, ids in pending.items():
+            if name in views:
+                stale[name].update(ids)
+            for key in await _referencing_documents(name, ids, referenced_by):
+                if key not in visited:
+                    visited.add(key)
+                    next_pending[key[0]].add(key[1])
+        pending = next_pending
+    for name, ids in stale.items():
+        await materialize(ids, models[name])
+
+
+async def _referencing_documents(
+    collection_name: str,
+    document_ids: Set[str],
+    referenced_by: Dict[str, List[Tuple[Type[BaseModel], str]]],
+) -> List[Tuple[str, str]]:
+    """Return the ``(collection, id)`` of every document that references one
+    of the given documents, as found through ``reverse_references``."""
+    db_connect = DBConnect()
+    referencing = []
+    for parent_model, field in referenced_by.get(collection_name, []):
+        parents = await db_connect.get_collection(parent_model.__collection__)
+        cursor = parents.find(  # type: ignore
+            {field: {"$in": list(document_ids)}}, {"id": 1}
+        )
+        async for parent in cursor:
+            referencing.append((parent_model.__collection__, parent["id"]))
+    return referencing
+
+
+async def get_materialized(
+    document_id: str, document_type: Type[BaseModel], projection: Optional[Dict] = None
+) -> Optional[Dict]:
+    """Given a document ID and a document type, get the embedded document from
+    the materialized view. A document that is missing from the view is
+    materialized first.
+
+    Args:
+        document_id: The ID of the document
+        document_type: An instance of ``pydantic.BaseModel``
+        projection: The projection of the document. All fields are read if ``None``.
+
+    Returns
+        The embedded document with its ``_materialized_at`` watermark,
+        or ``None`` if it does not exist
+
+    """
+    projection = dict(projection or {"_id": 0})
+    if any(projection.values()):
+        projection[MATERIALIZED_AT] = 1
+    db_connect = DBConnect()
+    view = await db_connect.get_collection(view_name(document_type.__collection__))
+    document = await view.find_one({"id": document_id}, projection)  # type: ignore
+    if document is None:
+        await materialize([document_id], document_type)
+        document = await view.find_one({"id": document_id}, projection)  # type: ignore
+    return document
+
+
+def add_watermark_header(response: Response, document: Dict) -> None:
+    """If ``document`` was read from a materialized view, move the time of
+    its materialization to the ``X-Materialized-At`` response header."""
+    if MATERIALIZED_AT in document:
+        response.headers[MATERIALIZED_AT_HEADER] = document.pop(MATERIALIZED_AT)
@@ -17,58 +17,150 @@
 Convenience methods for adding, updating, and retrieving Data Access Committee records
 """
 
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional
 from fastapi.exceptions import HTTPException
+from pymongo import ReturnDocument
 
-from metadata_service.core.utils import embed_references, get_timestamp
+from metadata_service.core.bulk import insert_documents
+from metadata_service.core.changes import publish_change
+from metadata_service.core.patch import patch_document
+from metadata_service.core.retrieval import (
+    count_documents,
+    find_documents,
+    get_document,
+    get_documents,
+    iterate_documents,
+)
+from metadata_service.core.utils import get_timestamp
+from metadata_service.core.views import refresh_views
 from metadata_service.database import DBConnect
-from metadata_service.models import DataAccessCommittee
+from metadata_service.models import PatchRequest, DataAccessCommittee
 
 COLLECTION_NAME = DataAccessCommittee.__collection__
 PREFIX = "DAC"
 
 
-async def retrieve_dacs() -> List[DataAccessCommittee]:
+async def retrieve_dacs(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> List[Dict]:
     """
     Retrieve a list of DACs from the metadata store.
 
+    Args:
+        limit: The maximum number of records. All records are returned if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+
     Returns:
       A list of DAC objects.
 
     """
-    db_connect = DBConnect()
-    collection = await db_connect.get_collection(COLLECTION_NAME)
-    dacs = await collection.find().to_list(None)  # type: ignore
-    await db_connect.close_db()
+    dacs = await find_documents(DataAccessCommittee, limit, cursor, fields, filters)
     return dacs
 
 
-async def get_dac(dac_id: str, embedded: bool = False) -> DataAccessCommittee:
+def stream_dacs(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> AsyncIterator[Dict]:
+    """
+    Stream DACs from the metadata store without loading them all into memory.
+
+    Args:
+        limit: The maximum number of records. All records are streamed if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+
+    Returns:
+        An async iterator over the DataAccessCommittee records.
+
+    """
+    return iterate_documents(DataAccessCommittee, limit, cursor, fields, filters)
+
+
+async def count_dacs(filters: Optional[Dict] = None, exact: bool = True) -> Dict:
+    """
+    Count the DACs in the metadata store.
+
+    Args:
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+        exact: Whether the count must be exact. Unfiltered counts are estimated
+            from the collection metadata if ``False``.
+
+    Returns:
+        The count and whether it is exact.
+
+    """
+    result = await count_documents(DataAccessCommittee, filters, exact)
+    return result
+
+
+async def get_dac(  # pylint: disable=too-many-arguments
+    dac_id: str,
+    embedded: bool = False,
+    engine: Optional[str] = None,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+    fields: Optional[str] = None,
+) -> Dict:
     """
     Given a DAC ID, get the DAC object from metadata store.
 
     Args:
         dac_id: The DAC ID
         embedded: Whether or not to embed references. ``False``, by default.
+        engine: The embedding engine, ``client`` or ``lookup``. Defaults to
+            the ``embed_engine`` setting.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+        fields: Comma separated fields to read. All fields are read if ``None``.
 
     Returns:
       The DAC object
 
     """
-    db_connect = DBConnect()
-    collection = await db_connect.get_collection(COLLECTION_NAME)
-    dac = await collection.find_one({"id": dac_id})  # type: ignore
+    dac = await get_document(
+        dac_id, DataAccessCommittee, embedded, engine, embed, depth, fields
+    )
     if not dac:
         raise HTTPException(
             status_code=404,
             detail=f"{DataAccessCommittee.__name__} with id '{dac_id}' not found",
         )
-    if embedded:
-        dac = await embed_references(dac, DataAccessCommittee)
-    await db_connect.close_db()
     return dac
 
 
+async def batch_get_dacs(
+    dac_ids: List[str],
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Given a list of DAC IDs, get the DAC objects from metadata store
+    with a single query.
+
+    Args:
+        dac_ids: The DAC IDs
+        embedded: Whether or not to embed references. ``False``, by default.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+
+    Returns:
+        One result per requested ID, in request order, that tells whether the
+        DAC was found.
+
+    """
+    return await get_documents(dac_ids, DataAccessCommittee, embedded, embed, depth)
+
+
 async def add_dac(data: DataAccessCommittee) -> DataAccessCommittee:
     """
     Add a DAC object to the metadata store.
@@ -88,9 +180,26 @@ async def add_dac(data: DataAccessCommittee) -> DataAccessCommittee:
     data.creation_date = timestamp
     data.update_date = timestamp
     await collection.insert_one(data.dict())  # type: ignore
-    await db_connect.close_db()
-    dac = await get_dac(dac_id)
-    return dac
+    await publish_change(COLLECTION_NAME, dac_id)
+    await refresh_views(COLLECTION_NAME, [dac_id])
+    return data
+
+
+async def bulk_add_dacs(data: List[DataAccessCommittee]) -> List[Dict]:
+    """
+    Add many DAC objects to the metadata store with a single write.
+    The IDs are reserved with a single counter increment.
+
+    Args:
+        data: The DAC objects
+
+    Returns:
+        One result per DAC, in request order, that tells whether it was
+        created.
+
+    """
+    results = await insert_documents(data, DataAccessCommittee, PREFIX)
+    return results
 
 
 async def update_dac(dac_id: str, data: DataAccessCommittee) -> DataAccessCommittee:
@@ -112,9 +221,39 @@ async def update_dac(dac_id: str, data: DataAccessCommittee) -> DataAccessCommit
         data.creation_date = None
     timestamp = await get_timestamp()
     data.update_date = timestamp
-    await collection.update_one(
-        {"id": dac_id}, {"$set": data.dict(exclude_none=True)}
-    )  # type: ignore
-    await db_connect.close_db()
-    dac = await get_dac(dac_id)
+    dac = await collection.find_one_and_update(  # type: ignore
+        {"id": dac_id},
+        {"$set": data.dict(exclude_none=True)},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not dac:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{DataAccessCommittee.__name__} with id '{dac_id}' not found",
+        )
+    await publish_change(COLLECTION_NAME, dac_id)
+    await refresh_views(COLLECTION_NAME, [dac_id])
+    return dac
+
+
+async def patch_dac(dac_id: str, data: PatchRequest) -> Dict:
+    """
+    Given a DAC ID and a patch, update only the patched fields of the
+    DAC in metadata store.
+
+    Args:
+        dac_id: The DAC ID
+        data: The fields to set and the list items to add or remove
+
+    Returns:
+        The patched DAC object
+
+    """
+    dac = await patch_document(dac_id, DataAccessCommittee, data)
+    if not dac:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{DataAccessCommittee.__name__} with id '{dac_id}' not found",
+        )
     return dac
@@ -16,58 +16,150 @@
 Convenience methods for adding, updating, and retrieving Data Access Policy records.
 """
 
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional
 from fastapi.exceptions import HTTPException
+from pymongo import ReturnDocument
 
-from metadata_service.core.utils import embed_references, get_timestamp
+from metadata_service.core.bulk import insert_documents
+from metadata_service.core.changes import publish_change
+from metadata_service.core.patch import patch_document
+from metadata_service.core.retrieval import (
+    count_documents,
+    find_documents,
+    get_document,
+    get_documents,
+    iterate_documents,
+)
+from metadata_service.core.utils import get_timestamp
+from metadata_service.core.views import refresh_views
 from metadata_service.database import DBConnect
-from metadata_service.models import DataAccessPolicy
+from metadata_service.models import PatchRequest, DataAccessPolicy
 
 COLLECTION_NAME = DataAccessPolicy.__collection__
 PREFIX = "DAP"
 
 
-async def retrieve_daps() -> List[DataAccessPolicy]:
+async def retrieve_daps(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> List[Dict]:
     """
     Retrieve a list of DAPs from metadata store.
 
+    Args:
+        limit: The maximum number of records. All records are returned if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+
     Returns:
         A list of DAP objects.
 
     """
-    db_connect = DBConnect()
-    collection = await db_connect.get_collection(COLLECTION_NAME)
-    daps = await collection.find().to_list(None)  # type: ignore
-    await db_connect.close_db()
+    daps = await find_documents(DataAccessPolicy, limit, cursor, fields, filters)
     return daps
 
 
-async def get_dap(dap_id: str, embedded: bool = False) -> DataAccessPolicy:
+def stream_daps(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> AsyncIterator[Dict]:
+    """
+    Stream DAPs from the metadata store without loading them all into memory.
+
+    Args:
+        limit: The maximum number of records. All records are streamed if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+
+    Returns:
+        An async iterator over the DataAccessPolicy records.
+
+    """
+    return iterate_documents(DataAccessPolicy, limit, cursor, fields, filters)
+
+
+async def count_daps(filters: Optional[Dict] = None, exact: bool = True) -> Dict:
+    """
+    Count the DAPs in the metadata store.
+
+    Args:
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+        exact: Whether the count must be exact. Unfiltered counts are estimated
+            from the collection metadata if ``False``.
+
+    Returns:
+        The count and whether it is exact.
+
+    """
+    result = await count_documents(DataAccessPolicy, filters, exact)
+    return result
+
+
+async def get_dap(  # pylint: disable=too-many-arguments
+    dap_id: str,
+    embedded: bool = False,
+    engine: Optional[str] = None,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+    fields: Optional[str] = None,
+) -> Dict:
     """
     Given a DAP ID, get the DAP object from metadata store.
 
     Args:
         dap_id: The DAP ID
         embedded: Whether or not to embed references. ``False``, by default.
+        engine: The embedding engine, ``client`` or ``lookup``. Defaults to
+            the ``embed_engine`` setting.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+        fields: Comma separated fields to read. All fields are read if ``None``.
 
     Returns:
         The DAP object
 
     """
-    db_connect = DBConnect()
-    collection = await db_connect.get_collection(COLLECTION_NAME)
-    dap = await collection.find_one({"id": dap_id})  # type: ignore
+    dap = await get_document(
+        dap_id, DataAccessPolicy, embedded, engine, embed, depth, fields
+    )
     if not dap:
         raise HTTPException(
             status_code=404,
             detail=f"{DataAccessPolicy.__name__} with id '{dap_id}' not found",
         )
-    if embedded:
-        dap = await embed_references(dap, DataAccessPolicy)
-    await db_connect.close_db()
     return dap
 
 
+async def batch_get_daps(
+    dap_ids: List[str],
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Given a list of DAP IDs, get the DAP objects from metadata store
+    with a single query.
+
+    Args:
+        dap_ids: The DAP IDs
+        embedded: Whether or not to embed references. ``False``, by default.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+
+    Returns:
+        One result per requested ID, in request order, that tells whether the
+        DAP was found.
+
+    """
+    return await get_documents(dap_ids, DataAccessPolicy, embedded, embed, depth)
+
+
 async def add_dap(data: DataAccessPolicy) -> DataAccessPolicy:
     """
     Add a DAP object to the metadata store.
@@ -87,9 +179,26 @@ async def add_dap(data: DataAccessPolicy) -> DataAccessPolicy:
     data.creation_date = timestamp
     data.update_date = timestamp
     await collection.insert_one(data.dict())  # type: ignore
-    await db_connect.close_db()
-    dap = await get_dap(dap_id)
-    return dap
+    await publish_change(COLLECTION_NAME, dap_id)
+    await refresh_views(COLLECTION_NAME, [dap_id])
+    return data
+
+
+async def bulk_add_daps(data: List[DataAccessPolicy]) -> List[Dict]:
+    """
+    Add many DAP objects to the metadata store with a single write.
+    The IDs are reserved with a single counter increment.
+
+    Args:
+        data: The DAP objects
+
+    Returns:
+        One result per DAP, in request order, that tells whether it was
+        created.
+
+    """
+    results = await insert_documents(data, DataAccessPolicy, PREFIX)
+    return results
 
 
 async def update_dap(dap_id: str, data: DataAccessPolicy) -> DataAccessPolicy:
@@ -111,9 +220,39 @@ async def update_dap(dap_id: str, data: DataAccessPolicy) -> DataAccessPolicy:
         data.creation_date = None
     timestamp = await get_timestamp()
     data.update_date = timestamp
-    await collection.update_one(
-        {"id": dap_id}, {"$set": data.dict(exclude_none=True)}
-    )  # type: ignore
-    await db_connect.close_db()
-    dap = await get_dap(dap_id)
+    dap = await collection.find_one_and_update(  # type: ignore
+        {"id": dap_id},
+        {"$set": data.dict(exclude_none=True)},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not dap:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{DataAccessPolicy.__name__} with id '{dap_id}' not found",
+        )
+    await publish_change(COLLECTION_NAME, dap_id)
+    await refresh_views(COLLECTION_NAME, [dap_id])
+    return dap
+
+
+async def patch_dap(dap_id: str, data: PatchRequest) -> Dict:
+    """
+    Given a DAP ID and a patch, update only the patched fields of the
+    DAP in metadata store.
+
+    Args:
+        dap_id: The DAP ID
+        data: The fields to set and the list items to add or remove
+
+    Returns:
+        The patched DAP object
+
+    """
+    dap = await patch_document(dap_id, DataAccessPolicy, data)
+    if not dap:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{DataAccessPolicy.__name__} with id '{dap_id}' not found",
+        )
     return dap
@@ -17,58 +17,150 @@
 Convenience methods for adding, updating, and retrieving Dataset records
 """
 
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional
 from fastapi.exceptions import HTTPException
+from pymongo import ReturnDocument
 
-from metadata_service.core.utils import embed_references, get_timestamp
+from metadata_service.core.bulk import insert_documents
+from metadata_service.core.changes import publish_change
+from metadata_service.core.patch import patch_document
+from metadata_service.core.retrieval import (
+    count_documents,
+    find_documents,
+    get_document,
+    get_documents,
+    iterate_documents,
+)
+from metadata_service.core.utils import get_timestamp
+from metadata_service.core.views import refresh_views
 from metadata_service.database import DBConnect
-from metadata_service.models import Dataset
+from metadata_service.models import PatchRequest, Dataset
 
 COLLECTION_NAME = Dataset.__collection__
 PREFIX = "DAT"
 
 
-async def retrieve_datasets() -> List[Dataset]:
+async def retrieve_datasets(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> List[Dict]:
     """
     Retrieve a list of Datasets from metadata store.
 
+    Args:
+        limit: The maximum number of records. All records are returned if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+
     Returns:
         A list of Dataset objects.
 
     """
-    db_connect = DBConnect()
-    collection = await db_connect.get_collection(COLLECTION_NAME)
-    datasets = await collection.find().to_list(None)  # type: ignore
-    await db_connect.close_db()
+    datasets = await find_documents(Dataset, limit, cursor, fields, filters)
     return datasets
 
 
-async def get_dataset(dataset_id: str, embedded: bool = False) -> Dataset:
+def stream_datasets(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> AsyncIterator[Dict]:
+    """
+    Stream Datasets from the metadata store without loading them all into memory.
+
+    Args:
+        limit: The maximum number of records. All records are streamed if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+
+    Returns:
+        An async iterator over the Dataset records.
+
+    """
+    return iterate_documents(Dataset, limit, cursor, fields, filters)
+
+
+async def count_datasets(filters: Optional[Dict] = None, exact: bool = True) -> Dict:
+    """
+    Count the Datasets in the metadata store.
+
+    Args:
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+        exact: Whether the count must be exact. Unfiltered counts are estimated
+            from the collection metadata if ``False``.
+
+    Returns:
+        The count and whether it is exact.
+
+    """
+    result = await count_documents(Dataset, filters, exact)
+    return result
+
+
+async def get_dataset(  # pylint: disable=too-many-arguments
+    dataset_id: str,
+    embedded: bool = False,
+    engine: Optional[str] = None,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+    fields: Optional[str] = None,
+) -> Dict:
     """
     Given a Datset ID, get the Dataset object from metadata store.
 
     Args:
         dataset_id: The Dataset ID
         embedded: Whether or not to embed references. ``False``, by default.
+        engine: The embedding engine, ``client`` or ``lookup``. Defaults to
+            the ``embed_engine`` setting.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+        fields: Comma separated fields to read. All fields are read if ``None``.
 
     Returns:
         The Dataset object
 
     """
-    db_connect = DBConnect()
-    collection = await db_connect.get_collection(COLLECTION_NAME)
-    dataset = await collection.find_one({"id": dataset_id})  # type: ignore
+    dataset = await get_document(
+        dataset_id, Dataset, embedded, engine, embed, depth, fields
+    )
     if not dataset:
         raise HTTPException(
             status_code=404,
             detail=f"{Dataset.__name__} with id '{dataset_id}' not found",
         )
-    if embedded:
-        dataset = await embed_references(dataset, Dataset)
-    await db_connect.close_db()
     return dataset
 
 
+async def batch_get_datasets(
+    dataset_ids: List[str],
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Given a list of Dataset IDs, get the Dataset objects from metadata store
+    with a single query.
+
+    Args:
+        dataset_ids: The Dataset IDs
+        embedded: Whether or not to embed references. ``False``, by default.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+
+    Returns:
+        One result per requested ID, in request order, that tells whether the
+        Dataset was found.
+
+    """
+    return await get_documents(dataset_ids, Dataset, embedded, embed, depth)
+
+
 async def add_dataset(data: Dataset) -> Dataset:
     """
     Add a Dataset object to the metadata store.
@@ -88,9 +180,26 @@ async def add_dataset(data: Dataset) -> Dataset:
     data.creation_date = timestamp
     data.update_date = timestamp
     await collection.insert_one(data.dict())  # type: ignore
-    await db_connect.close_db()
-    dataset = await get_dataset(dataset_id)
-    return dataset
+    await publish_change(COLLECTION_NAME, dataset_id)
+    await refresh_views(COLLECTION_NAME, [dataset_id])
+    return data
+
+
+async def bulk_add_datasets(data: List[Dataset]) -> List[Dict]:
+    """
+    Add many Dataset objects to the metadata store with a single write.
+    The IDs are reserved with a single counter increment.
+
+    Args:
+        data: The Dataset objects
+
+    Returns:
+        One result per Dataset, in request order, that tells whether it was
+        created.
+
+    """
+    results = await insert_documents(data, Dataset, PREFIX)
+    return results
 
 
 async def update_dataset(dataset_id: str, data: Dataset) -> Dataset:
@@ -112,9 +221,39 @@ async def update_dataset(dataset_id: str, data: Dataset) -> Dataset:
         data.creation_date = None
     timestamp = await get_timestamp()
     data.update_date = timestamp
-    await collection.update_one(
-        {"id": dataset_id}, {"$set": data.dict(exclude_none=True)}
-    )  # type: ignore
-    await db_connect.close_db()
-    dataset = await get_dataset(dataset_id)
+    dataset = await collection.find_one_and_update(  # type: ignore
+        {"id": dataset_id},
+        {"$set": data.dict(exclude_none=True)},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not dataset:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{Dataset.__name__} with id '{dataset_id}' not found",
+        )
+    await publish_change(COLLECTION_NAME, dataset_id)
+    await refresh_views(COLLECTION_NAME, [dataset_id])
+    return dataset
+
+
+async def patch_dataset(dataset_id: str, data: PatchRequest) -> Dict:
+    """
+    Given a Dataset ID and a patch, update only the patched fields of the
+    Dataset in metadata store.
+
+    Args:
+        dataset_id: The Dataset ID
+        data: The fields to set and the list items to add or remove
+
+    Returns:
+        The patched Dataset object
+
+    """
+    dataset = await patch_document(dataset_id, Dataset, data)
+    if not dataset:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{Dataset.__name__} with id '{dataset_id}' not found",
+        )
     return dataset
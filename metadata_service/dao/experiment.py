@@ -14,58 +14,150 @@
 # limitations under the License.
 """Convenience methods for adding, updating, and retrieving Experiment objects"""
 
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional
 from fastapi.exceptions import HTTPException
+from pymongo import ReturnDocument
 
-from metadata_service.core.utils import embed_references, get_timestamp
+from metadata_service.core.bulk import insert_documents
+from metadata_service.core.changes import publish_change
+from metadata_service.core.patch import patch_document
+from metadata_service.core.retrieval import (
+    count_documents,
+    find_documents,
+    get_document,
+    get_documents,
+    iterate_documents,
+)
+from metadata_service.core.utils import get_timestamp
+from metadata_service.core.views import refresh_views
 from metadata_service.database import DBConnect
-from metadata_service.models import Experiment
+from metadata_service.models import PatchRequest, Experiment
 
 COLLECTION_NAME = Experiment.__collection__
 PREFIX = "EXP"
 
 
-async def retrieve_experiments() -> List[Experiment]:
+async def retrieve_experiments(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> List[Dict]:
     """
     Retrieve a list of Experiments from metadata store.
 
+    Args:
+        limit: The maximum number of records. All records are returned if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+
     Returns:
         A list of Experiment objects.
 
     """
-    db_connect = DBConnect()
-    collection = await db_connect.get_collection(COLLECTION_NAME)
-    experiments = await collection.find().to_list(None)  # type: ignore
-    await db_connect.close_db()
+    experiments = await find_documents(Experiment, limit, cursor, fields, filters)
     return experiments
 
 
-async def get_experiment(experiment_id: str, embedded: bool = False) -> Experiment:
+def stream_experiments(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> AsyncIterator[Dict]:
+    """
+    Stream Experiments from the metadata store without loading them all into memory.
+
+    Args:
+        limit: The maximum number of records. All records are streamed if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+
+    Returns:
+        An async iterator over the Experiment records.
+
+    """
+    return iterate_documents(Experiment, limit, cursor, fields, filters)
+
+
+async def count_experiments(filters: Optional[Dict] = None, exact: bool = True) -> Dict:
+    """
+    Count the Experiments in the metadata store.
+
+    Args:
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+        exact: Whether the count must be exact. Unfiltered counts are estimated
+            from the collection metadata if ``False``.
+
+    Returns:
+        The count and whether it is exact.
+
+    """
+    result = await count_documents(Experiment, filters, exact)
+    return result
+
+
+async def get_experiment(  # pylint: disable=too-many-arguments
+    experiment_id: str,
+    embedded: bool = False,
+    engine: Optional[str] = None,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+    fields: Optional[str] = None,
+) -> Dict:
     """
     Given an Experiment ID, get the Experiment object from metadata store.
 
     Args:
         experiment_id: The Experiment ID
         embedded: Whether or not to embed references. ``False``, by default.
+        engine: The embedding engine, ``client`` or ``lookup``. Defaults to
+            the ``embed_engine`` setting.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+        fields: Comma separated fields to read. All fields are read if ``None``.
 
     Returns:
         The Experiment object
 
     """
-    db_connect = DBConnect()
-    collection = await db_connect.get_collection(COLLECTION_NAME)
-    experiment = await collection.find_one({"id": experiment_id})  # type: ignore
+    experiment = await get_document(
+        experiment_id, Experiment, embedded, engine, embed, depth, fields
+    )
     if not experiment:
         raise HTTPException(
             status_code=404,
             detail=f"{Experiment.__name__} with id '{experiment_id}' not found",
         )
-    if embedded:
-        experiment = await embed_references(experiment, Experiment)
-    await db_connect.close_db()
     return experiment
 
 
+async def batch_get_experiments(
+    experiment_ids: List[str],
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Given a list of Experiment IDs, get the Experiment objects from metadata store
+    with a single query.
+
+    Args:
+        experiment_ids: The Experiment IDs
+        embedded: Whether or not to embed references. ``False``, by default.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+
+    Returns:
+        One result per requested ID, in request order, that tells whether the
+        Experiment was found.
+
+    """
+    return await get_documents(experiment_ids, Experiment, embedded, embed, depth)
+
+
 async def add_experiment(data: Experiment) -> Experiment:
     """
     Add an Experiment object to the metadata store.
@@ -85,9 +177,26 @@ async def add_experiment(data: Experiment) -> Experiment:
     data.creation_date = timestamp
     data.update_date = timestamp
     await collection.insert_one(data.dict())  # type: ignore
-    await db_connect.close_db()
-    experiment = await get_experiment(experiment_id)
-    return experiment
+    await publish_change(COLLECTION_NAME, experiment_id)
+    await refresh_views(COLLECTION_NAME, [experiment_id])
+    return data
+
+
+async def bulk_add_experiments(data: List[Experiment]) -> List[Dict]:
+    """
+    Add many Experiment objects to the metadata store with a single write.
+    The IDs are reserved with a single counter increment.
+
+    Args:
+        data: The Experiment objects
+
+    Returns:
+        One result per Experiment, in request order, that tells whether it was
+        created.
+
+    """
+    results = await insert_documents(data, Experiment, PREFIX)
+    return results
 
 
 async def update_experiment(experiment_id: str, data: Experiment) -> Experiment:
@@ -109,9 +218,39 @@ async def update_experiment(experiment_id: str, data: Experiment) -> Experiment:
         data.creation_date = None
     timestamp = await get_timestamp()
     data.update_date = timestamp
-    await collection.update_one(
-        {"id": experiment_id}, {"$set": data.dict(exclude_none=True)}
-    )  # type: ignore
-    await db_connect.close_db()
-    experiment = await get_experiment(experiment_id)
+    experiment = await collection.find_one_and_update(  # type: ignore
+        {"id": experiment_id},
+        {"$set": data.dict(exclude_none=True)},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not experiment:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{Experiment.__name__} with id '{experiment_id}' not found",
+        )
+    await publish_change(COLLECTION_NAME, experiment_id)
+    await refresh_views(COLLECTION_NAME, [experiment_id])
+    return experiment
+
+
+async def patch_experiment(experiment_id: str, data: PatchRequest) -> Dict:
+    """
+    Given an Experiment ID and a patch, update only the patched fields of the
+    Experiment in metadata store.
+
+    Args:
+        experiment_id: The Experiment ID
+        data: The fields to set and the list items to add or remove
+
+    Returns:
+        The patched Experiment object
+
+    """
+    experiment = await patch_document(experiment_id, Experiment, data)
+    if not experiment:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{Experiment.__name__} with id '{experiment_id}' not found",
+        )
     return experiment
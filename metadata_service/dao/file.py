@@ -16,56 +16,146 @@
 Convenience methods for adding, updating, and retrieving File objects
 """
 
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional
 from fastapi.exceptions import HTTPException
-
-from metadata_service.core.utils import embed_references, get_timestamp
+from pymongo import ReturnDocument
+
+from metadata_service.core.bulk import insert_documents
+from metadata_service.core.changes import publish_change
+from metadata_service.core.patch import patch_document
+from metadata_service.core.retrieval import (
+    count_documents,
+    find_documents,
+    get_document,
+    get_documents,
+    iterate_documents,
+)
+from metadata_service.core.utils import get_timestamp
+from metadata_service.core.views import refresh_views
 from metadata_service.database import DBConnect
-from metadata_service.models import File
+from metadata_service.models import PatchRequest, File
 
 COLLECTION_NAME = File.__collection__
 
 
-async def retrieve_files() -> List[File]:
+async def retrieve_files(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> List[Dict]:
     """
     Retrieve a list of File IDs from metadata store.
 
+    Args:
+        limit: The maximum number of records. All records are returned if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+
     Returns:
         A list of File objects.
 
     """
-    db_connect = DBConnect()
-    collection = await db_connect.get_collection(COLLECTION_NAME)
-    files = await collection.find().to_list(None)  # type: ignore
-    await db_connect.close_db()
+    files = await find_documents(File, limit, cursor, fields, filters)
     return files
 
 
-async def get_file(file_id: str, embedded: bool = False) -> File:
+def stream_files(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> AsyncIterator[Dict]:
+    """
+    Stream Files from the metadata store without loading them all into memory.
+
+    Args:
+        limit: The maximum number of records. All records are streamed if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+
+    Returns:
+        An async iterator over the File records.
+
+    """
+    return iterate_documents(File, limit, cursor, fields, filters)
+
+
+async def count_files(filters: Optional[Dict] = None, exact: bool = True) -> Dict:
+    """
+    Count the Files in the metadata store.
+
+    Args:
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+        exact: Whether the count must be exact. Unfiltered counts are estimated
+            from the collection metadata if ``False``.
+
+    Returns:
+        The count and whether it is exact.
+
+    """
+    result = await count_documents(File, filters, exact)
+    return result
+
+
+async def get_file(  # pylint: disable=too-many-arguments
+    file_id: str,
+    embedded: bool = False,
+    engine: Optional[str] = None,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+    fields: Optional[str] = None,
+) -> Dict:
     """
     Given a File ID, get the File object from metadata store.
 
     Args:
         file_id: The File ID
         embedded: Whether or not to embed references. ``False``, by default.
+        engine: The embedding engine, ``client`` or ``lookup``. Defaults to
+            the ``embed_engine`` setting.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+        fields: Comma separated fields to read. All fields are read if ``None``.
 
     Returns:
         The File object
 
     """
-    db_connect = DBConnect()
-    collection = await db_connect.get_collection(COLLECTION_NAME)
-    file = await collection.find_one({"id": file_id})  # type: ignore
+    file = await get_document(file_id, File, embedded, engine, embed, depth, fields)
     if not file:
         raise HTTPException(
             status_code=404, detail=f"{File.__name__} with id '{file_id}' not found"
         )
-    if embedded:
-        file = await embed_references(file, File)
-    await db_connect.close_db()
     return file
 
 
+async def batch_get_files(
+    file_ids: List[str],
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Given a list of File IDs, get the File objects from metadata store
+    with a single query.
+
+    Args:
+        file_ids: The File IDs
+        embedded: Whether or not to embed references. ``False``, by default.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+
+    Returns:
+        One result per requested ID, in request order, that tells whether the
+        File was found.
+
+    """
+    return await get_documents(file_ids, File, embedded, embed, depth)
+
+
 async def add_file(data: File) -> File:
     """
     Add a File object to the metadata store.
@@ -84,9 +174,26 @@ async def add_file(data: File) -> File:
     data.creation_date = timestamp
     data.update_date = timestamp
     await collection.insert_one(data.dict())  # type: ignore
-    await db_connect.close_db()
-    file = await get_file(file_id)
-    return file
+    await publish_change(COLLECTION_NAME, file_id)
+    await refresh_views(COLLECTION_NAME, [file_id])
+    return data
+
+
+async def bulk_add_files(data: List[File]) -> List[Dict]:
+    """
+    Add many File objects to the metadata store with a single write.
+    The records keep the IDs they were given.
+
+    Args:
+        data: The File objects
+
+    Returns:
+        One result per File, in request order, that tells whether it was
+        created.
+
+    """
+    results = await insert_documents(data, File)
+    return results
 
 
 async def update_file(file_id: str, data: File) -> File:
@@ -108,9 +215,39 @@ async def update_file(file_id: str, data: File) -> File:
         data.creation_date = None
     timestamp = await get_timestamp()
     data.update_date = timestamp
-    await collection.update_one(
-        {"id": file_id}, {"$set": data.dict(exclude_none=True)}
-    )  # type: ignore
-    await db_connect.close_db()
-    file = await get_file(file_id)
+    file = await collection.find_one_and_update(  # type: ignore
+        {"id": file_id},
+        {"$set": data.dict(exclude_none=True)},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not file:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{File.__name__} with id '{file_id}' not found",
+        )
+    await publish_change(COLLECTION_NAME, file_id)
+    await refresh_views(COLLECTION_NAME, [file_id])
+    return file
+
+
+async def patch_file(file_id: str, data: PatchRequest) -> Dict:
+    """
+    Given a File ID and a patch, update only the patched fields of the
+    File in metadata store.
+
+    Args:
+        file_id: The File ID
+        data: The fields to set and the list items to add or remove
+
+    Returns:
+        The patched File object
+
+    """
+    file = await patch_document(file_id, File, data)
+    if not file:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{File.__name__} with id '{file_id}' not found",
+        )
     return file
@@ -16,58 +16,152 @@
 Convenience methods for adding, updating, and retrieving Publication objects
 """
 
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional
 from fastapi.exceptions import HTTPException
+from pymongo import ReturnDocument
 
-from metadata_service.core.utils import embed_references, get_timestamp
+from metadata_service.core.bulk import insert_documents
+from metadata_service.core.changes import publish_change
+from metadata_service.core.patch import patch_document
+from metadata_service.core.retrieval import (
+    count_documents,
+    find_documents,
+    get_document,
+    get_documents,
+    iterate_documents,
+)
+from metadata_service.core.utils import get_timestamp
+from metadata_service.core.views import refresh_views
 from metadata_service.database import DBConnect
-from metadata_service.models import Publication
+from metadata_service.models import PatchRequest, Publication
 
 COLLECTION_NAME = Publication.__collection__
 PREFIX = "PMID"
 
 
-async def retrieve_publications() -> List[Publication]:
+async def retrieve_publications(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> List[Dict]:
     """
     Retrieve a list of Publications from metadata store.
 
+    Args:
+        limit: The maximum number of records. All records are returned if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+
     Returns:
         A list of Publication objects.
 
     """
-    db_connect = DBConnect()
-    collection = await db_connect.get_collection(COLLECTION_NAME)
-    publications = await collection.find().to_list(None)  # type: ignore
-    await db_connect.close_db()
+    publications = await find_documents(Publication, limit, cursor, fields, filters)
     return publications
 
 
-async def get_publication(publication_id: str, embedded: bool = False) -> Publication:
+def stream_publications(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> AsyncIterator[Dict]:
+    """
+    Stream Publications from the metadata store without loading them all into memory.
+
+    Args:
+        limit: The maximum number of records. All records are streamed if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+
+    Returns:
+        An async iterator over the Publication records.
+
+    """
+    return iterate_documents(Publication, limit, cursor, fields, filters)
+
+
+async def count_publications(
+    filters: Optional[Dict] = None, exact: bool = True
+) -> Dict:
+    """
+    Count the Publications in the metadata store.
+
+    Args:
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+        exact: Whether the count must be exact. Unfiltered counts are estimated
+            from the collection metadata if ``False``.
+
+    Returns:
+        The count and whether it is exact.
+
+    """
+    result = await count_documents(Publication, filters, exact)
+    return result
+
+
+async def get_publication(  # pylint: disable=too-many-arguments
+    publication_id: str,
+    embedded: bool = False,
+    engine: Optional[str] = None,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+    fields: Optional[str] = None,
+) -> Dict:
     """
     Given a Publication ID, get the Publication object from metadata store.
 
     Args:
         publication_id: The Publication ID
         embedded: Whether or not to embed references. ``False``, by default.
+        engine: The embedding engine, ``client`` or ``lookup``. Defaults to
+            the ``embed_engine`` setting.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+        fields: Comma separated fields to read. All fields are read if ``None``.
 
     Returns:
         The Publication object
 
     """
-    db_connect = DBConnect()
-    collection = await db_connect.get_collection(COLLECTION_NAME)
-    publication = await collection.find_one({"id": publication_id})  # type: ignore
+    publication = await get_document(
+        publication_id, Publication, embedded, engine, embed, depth, fields
+    )
     if not publication:
         raise HTTPException(
             status_code=404,
             detail=f"{Publication.__name__} with id '{publication_id}' not found",
         )
-    if embedded:
-        publication = await embed_references(publication, Publication)
-    await db_connect.close_db()
     return publication
 
 
+async def batch_get_publications(
+    publication_ids: List[str],
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Given a list of Publication IDs, get the Publication objects from metadata store
+    with a single query.
+
+    Args:
+        publication_ids: The Publication IDs
+        embedded: Whether or not to embed references. ``False``, by default.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+
+    Returns:
+        One result per requested ID, in request order, that tells whether the
+        Publication was found.
+
+    """
+    return await get_documents(publication_ids, Publication, embedded, embed, depth)
+
+
 async def add_publication(data: Publication) -> Publication:
     """
     Add a Publication object to the metadata store.
@@ -87,9 +181,26 @@ async def add_publication(data: Publication) -> Publication:
     data.creation_date = timestamp
     data.update_date = timestamp
     await collection.insert_one(data.dict())  # type: ignore
-    await db_connect.close_db()
-    publication = await get_publication(publication_id)
-    return publication
+    await publish_change(COLLECTION_NAME, publication_id)
+    await refresh_views(COLLECTION_NAME, [publication_id])
+    return data
+
+
+async def bulk_add_publications(data: List[Publication]) -> List[Dict]:
+    """
+    Add many Publication objects to the metadata store with a single write.
+    The IDs are reserved with a single counter increment.
+
+    Args:
+        data: The Publication objects
+
+    Returns:
+        One result per Publication, in request order, that tells whether it was
+        created.
+
+    """
+    results = await insert_documents(data, Publication, PREFIX)
+    return results
 
 
 async def update_publication(publication_id: str, data: Publication) -> Publication:
@@ -111,9 +222,39 @@ async def update_publication(publication_id: str, data: Publication) -> Publicat
         data.creation_date = None
     timestamp = await get_timestamp()
     data.update_date = timestamp
-    await collection.update_one(
-        {"id": publication_id}, {"$set": data.dict(exclude_none=True)}
-    )  # type: ignore
-    await db_connect.close_db()
-    publication = await get_publication(publication_id)
+    publication = await collection.find_one_and_update(  # type: ignore
+        {"id": publication_id},
+        {"$set": data.dict(exclude_none=True)},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not publication:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{Publication.__name__} with id '{publication_id}' not found",
+        )
+    await publish_change(COLLECTION_NAME, publication_id)
+    await refresh_views(COLLECTION_NAME, [publication_id])
+    return publication
+
+
+async def patch_publication(publication_id: str, data: PatchRequest) -> Dict:
+    """
+    Given a Publication ID and a patch, update only the patched fields of the
+    Publication in metadata store.
+
+    Args:
+        publication_id: The Publication ID
+        data: The fields to set and the list items to add or remove
+
+    Returns:
+        The patched Publication object
+
+    """
+    publication = await patch_document(publication_id, Publication, data)
+    if not publication:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{Publication.__name__} with id '{publication_id}' not found",
+        )
     return publication
@@ -17,59 +17,147 @@
 Convenience methods for adding, updating, and retrieving Study objects
 """
 
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional
 from fastapi.exceptions import HTTPException
+from pymongo import ReturnDocument
 
-from metadata_service.core.utils import embed_references, get_timestamp
+from metadata_service.core.bulk import insert_documents
+from metadata_service.core.changes import publish_change
+from metadata_service.core.patch import patch_document
+from metadata_service.core.retrieval import (
+    count_documents,
+    find_documents,
+    get_document,
+    get_documents,
+    iterate_documents,
+)
+from metadata_service.core.utils import get_timestamp
+from metadata_service.core.views import refresh_views
 from metadata_service.database import DBConnect
-from metadata_service.models import Study
+from metadata_service.models import PatchRequest, Study
 
 COLLECTION_NAME = Study.__collection__
 PREFIX = "STU"
 
 
-async def retrieve_studies() -> List[Study]:
+async def retrieve_studies(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> List[Dict]:
     """
     Retrieve a list of Studies from metadata store.
 
+    Args:
+        limit: The maximum number of records. All records are returned if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+
     Returns:
         A list of Study objects.
 
     """
-    db_connect = DBConnect()
-    collection = await db_connect.get_collection(COLLECTION_NAME)
-    studies_dict = await collection.find().to_list(None)  # type: ignore
-    studies = [Study(**study_dict) for study_dict in studies_dict]
-    await db_connect.close_db()
+    studies = await find_documents(Study, limit, cursor, fields, filters)
     return studies
 
 
-async def get_study(study_id: str, embedded: bool = False) -> Study:
+def stream_studies(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Optional[Dict] = None,
+) -> AsyncIterator[Dict]:
+    """
+    Stream Studies from the metadata store without loading them all into memory.
+
+    Args:
+        limit: The maximum number of records. All records are streamed if ``None``.
+        cursor: The cursor returned with the previous page
+        fields: Comma separated fields to read. All fields are read if ``None``.
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+
+    Returns:
+        An async iterator over the Study records.
+
+    """
+    return iterate_documents(Study, limit, cursor, fields, filters)
+
+
+async def count_studies(filters: Optional[Dict] = None, exact: bool = True) -> Dict:
+    """
+    Count the Studies in the metadata store.
+
+    Args:
+        filters: Values of the filter fields to match. ``None`` values are ignored.
+        exact: Whether the count must be exact. Unfiltered counts are estimated
+            from the collection metadata if ``False``.
+
+    Returns:
+        The count and whether it is exact.
+
+    """
+    result = await count_documents(Study, filters, exact)
+    return result
+
+
+async def get_study(  # pylint: disable=too-many-arguments
+    study_id: str,
+    embedded: bool = False,
+    engine: Optional[str] = None,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+    fields: Optional[str] = None,
+) -> Dict:
     """
     Given a Study ID, get the Study object from metadata store.
 
     Args:
         study_id: The Study ID
         embedded: Whether or not to embed references. ``False``, by default.
+        engine: The embedding engine, ``client`` or ``lookup``. Defaults to
+            the ``embed_engine`` setting.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+        fields: Comma separated fields to read. All fields are read if ``None``.
 
     Returns:
         The Study object
 
     """
-    db_connect = DBConnect()
-    collection = await db_connect.get_collection(COLLECTION_NAME)
-    study_dict = await collection.find_one({"id": study_id})  # type: ignore
-    if not study_dict:
+    study = await get_document(study_id, Study, embedded, engine, embed, depth, fields)
+    if not study:
         raise HTTPException(
             status_code=404, detail=f"{Study.__name__} with id '{study_id}' not found"
         )
-    if embedded:
-        study = await embed_references(study_dict, Study)
-    study = Study(**study_dict)
-    await db_connect.close_db()
     return study
 
 
+async def batch_get_studies(
+    study_ids: List[str],
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Given a list of Study IDs, get the Study objects from metadata store
+    with a single query.
+
+    Args:
+        study_ids: The Study IDs
+        embedded: Whether or not to embed references. ``False``, by default.
+        embed: Comma separated reference paths to embed. Implies ``embedded``.
+        depth: The maximum number of reference levels to embed. Implies ``embedded``.
+
+    Returns:
+        One result per requested ID, in request order, that tells whether the
+        Study was found.
+
+    """
+    return await get_documents(study_ids, Study, embedded, embed, depth)
+
+
 async def add_study(data: Study) -> Study:
     """
     Add a Study object to the metadata store.
@@ -89,9 +177,26 @@ async def add_study(data: Study) -> Study:
     data.creation_date = timestamp
     data.update_date = timestamp
     await collection.insert_one(data.dict())  # type: ignore
-    await db_connect.close_db()
-    study = await get_study(study_id)
-    return study
+    await publish_change(COLLECTION_NAME, study_id)
+    await refresh_views(COLLECTION_NAME, [study_id])
+    return data
+
+
+async def bulk_add_studies(data: List[Study]) -> List[Dict]:
+    """
+    Add many Study objects to the metadata store with a single write.
+    The IDs are reserved with a single counter increment.
+
+    Args:
+        data: The Study objects
+
+    Returns:
+        One result per Study, in request order, that tells whether it was
+        created.
+
+    """
+    results = await insert_documents(data, Study, PREFIX)
+    return results
 
 
 async def update_study(study_id: str, data: Study) -> Study:
@@ -113,9 +218,39 @@ async def update_study(study_id: str, data: Study) -> Study:
         data.creation_date = None
     timestamp = await get_timestamp()
     data.update_date = timestamp
-    await collection.update_one(
-        {"id": study_id}, {"$set": data.dict(exclude_none=True)}
-    )  # type: ignore
-    await db_connect.close_db()
-    study = await get_study(study_id)
+    study = await collection.find_one_and_update(  # type: ignore
+        {"id": study_id},
+        {"$set": data.dict(exclude_none=True)},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not study:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{Study.__name__} with id '{study_id}' not found",
+        )
+    await publish_change(COLLECTION_NAME, study_id)
+    await refresh_views(COLLECTION_NAME, [study_id])
+    return study
+
+
+async def patch_study(study_id: str, data: PatchRequest) -> Dict:
+    """
+    Given a Study ID and a patch, update only the patched fields of the
+    Study in metadata store.
+
+    Args:
+        study_id: The Study ID
+        data: The fields to set and the list items to add or remove
+
+    Returns:
+        The patched Study object
+
+    """
+    study = await patch_document(study_id, Study, data)
+    if not study:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{Study.__name__} with id '{study_id}' not found",
+        )
     return study
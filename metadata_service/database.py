@@ -16,35 +16,60 @@
 This module contains the DBConnect class and its related methods
 that are relevant for connecting to an underlying MongoDB store.
 """
+import asyncio
+from typing import Dict, Iterator, Optional
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import ReturnDocument
 from metadata_service.config import get_config
 
 COUNTER = "counter"
 
 
+def format_id(prefix: str, value: int) -> str:
+    """Format a counter value as the ID of a document, e.g. ``DAT:0000001``."""
+    return f"{prefix}:{value:07}"
+
+
 class DBConnect:
     """
     Class that handles connections to a MongoDB store.
+
+    All instances share a single pooled client per process. The client is
+    created on application startup (or lazily on first use) and closed on
+    application shutdown.
     """
 
+    _client: Optional[AsyncIOMotorClient] = None
+    _id_blocks: Dict[str, Iterator[int]] = {}
+    _id_locks: Dict[str, asyncio.Lock] = {}
+
     def __init__(self):
         config = get_config()
         self.db_url = config.db_url
         self.db_name = config.db_name
-        self.client = AsyncIOMotorClient()
+        self.pool_options = {
+            "maxPoolSize": config.db_max_pool_size,
+            "minPoolSize": config.db_min_pool_size,
+            "maxIdleTimeMS": config.db_max_idle_time_ms,
+            "waitQueueTimeoutMS": config.db_wait_queue_timeout_ms,
+        }
 
     async def get_db(self) -> AsyncIOMotorClient:
         """
-        Return database client instance.
+        Return the process-wide database client instance.
         """
-        self.client = AsyncIOMotorClient(self.db_url)
-        return self.client
+        if DBConnect._client is None:
+            options = {k: v for k, v in self.pool_options.items() if v is not None}
+            DBConnect._client = AsyncIOMotorClient(self.db_url, **options)
+        return DBConnect._client
 
     async def close_db(self) -> None:
         """
-        Close database connection.
+        Close the process-wide database client.
         """
-        self.client.close()
+        if DBConnect._client is not None:
+            DBConnect._client.close()
+            DBConnect._client = None
 
     async def get_collection(self, collection_name: str) -> AsyncIOMotorCollection:
         """
@@ -67,6 +92,10 @@ class DBConnect:
         The format of the ID depends on the ``collection_name``
         and ``prefix``.
 
+        If ``id_block_size`` is greater than one, a block of counter values
+        is reserved at once and IDs are served from memory until the block is
+        exhausted. IDs are then unique but may have gaps across workers.
+
         Args:
             collection_name: Name of the collection
             prefix: The prefix corresponding to documents of the collection
@@ -75,27 +104,37 @@ class DBConnect:
             The generated ID
 
         """
-        await self._check_collection_counter(collection_name)
-        collection = await self.get_collection(COUNTER)
-        document = await collection.find_one({"_id": collection_name})  # type: ignore
-        collection.update_one({"_id": collection_name}, {"$inc": {"value": 1}})  # type: ignore
-        await self.close_db()
-        return f"{prefix}:{(document['value'] + 1):07}"
-
-    async def _check_collection_counter(self, collection_name: str):
-        """
-        Check whether counter for a given collection exists.
+        block_size = get_config().id_block_size
+        if block_size <= 1:
+            return format_id(prefix, (await self.reserve_ids(collection_name, 1))[0])
+        lock = DBConnect._id_locks.setdefault(collection_name, asyncio.Lock())
+        async with lock:
+            value = next(DBConnect._id_blocks.get(collection_name, iter(())), None)
+            if value is None:
+                block = iter(await self.reserve_ids(collection_name, block_size))
+                DBConnect._id_blocks[collection_name] = block
+                value = next(block)
+        return format_id(prefix, value)
+
+    async def reserve_ids(self, collection_name: str, count: int) -> range:
         """
-        db_connect = DBConnect()
-        collection = await db_connect.get_collection(collection_name=COUNTER)
-        docs = await collection.find({"_id": collection_name}).to_list(None)  # type: ignore
-        if not docs:
-            await self._initialize_collection_counter(collection_name)
+        Atomically reserve ``count`` consecutive counter values for a collection.
+        The counter is created on first use.
+
+        Args:
+            collection_name: Name of the collection
+            count: The number of values to reserve
+
+        Returns:
+            The range of reserved counter values
 
-    async def _initialize_collection_counter(self, collection_name: str):
-        """
-        Initialize a counter for a given collection.
         """
-        db_connect = DBConnect()
-        collection = await db_connect.get_collection(collection_name=COUNTER)
-        collection.insert_one({"_id": collection_name, "value": 0})  # type: ignore
+        collection = await self.get_collection(COUNTER)
+        document = await collection.find_one_and_update(  # type: ignore
+            {"_id": collection_name},
+            {"$inc": {"value": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        last = document["value"]
+        return range(last - count + 1, last + 1)
@@ -15,8 +15,9 @@
 """
 This module contains Pydantic models for the different metadata objects.
 """
-from typing import Set, List, Optional, Union
+from typing import Any, Dict, Generic, Set, List, Optional, TypeVar, Union
 from pydantic import BaseModel
+from pydantic.generics import GenericModel
 
 
 class Publication(BaseModel):
@@ -26,6 +27,7 @@ class Publication(BaseModel):
 
     __references__: Set = set()
     __collection__: str = "publication"
+    __filters__: Set = set()
     id: Optional[str] = None
     title: Optional[str] = None
     xref: Optional[List[str]] = None
@@ -40,6 +42,7 @@ class Experiment(BaseModel):
 
     __references__: Set = set()
     __collection__: str = "experiment"
+    __filters__: Set = {"instrument_model"}
     id: Optional[str] = None
     name: Optional[str] = None
     instrument_model: Optional[str] = None
@@ -58,6 +61,7 @@ class Study(BaseModel):
         ("has_experiment", Experiment),
     }
     __collection__: str = "study"
+    __filters__: Set = {"type", "has_experiment"}
     id: Optional[str] = None
     title: Optional[str] = None
     type: Optional[Union[str, List]] = None
@@ -76,6 +80,7 @@ class File(BaseModel):
 
     __references__: Set = set()
     __collection__: str = "file"
+    __filters__: Set = {"format", "category", "type"}
     id: str
     name: Optional[str]
     format: Optional[str]
@@ -95,6 +100,7 @@ class DataAccessCommittee(BaseModel):
 
     __references__: Set = set()
     __collection__: str = "data_access_committee"
+    __filters__: Set = {"main_contact"}
     id: Optional[str] = None
     title: Optional[str] = None
     description: Optional[str] = None
@@ -112,6 +118,7 @@ class DataAccessPolicy(BaseModel):
 
     __references__: Set = {("has_data_access_committee", DataAccessCommittee)}
     __collection__: str = "data_access_policy"
+    __filters__: Set = {"has_data_access_committee"}
     id: Optional[str] = None
     description: Optional[str] = None
     policy_text: Optional[str] = None
@@ -133,6 +140,7 @@ class Dataset(BaseModel):
         ("has_data_access_policy", DataAccessPolicy),
     }
     __collection__: str = "dataset"
+    __filters__: Set = {"type", "has_study", "has_data_access_policy"}
     id: Optional[str] = None
     title: Optional[str] = None
     description: Optional[str] = None
@@ -143,3 +151,64 @@ class Dataset(BaseModel):
     xref: Optional[List[str]] = None
     creation_date: Optional[str] = None
     update_date: Optional[str] = None
+
+
+MODELS: List = [
+    Publication,
+    Experiment,
+    Study,
+    File,
+    DataAccessCommittee,
+    DataAccessPolicy,
+    Dataset,
+]
+
+
+RecordT = TypeVar("RecordT")
+
+
+class BatchGetRequest(BaseModel):
+    """
+    Request of a batch get
+    """
+
+    ids: List[str]
+
+
+class BatchGetResult(GenericModel, Generic[RecordT]):
+    """
+    Result for a single ID of a batch get
+    """
+
+    id: str
+    found: bool
+    record: Optional[RecordT] = None
+
+
+class CountResult(BaseModel):
+    """
+    Number of records in a collection
+    """
+
+    count: int
+    exact: bool
+
+
+class BulkCreateResult(BaseModel):
+    """
+    Result for a single record of a bulk create
+    """
+
+    id: Optional[str] = None
+    created: bool
+    error: Optional[str] = None
+
+
+class PatchRequest(BaseModel):
+    """
+    Partial update of a record
+    """
+
+    set: Dict[str, Any] = {}
+    add_to_set: Dict[str, List] = {}
+    pull: Dict[str, List] = {}
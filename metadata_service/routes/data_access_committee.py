@@ -17,32 +17,103 @@
 Routes for interacting with Data Access Committee records
 """
 
-from typing import List
-from fastapi import APIRouter
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response
 
+from metadata_service.core.conditional import (
+    add_version_headers,
+    check_document,
+    check_page,
+    versioned_fields,
+)
+from metadata_service.core.pagination import add_pagination_headers, page_limit
+from metadata_service.core.serialization import read_response
+from metadata_service.core.streaming import ndjson_response, wants_ndjson
+from metadata_service.core.views import add_watermark_header
 from metadata_service.dao.data_access_committee import (
+    count_dacs,
+    patch_dac,
+    bulk_add_dacs,
+    batch_get_dacs,
+    stream_dacs,
     get_dac,
     add_dac,
     update_dac,
     retrieve_dacs,
 )
-from metadata_service.models import DataAccessCommittee
+from metadata_service.models import (
+    BatchGetRequest,
+    BatchGetResult,
+    BulkCreateResult,
+    CountResult,
+    PatchRequest,
+    DataAccessCommittee,
+)
 
 
 data_access_committee_router = APIRouter()
 
 
+def dac_filters(
+    main_contact: Optional[str] = None,
+) -> Dict:
+    """
+    Filters of the DAC list routes.
+    """
+    return {"main_contact": main_contact}
+
+
 @data_access_committee_router.get(
     "/data_access_committees",
     response_model=List[DataAccessCommittee],
     summary="Get all DACs",
 )
-async def get_all_dacs():
+async def get_all_dacs(  # pylint: disable=too-many-arguments
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Dict = Depends(dac_filters),
+):
     """
     Retrieve a list of DAC records from the metadata store.
     """
-    dacs = await retrieve_dacs()
-    return dacs
+    if wants_ndjson(request):
+        return ndjson_response(stream_dacs(limit, cursor, fields, filters))
+    limit = page_limit(limit)
+    not_modified = await check_page(
+        request, DataAccessCommittee, limit, cursor, filters
+    )
+    if not_modified is not None:
+        return not_modified
+    dacs = await retrieve_dacs(limit, cursor, versioned_fields(fields), filters)
+    add_pagination_headers(request, response, dacs, limit)
+    dacs = add_version_headers(request, response, DataAccessCommittee, dacs, fields)
+    return read_response(dacs, response, fields, request)
+
+
+@data_access_committee_router.get(
+    "/data_access_committees/count", response_model=CountResult, summary="Count DACs"
+)
+async def count_all_dacs(exact: bool = True, filters: Dict = Depends(dac_filters)):
+    """
+    Count the DAC records in the metadata store. With ``exact=false``,
+    unfiltered counts are estimated from the collection metadata.
+    """
+    result = await count_dacs(filters, exact)
+    return result
+
+
+@data_access_committee_router.head(
+    "/data_access_committees", summary="Count DACs in a header"
+)
+async def head_all_dacs(exact: bool = True, filters: Dict = Depends(dac_filters)):
+    """
+    Return the number of DAC records in the ``X-Total-Count`` header.
+    """
+    result = await count_dacs(filters, exact)
+    return Response(headers={"X-Total-Count": str(result["count"])})
 
 
 @data_access_committee_router.get(
@@ -50,12 +121,62 @@ async def get_all_dacs():
     response_model=DataAccessCommittee,
     summary="Get a DAC",
 )
-async def get_dacs(data_access_committee_id: str, embedded: bool = False):
+async def get_dacs(  # pylint: disable=too-many-arguments
+    data_access_committee_id: str,
+    request: Request,
+    response: Response,
+    embedded: bool = False,
+    engine: Optional[str] = Query(None, regex="^(client|lookup)$"),
+    embed: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+    fields: Optional[str] = None,
+):
     """
     Given a DAC ID, get the DAC record from the metadata store.
     """
-    dac = await get_dac(data_access_committee_id, embedded)
-    return dac
+    not_modified = await check_document(
+        request,
+        data_access_committee_id,
+        DataAccessCommittee,
+        embedded,
+        embed,
+        depth,
+        fields,
+    )
+    if not_modified is not None:
+        return not_modified
+    dac = await get_dac(
+        data_access_committee_id,
+        embedded,
+        engine,
+        embed,
+        depth,
+        versioned_fields(fields),
+    )
+    add_watermark_header(response, dac)
+    dac = add_version_headers(request, response, DataAccessCommittee, dac, fields)
+    return read_response(dac, response, fields, request)
+
+
+@data_access_committee_router.post(
+    "/data_access_committees/batch_get",
+    response_model=List[BatchGetResult[DataAccessCommittee]],
+    summary="Get many DACs",
+)
+async def get_dacs_batch(  # pylint: disable=too-many-arguments
+    data: BatchGetRequest,
+    request: Request,
+    response: Response,
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+):
+    """
+    Given a list of DAC IDs, get the DAC records from the metadata store.
+    Results are returned in request order and mark the IDs that were not found.
+    """
+    results = await batch_get_dacs(data.ids, embedded, embed, depth)
+    return read_response(results, response, request=request)
 
 
 @data_access_committee_router.post(
@@ -69,6 +190,20 @@ async def add_dacs(data: DataAccessCommittee):
     return dac
 
 
+@data_access_committee_router.post(
+    "/data_access_committees/bulk",
+    response_model=List[BulkCreateResult],
+    summary="Add many DACs",
+)
+async def add_dacs_bulk(data: List[DataAccessCommittee]):
+    """
+    Add many DAC records to the metadata store. Records that cannot be
+    added are reported in the results without failing the others.
+    """
+    results = await bulk_add_dacs(data)
+    return results
+
+
 @data_access_committee_router.put(
     "/data_access_committees/{data_access_committee_id}",
     response_model=DataAccessCommittee,
@@ -80,3 +215,17 @@ async def update_dacs(data_access_committee_id: str, data: DataAccessCommittee):
     """
     dac = await update_dac(data_access_committee_id, data)
     return dac
+
+
+@data_access_committee_router.patch(
+    "/data_access_committees/{data_access_committee_id}",
+    response_model=DataAccessCommittee,
+    summary="Patch a DAC",
+)
+async def patch_dacs(data_access_committee_id: str, data: PatchRequest):
+    """
+    Given a DAC ID and a patch, update only the patched fields of the
+    DAC record in metadata store.
+    """
+    dac = await patch_dac(data_access_committee_id, data)
+    return dac
@@ -17,32 +17,101 @@
 Routes for interacting with Data Access Policy records
 """
 
-from typing import List
-from fastapi import APIRouter
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response
 
+from metadata_service.core.conditional import (
+    add_version_headers,
+    check_document,
+    check_page,
+    versioned_fields,
+)
+from metadata_service.core.pagination import add_pagination_headers, page_limit
+from metadata_service.core.serialization import read_response
+from metadata_service.core.streaming import ndjson_response, wants_ndjson
+from metadata_service.core.views import add_watermark_header
 from metadata_service.dao.data_access_policy import (
+    count_daps,
+    patch_dap,
+    bulk_add_daps,
+    batch_get_daps,
+    stream_daps,
     get_dap,
     add_dap,
     update_dap,
     retrieve_daps,
 )
-from metadata_service.models import DataAccessPolicy
+from metadata_service.models import (
+    BatchGetRequest,
+    BatchGetResult,
+    BulkCreateResult,
+    CountResult,
+    PatchRequest,
+    DataAccessPolicy,
+)
 
 
 data_access_policy_router = APIRouter()
 
 
+def dap_filters(
+    has_data_access_committee: Optional[str] = None,
+) -> Dict:
+    """
+    Filters of the DAP list routes.
+    """
+    return {"has_data_access_committee": has_data_access_committee}
+
+
 @data_access_policy_router.get(
     "/data_access_policies",
     response_model=List[DataAccessPolicy],
     summary="Get all DAPs",
 )
-async def get_all_daps():
+async def get_all_daps(  # pylint: disable=too-many-arguments
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Dict = Depends(dap_filters),
+):
     """
     Retrieve a list of DAP records from the metadata store.
     """
-    daps = await retrieve_daps()
-    return daps
+    if wants_ndjson(request):
+        return ndjson_response(stream_daps(limit, cursor, fields, filters))
+    limit = page_limit(limit)
+    not_modified = await check_page(request, DataAccessPolicy, limit, cursor, filters)
+    if not_modified is not None:
+        return not_modified
+    daps = await retrieve_daps(limit, cursor, versioned_fields(fields), filters)
+    add_pagination_headers(request, response, daps, limit)
+    daps = add_version_headers(request, response, DataAccessPolicy, daps, fields)
+    return read_response(daps, response, fields, request)
+
+
+@data_access_policy_router.get(
+    "/data_access_policies/count", response_model=CountResult, summary="Count DAPs"
+)
+async def count_all_daps(exact: bool = True, filters: Dict = Depends(dap_filters)):
+    """
+    Count the DAP records in the metadata store. With ``exact=false``,
+    unfiltered counts are estimated from the collection metadata.
+    """
+    result = await count_daps(filters, exact)
+    return result
+
+
+@data_access_policy_router.head(
+    "/data_access_policies", summary="Count DAPs in a header"
+)
+async def head_all_daps(exact: bool = True, filters: Dict = Depends(dap_filters)):
+    """
+    Return the number of DAP records in the ``X-Total-Count`` header.
+    """
+    result = await count_daps(filters, exact)
+    return Response(headers={"X-Total-Count": str(result["count"])})
 
 
 @data_access_policy_router.get(
@@ -50,12 +119,51 @@ async def get_all_daps():
     response_model=DataAccessPolicy,
     summary="Get a DAP",
 )
-async def get_daps(data_access_policy_id: str, embedded: bool = False):
+async def get_daps(  # pylint: disable=too-many-arguments
+    data_access_policy_id: str,
+    request: Request,
+    response: Response,
+    embedded: bool = False,
+    engine: Optional[str] = Query(None, regex="^(client|lookup)$"),
+    embed: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+    fields: Optional[str] = None,
+):
     """
     Given a DAP ID, get the DAP record from the metadata store.
     """
-    dap = await get_dap(data_access_policy_id, embedded)
-    return dap
+    not_modified = await check_document(
+        request, data_access_policy_id, DataAccessPolicy, embedded, embed, depth, fields
+    )
+    if not_modified is not None:
+        return not_modified
+    dap = await get_dap(
+        data_access_policy_id, embedded, engine, embed, depth, versioned_fields(fields)
+    )
+    add_watermark_header(response, dap)
+    dap = add_version_headers(request, response, DataAccessPolicy, dap, fields)
+    return read_response(dap, response, fields, request)
+
+
+@data_access_policy_router.post(
+    "/data_access_policies/batch_get",
+    response_model=List[BatchGetResult[DataAccessPolicy]],
+    summary="Get many DAPs",
+)
+async def get_daps_batch(  # pylint: disable=too-many-arguments
+    data: BatchGetRequest,
+    request: Request,
+    response: Response,
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+):
+    """
+    Given a list of DAP IDs, get the DAP records from the metadata store.
+    Results are returned in request order and mark the IDs that were not found.
+    """
+    results = await batch_get_daps(data.ids, embedded, embed, depth)
+    return read_response(results, response, request=request)
 
 
 @data_access_policy_router.post(
@@ -69,6 +177,20 @@ async def add_daps(data: DataAccessPolicy):
     return dap
 
 
+@data_access_policy_router.post(
+    "/data_access_policies/bulk",
+    response_model=List[BulkCreateResult],
+    summary="Add many DAPs",
+)
+async def add_daps_bulk(data: List[DataAccessPolicy]):
+    """
+    Add many DAP records to the metadata store. Records that cannot be
+    added are reported in the results without failing the others.
+    """
+    results = await bulk_add_daps(data)
+    return results
+
+
 @data_access_policy_router.put(
     "/data_access_policies/{data_access_policy_id}",
     response_model=DataAccessPolicy,
@@ -80,3 +202,17 @@ async def update_daps(data_access_policy_id: str, data: DataAccessPolicy):
     """
     dap = await update_dap(data_access_policy_id, data)
     return dap
+
+
+@data_access_policy_router.patch(
+    "/data_access_policies/{data_access_policy_id}",
+    response_model=DataAccessPolicy,
+    summary="Patch a DAP",
+)
+async def patch_daps(data_access_policy_id: str, data: PatchRequest):
+    """
+    Given a DAP ID and a patch, update only the patched fields of the
+    DAP record in metadata store.
+    """
+    dap = await patch_dap(data_access_policy_id, data)
+    return dap
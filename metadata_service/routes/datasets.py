@@ -17,41 +17,157 @@
 Routes for interacting with Dataset records
 """
 
-from typing import List
-from fastapi import APIRouter
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response
 
+from metadata_service.core.conditional import (
+    add_version_headers,
+    check_document,
+    check_page,
+    versioned_fields,
+)
+from metadata_service.core.pagination import add_pagination_headers, page_limit
+from metadata_service.core.serialization import read_response
+from metadata_service.core.streaming import ndjson_response, wants_ndjson
+from metadata_service.core.views import add_watermark_header
 from metadata_service.dao.dataset import (
+    count_datasets,
+    patch_dataset,
+    bulk_add_datasets,
+    batch_get_datasets,
+    stream_datasets,
     get_dataset,
     add_dataset,
     update_dataset,
     retrieve_datasets,
 )
-from metadata_service.models import Dataset
+from metadata_service.models import (
+    BatchGetRequest,
+    BatchGetResult,
+    BulkCreateResult,
+    CountResult,
+    PatchRequest,
+    Dataset,
+)
 
 
 dataset_router = APIRouter()
 
 
+def dataset_filters(
+    dataset_type: Optional[str] = Query(None, alias="type"),
+    has_study: Optional[str] = None,
+    has_data_access_policy: Optional[str] = None,
+) -> Dict:
+    """
+    Filters of the Dataset list routes.
+    """
+    return {
+        "type": dataset_type,
+        "has_study": has_study,
+        "has_data_access_policy": has_data_access_policy,
+    }
+
+
 @dataset_router.get(
     "/datasets", response_model=List[Dataset], summary="Get all Datasets"
 )
-async def get_all_datasets():
+async def get_all_datasets(  # pylint: disable=too-many-arguments
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Dict = Depends(dataset_filters),
+):
     """
     Retrieve a list of Dataset records from the metadata store.
     """
-    datasets = await retrieve_datasets()
-    return datasets
+    if wants_ndjson(request):
+        return ndjson_response(stream_datasets(limit, cursor, fields, filters))
+    limit = page_limit(limit)
+    not_modified = await check_page(request, Dataset, limit, cursor, filters)
+    if not_modified is not None:
+        return not_modified
+    datasets = await retrieve_datasets(limit, cursor, versioned_fields(fields), filters)
+    add_pagination_headers(request, response, datasets, limit)
+    datasets = add_version_headers(request, response, Dataset, datasets, fields)
+    return read_response(datasets, response, fields, request)
+
+
+@dataset_router.get(
+    "/datasets/count", response_model=CountResult, summary="Count Datasets"
+)
+async def count_all_datasets(
+    exact: bool = True, filters: Dict = Depends(dataset_filters)
+):
+    """
+    Count the Dataset records in the metadata store. With ``exact=false``,
+    unfiltered counts are estimated from the collection metadata.
+    """
+    result = await count_datasets(filters, exact)
+    return result
+
+
+@dataset_router.head("/datasets", summary="Count Datasets in a header")
+async def head_all_datasets(
+    exact: bool = True, filters: Dict = Depends(dataset_filters)
+):
+    """
+    Return the number of Dataset records in the ``X-Total-Count`` header.
+    """
+    result = await count_datasets(filters, exact)
+    return Response(headers={"X-Total-Count": str(result["count"])})
 
 
 @dataset_router.get(
     "/datasets/{dataset_id}", response_model=Dataset, summary="Get a Dataset"
 )
-async def get_datasets(dataset_id: str, embedded: bool = False):
+async def get_datasets(  # pylint: disable=too-many-arguments
+    dataset_id: str,
+    request: Request,
+    response: Response,
+    embedded: bool = False,
+    engine: Optional[str] = Query(None, regex="^(client|lookup)$"),
+    embed: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+    fields: Optional[str] = None,
+):
     """
     Given a Dataset ID, get the Dataset record from the metadata store.
     """
-    dataset = await get_dataset(dataset_id, embedded)
-    return dataset
+    not_modified = await check_document(
+        request, dataset_id, Dataset, embedded, embed, depth, fields
+    )
+    if not_modified is not None:
+        return not_modified
+    dataset = await get_dataset(
+        dataset_id, embedded, engine, embed, depth, versioned_fields(fields)
+    )
+    add_watermark_header(response, dataset)
+    dataset = add_version_headers(request, response, Dataset, dataset, fields)
+    return read_response(dataset, response, fields, request)
+
+
+@dataset_router.post(
+    "/datasets/batch_get",
+    response_model=List[BatchGetResult[Dataset]],
+    summary="Get many Datasets",
+)
+async def get_datasets_batch(  # pylint: disable=too-many-arguments
+    data: BatchGetRequest,
+    request: Request,
+    response: Response,
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+):
+    """
+    Given a list of Dataset IDs, get the Dataset records from the metadata store.
+    Results are returned in request order and mark the IDs that were not found.
+    """
+    results = await batch_get_datasets(data.ids, embedded, embed, depth)
+    return read_response(results, response, request=request)
 
 
 @dataset_router.post("/datasets", response_model=Dataset, summary="Add a Dataset")
@@ -63,6 +179,20 @@ async def add_datasets(data: Dataset):
     return dataset
 
 
+@dataset_router.post(
+    "/datasets/bulk",
+    response_model=List[BulkCreateResult],
+    summary="Add many Datasets",
+)
+async def add_datasets_bulk(data: List[Dataset]):
+    """
+    Add many Dataset records to the metadata store. Records that cannot be
+    added are reported in the results without failing the others.
+    """
+    results = await bulk_add_datasets(data)
+    return results
+
+
 @dataset_router.put(
     "/datasets/{dataset_id}", response_model=Dataset, summary="Update a Dataset"
 )
@@ -72,3 +202,15 @@ async def update_datasets(dataset_id, data: Dataset):
     """
     dataset = await update_dataset(dataset_id, data)
     return dataset
+
+
+@dataset_router.patch(
+    "/datasets/{dataset_id}", response_model=Dataset, summary="Patch a Dataset"
+)
+async def patch_datasets(dataset_id: str, data: PatchRequest):
+    """
+    Given a Dataset ID and a patch, update only the patched fields of the
+    Dataset record in metadata store.
+    """
+    dataset = await patch_dataset(dataset_id, data)
+    return dataset
@@ -17,28 +17,103 @@
 Routes for interacting with Experiment records
 """
 
-from typing import List
-from fastapi import APIRouter
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response
 
+from metadata_service.core.conditional import (
+    add_version_headers,
+    check_document,
+    check_page,
+    versioned_fields,
+)
+from metadata_service.core.pagination import add_pagination_headers, page_limit
+from metadata_service.core.serialization import read_response
+from metadata_service.core.streaming import ndjson_response, wants_ndjson
+from metadata_service.core.views import add_watermark_header
 from metadata_service.dao.experiment import (
+    count_experiments,
+    patch_experiment,
+    bulk_add_experiments,
+    batch_get_experiments,
+    stream_experiments,
     add_experiment,
     retrieve_experiments,
     get_experiment,
     update_experiment,
 )
-from metadata_service.models import Experiment
+from metadata_service.models import (
+    BatchGetRequest,
+    BatchGetResult,
+    BulkCreateResult,
+    CountResult,
+    PatchRequest,
+    Experiment,
+)
 
 
 experiment_router = APIRouter()
 
 
+def experiment_filters(
+    instrument_model: Optional[str] = None,
+) -> Dict:
+    """
+    Filters of the Experiment list routes.
+    """
+    return {"instrument_model": instrument_model}
+
+
 @experiment_router.get(
     "/experiments", response_model=List[Experiment], summary="Get all Experiments"
 )
-async def get_all_experiments():
+async def get_all_experiments(  # pylint: disable=too-many-arguments
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Dict = Depends(experiment_filters),
+):
     """Retrieve a list of Experiment IDs from metadata store."""
-    experiments = await retrieve_experiments()
-    return experiments
+    if wants_ndjson(request):
+        return ndjson_response(stream_experiments(limit, cursor, fields, filters))
+    limit = page_limit(limit)
+    not_modified = await check_page(request, Experiment, limit, cursor, filters)
+    if not_modified is not None:
+        return not_modified
+    experiments = await retrieve_experiments(
+        limit, cursor, versioned_fields(fields), filters
+    )
+    add_pagination_headers(request, response, experiments, limit)
+    experiments = add_version_headers(
+        request, response, Experiment, experiments, fields
+    )
+    return read_response(experiments, response, fields, request)
+
+
+@experiment_router.get(
+    "/experiments/count", response_model=CountResult, summary="Count Experiments"
+)
+async def count_all_experiments(
+    exact: bool = True, filters: Dict = Depends(experiment_filters)
+):
+    """
+    Count the Experiment records in the metadata store. With ``exact=false``,
+    unfiltered counts are estimated from the collection metadata.
+    """
+    result = await count_experiments(filters, exact)
+    return result
+
+
+@experiment_router.head("/experiments", summary="Count Experiments in a header")
+async def head_all_experiments(
+    exact: bool = True, filters: Dict = Depends(experiment_filters)
+):
+    """
+    Return the number of Experiment records in the ``X-Total-Count`` header.
+    """
+    result = await count_experiments(filters, exact)
+    return Response(headers={"X-Total-Count": str(result["count"])})
 
 
 @experiment_router.get(
@@ -46,10 +121,49 @@ async def get_all_experiments():
     response_model=Experiment,
     summary="Get an Experiment",
 )
-async def get_experiments(experiment_id: str, embedded: bool = False):
+async def get_experiments(  # pylint: disable=too-many-arguments
+    experiment_id: str,
+    request: Request,
+    response: Response,
+    embedded: bool = False,
+    engine: Optional[str] = Query(None, regex="^(client|lookup)$"),
+    embed: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+    fields: Optional[str] = None,
+):
     """Given an Experiment ID, get the Experiment from metadata store."""
-    experiment = await get_experiment(experiment_id, embedded)
-    return experiment
+    not_modified = await check_document(
+        request, experiment_id, Experiment, embedded, embed, depth, fields
+    )
+    if not_modified is not None:
+        return not_modified
+    experiment = await get_experiment(
+        experiment_id, embedded, engine, embed, depth, versioned_fields(fields)
+    )
+    add_watermark_header(response, experiment)
+    experiment = add_version_headers(request, response, Experiment, experiment, fields)
+    return read_response(experiment, response, fields, request)
+
+
+@experiment_router.post(
+    "/experiments/batch_get",
+    response_model=List[BatchGetResult[Experiment]],
+    summary="Get many Experiments",
+)
+async def get_experiments_batch(  # pylint: disable=too-many-arguments
+    data: BatchGetRequest,
+    request: Request,
+    response: Response,
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+):
+    """
+    Given a list of Experiment IDs, get the Experiment records from the metadata store.
+    Results are returned in request order and mark the IDs that were not found.
+    """
+    results = await batch_get_experiments(data.ids, embedded, embed, depth)
+    return read_response(results, response, request=request)
 
 
 @experiment_router.post(
@@ -61,6 +175,20 @@ async def add_experiments(data: Experiment):
     return experiment
 
 
+@experiment_router.post(
+    "/experiments/bulk",
+    response_model=List[BulkCreateResult],
+    summary="Add many Experiments",
+)
+async def add_experiments_bulk(data: List[Experiment]):
+    """
+    Add many Experiment records to the metadata store. Records that cannot be
+    added are reported in the results without failing the others.
+    """
+    results = await bulk_add_experiments(data)
+    return results
+
+
 @experiment_router.put(
     "/experiments/{experiment_id}",
     response_model=Experiment,
@@ -70,3 +198,17 @@ async def update_experiments(experiment_id: str, data: Experiment):
     """Given an Experiment ID and data, update the Experiment in metadata store."""
     experiment = await update_experiment(experiment_id, data)
     return experiment
+
+
+@experiment_router.patch(
+    "/experiments/{experiment_id}",
+    response_model=Experiment,
+    summary="Patch an Experiment",
+)
+async def patch_experiments(experiment_id: str, data: PatchRequest):
+    """
+    Given an Experiment ID and a patch, update only the patched fields of the
+    Experiment record in metadata store.
+    """
+    experiment = await patch_experiment(experiment_id, data)
+    return experiment
@@ -17,32 +17,143 @@
 Routes for interacting with File records.
 """
 
-from typing import List
-from fastapi import APIRouter
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response
 
-from metadata_service.dao.file import retrieve_files, get_file, add_file, update_file
-from metadata_service.models import File
+from metadata_service.core.conditional import (
+    add_version_headers,
+    check_document,
+    check_page,
+    versioned_fields,
+)
+from metadata_service.core.pagination import add_pagination_headers, page_limit
+from metadata_service.core.serialization import read_response
+from metadata_service.core.streaming import ndjson_response, wants_ndjson
+from metadata_service.core.views import add_watermark_header
+from metadata_service.dao.file import (
+    count_files,
+    patch_file,
+    bulk_add_files,
+    batch_get_files,
+    add_file,
+    get_file,
+    retrieve_files,
+    stream_files,
+    update_file,
+)
+from metadata_service.models import (
+    BatchGetRequest,
+    BatchGetResult,
+    BulkCreateResult,
+    CountResult,
+    PatchRequest,
+    File,
+)
 
 
 file_router = APIRouter()
 
 
+def file_filters(
+    file_format: Optional[str] = Query(None, alias="format"),
+    category: Optional[str] = None,
+    file_type: Optional[str] = Query(None, alias="type"),
+) -> Dict:
+    """
+    Filters of the File list routes.
+    """
+    return {"format": file_format, "category": category, "type": file_type}
+
+
 @file_router.get("/files", response_model=List[File], summary="Get all Files")
-async def get_all_files():
+async def get_all_files(  # pylint: disable=too-many-arguments
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Dict = Depends(file_filters),
+):
     """
     Retrieve a list of File records from the metadata store.
     """
-    files = await retrieve_files()
-    return files
+    if wants_ndjson(request):
+        return ndjson_response(stream_files(limit, cursor, fields, filters))
+    limit = page_limit(limit)
+    not_modified = await check_page(request, File, limit, cursor, filters)
+    if not_modified is not None:
+        return not_modified
+    files = await retrieve_files(limit, cursor, versioned_fields(fields), filters)
+    add_pagination_headers(request, response, files, limit)
+    files = add_version_headers(request, response, File, files, fields)
+    return read_response(files, response, fields, request)
+
+
+@file_router.get("/files/count", response_model=CountResult, summary="Count Files")
+async def count_all_files(exact: bool = True, filters: Dict = Depends(file_filters)):
+    """
+    Count the File records in the metadata store. With ``exact=false``,
+    unfiltered counts are estimated from the collection metadata.
+    """
+    result = await count_files(filters, exact)
+    return result
+
+
+@file_router.head("/files", summary="Count Files in a header")
+async def head_all_files(exact: bool = True, filters: Dict = Depends(file_filters)):
+    """
+    Return the number of File records in the ``X-Total-Count`` header.
+    """
+    result = await count_files(filters, exact)
+    return Response(headers={"X-Total-Count": str(result["count"])})
 
 
 @file_router.get("/files/{file_id}", response_model=File, summary="Get a File")
-async def get_files(file_id: str, embedded: bool = False):
+async def get_files(  # pylint: disable=too-many-arguments
+    file_id: str,
+    request: Request,
+    response: Response,
+    embedded: bool = False,
+    engine: Optional[str] = Query(None, regex="^(client|lookup)$"),
+    embed: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+    fields: Optional[str] = None,
+):
     """
     Given a File ID, get the File record from the metadata store.
     """
-    file = await get_file(file_id, embedded)
-    return file
+    not_modified = await check_document(
+        request, file_id, File, embedded, embed, depth, fields
+    )
+    if not_modified is not None:
+        return not_modified
+    file = await get_file(
+        file_id, embedded, engine, embed, depth, versioned_fields(fields)
+    )
+    add_watermark_header(response, file)
+    file = add_version_headers(request, response, File, file, fields)
+    return read_response(file, response, fields, request)
+
+
+@file_router.post(
+    "/files/batch_get",
+    response_model=List[BatchGetResult[File]],
+    summary="Get many Files",
+)
+async def get_files_batch(  # pylint: disable=too-many-arguments
+    data: BatchGetRequest,
+    request: Request,
+    response: Response,
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+):
+    """
+    Given a list of File IDs, get the File records from the metadata store.
+    Results are returned in request order and mark the IDs that were not found.
+    """
+    results = await batch_get_files(data.ids, embedded, embed, depth)
+    return read_response(results, response, request=request)
 
 
 @file_router.post("/files", response_model=File, summary="Add a File")
@@ -54,6 +165,20 @@ async def add_files(data: File):
     return experiment
 
 
+@file_router.post(
+    "/files/bulk",
+    response_model=List[BulkCreateResult],
+    summary="Add many Files",
+)
+async def add_files_bulk(data: List[File]):
+    """
+    Add many File records to the metadata store. Records that cannot be
+    added are reported in the results without failing the others.
+    """
+    results = await bulk_add_files(data)
+    return results
+
+
 @file_router.put("/files/{file_id}", response_model=File, summary="Update a File")
 async def update_files(file_id: str, data: File):
     """
@@ -61,3 +186,13 @@ async def update_files(file_id: str, data: File):
     """
     file = await update_file(file_id, data)
     return file
+
+
+@file_router.patch("/files/{file_id}", response_model=File, summary="Patch a File")
+async def patch_files(file_id: str, data: PatchRequest):
+    """
+    Given a File ID and a patch, update only the patched fields of the
+    File record in metadata store.
+    """
+    file = await patch_file(file_id, data)
+    return file
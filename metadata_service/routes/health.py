@@ -18,6 +18,8 @@ Health endpoint to check the health of the API
 
 from fastapi import APIRouter
 
+from metadata_service.core.cache import get_cache, get_negative_cache
+
 health_router = APIRouter()
 
 
@@ -27,3 +29,13 @@ async def get_health():
     Check health of service.
     """
     return {"status": "OK"}
+
+
+@health_router.get("/health/cache", summary="Get statistics of the read cache")
+async def get_cache_stats():
+    """
+    Get the hit, miss, eviction, expiration and invalidation counters
+    of the read cache of this worker. The hits of the ``negative`` cache
+    are the lookups of missing IDs that were suppressed.
+    """
+    return {**get_cache().stats(), "negative": get_negative_cache().stats()}
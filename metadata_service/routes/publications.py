@@ -17,16 +17,38 @@
 Routes for interacting with Publication records
 """
 
-from typing import List
-from fastapi import APIRouter
+from typing import List, Optional
+from fastapi import APIRouter, Query, Request, Response
 
+from metadata_service.core.conditional import (
+    add_version_headers,
+    check_document,
+    check_page,
+    versioned_fields,
+)
+from metadata_service.core.pagination import add_pagination_headers, page_limit
+from metadata_service.core.serialization import read_response
+from metadata_service.core.streaming import ndjson_response, wants_ndjson
+from metadata_service.core.views import add_watermark_header
 from metadata_service.dao.publication import (
+    count_publications,
+    patch_publication,
+    bulk_add_publications,
+    batch_get_publications,
+    stream_publications,
     get_publication,
     retrieve_publications,
     add_publication,
     update_publication,
 )
-from metadata_service.models import Publication
+from metadata_service.models import (
+    BatchGetRequest,
+    BatchGetResult,
+    BulkCreateResult,
+    CountResult,
+    PatchRequest,
+    Publication,
+)
 
 
 publication_router = APIRouter()
@@ -35,12 +57,49 @@ publication_router = APIRouter()
 @publication_router.get(
     "/publications", response_model=List[Publication], summary="Get all Publications"
 )
-async def get_all_publications():
+async def get_all_publications(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     """
     Retrieve a list of Publication records from the metadata store.
     """
-    publications = await retrieve_publications()
-    return publications
+    if wants_ndjson(request):
+        return ndjson_response(stream_publications(limit, cursor, fields))
+    limit = page_limit(limit)
+    not_modified = await check_page(request, Publication, limit, cursor)
+    if not_modified is not None:
+        return not_modified
+    publications = await retrieve_publications(limit, cursor, versioned_fields(fields))
+    add_pagination_headers(request, response, publications, limit)
+    publications = add_version_headers(
+        request, response, Publication, publications, fields
+    )
+    return read_response(publications, response, fields, request)
+
+
+@publication_router.get(
+    "/publications/count", response_model=CountResult, summary="Count Publications"
+)
+async def count_all_publications(exact: bool = True):
+    """
+    Count the Publication records in the metadata store. With ``exact=false``,
+    unfiltered counts are estimated from the collection metadata.
+    """
+    result = await count_publications(exact=exact)
+    return result
+
+
+@publication_router.head("/publications", summary="Count Publications in a header")
+async def head_all_publications(exact: bool = True):
+    """
+    Return the number of Publication records in the ``X-Total-Count`` header.
+    """
+    result = await count_publications(exact=exact)
+    return Response(headers={"X-Total-Count": str(result["count"])})
 
 
 @publication_router.get(
@@ -48,12 +107,53 @@ async def get_all_publications():
     response_model=Publication,
     summary="Get a Publication",
 )
-async def get_publications(publication_id: str, embedded: bool = False):
+async def get_publications(  # pylint: disable=too-many-arguments
+    publication_id: str,
+    request: Request,
+    response: Response,
+    embedded: bool = False,
+    engine: Optional[str] = Query(None, regex="^(client|lookup)$"),
+    embed: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+    fields: Optional[str] = None,
+):
     """
     Given a Publication ID, get the Publication record from metadata store.
     """
-    publication = await get_publication(publication_id, embedded)
-    return publication
+    not_modified = await check_document(
+        request, publication_id, Publication, embedded, embed, depth, fields
+    )
+    if not_modified is not None:
+        return not_modified
+    publication = await get_publication(
+        publication_id, embedded, engine, embed, depth, versioned_fields(fields)
+    )
+    add_watermark_header(response, publication)
+    publication = add_version_headers(
+        request, response, Publication, publication, fields
+    )
+    return read_response(publication, response, fields, request)
+
+
+@publication_router.post(
+    "/publications/batch_get",
+    response_model=List[BatchGetResult[Publication]],
+    summary="Get many Publications",
+)
+async def get_publications_batch(  # pylint: disable=too-many-arguments
+    data: BatchGetRequest,
+    request: Request,
+    response: Response,
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+):
+    """
+    Given a list of Publication IDs, get the Publication records from the metadata store.
+    Results are returned in request order and mark the IDs that were not found.
+    """
+    results = await batch_get_publications(data.ids, embedded, embed, depth)
+    return read_response(results, response, request=request)
 
 
 @publication_router.post(
@@ -67,6 +167,20 @@ async def add_publications(data: Publication):
     return publication
 
 
+@publication_router.post(
+    "/publications/bulk",
+    response_model=List[BulkCreateResult],
+    summary="Add many Publications",
+)
+async def add_publications_bulk(data: List[Publication]):
+    """
+    Add many Publication records to the metadata store. Records that cannot be
+    added are reported in the results without failing the others.
+    """
+    results = await bulk_add_publications(data)
+    return results
+
+
 @publication_router.put(
     "/publications/{publication_id}",
     response_model=Publication,
@@ -78,3 +192,17 @@ async def update_publications(publication_id: str, data: Publication):
     """
     publication = await update_publication(publication_id, data)
     return publication
+
+
+@publication_router.patch(
+    "/publications/{publication_id}",
+    response_model=Publication,
+    summary="Patch a Publication",
+)
+async def patch_publications(publication_id: str, data: PatchRequest):
+    """
+    Given a Publication ID and a patch, update only the patched fields of the
+    Publication record in metadata store.
+    """
+    publication = await patch_publication(publication_id, data)
+    return publication
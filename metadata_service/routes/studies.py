@@ -15,37 +15,144 @@
 
 """Routes for interacting with Study records"""
 
-from typing import List
-from fastapi import APIRouter
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response
 
+from metadata_service.core.conditional import (
+    add_version_headers,
+    check_document,
+    check_page,
+    versioned_fields,
+)
+from metadata_service.core.pagination import add_pagination_headers, page_limit
+from metadata_service.core.serialization import read_response
+from metadata_service.core.streaming import ndjson_response, wants_ndjson
+from metadata_service.core.views import add_watermark_header
 from metadata_service.dao.study import (
+    count_studies,
+    patch_study,
+    bulk_add_studies,
+    batch_get_studies,
+    stream_studies,
     add_study,
     get_study,
     retrieve_studies,
     update_study,
 )
-from metadata_service.models import Study
+from metadata_service.models import (
+    BatchGetRequest,
+    BatchGetResult,
+    BulkCreateResult,
+    CountResult,
+    PatchRequest,
+    Study,
+)
 
 
 studies_router = APIRouter()
 
 
+def study_filters(
+    study_type: Optional[str] = Query(None, alias="type"),
+    has_experiment: Optional[str] = None,
+) -> Dict:
+    """
+    Filters of the Study list routes.
+    """
+    return {"type": study_type, "has_experiment": has_experiment}
+
+
 @studies_router.get("/studies", response_model=List[Study], summary="Get all Studies")
-async def get_all_studies():
+async def get_all_studies(  # pylint: disable=too-many-arguments
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filters: Dict = Depends(study_filters),
+):
     """
     Retrieve a list of Study records from metadata store.
     """
-    studies = await retrieve_studies()
-    return studies
+    if wants_ndjson(request):
+        return ndjson_response(stream_studies(limit, cursor, fields, filters))
+    limit = page_limit(limit)
+    not_modified = await check_page(request, Study, limit, cursor, filters)
+    if not_modified is not None:
+        return not_modified
+    studies = await retrieve_studies(limit, cursor, versioned_fields(fields), filters)
+    add_pagination_headers(request, response, studies, limit)
+    studies = add_version_headers(request, response, Study, studies, fields)
+    return read_response(studies, response, fields, request)
+
+
+@studies_router.get(
+    "/studies/count", response_model=CountResult, summary="Count Studies"
+)
+async def count_all_studies(exact: bool = True, filters: Dict = Depends(study_filters)):
+    """
+    Count the Study records in the metadata store. With ``exact=false``,
+    unfiltered counts are estimated from the collection metadata.
+    """
+    result = await count_studies(filters, exact)
+    return result
+
+
+@studies_router.head("/studies", summary="Count Studies in a header")
+async def head_all_studies(exact: bool = True, filters: Dict = Depends(study_filters)):
+    """
+    Return the number of Study records in the ``X-Total-Count`` header.
+    """
+    result = await count_studies(filters, exact)
+    return Response(headers={"X-Total-Count": str(result["count"])})
 
 
 @studies_router.get("/studies/{study_id}", response_model=Study, summary="Get a Study")
-async def get_studies(study_id: str, embedded: bool = False):
+async def get_studies(  # pylint: disable=too-many-arguments
+    study_id: str,
+    request: Request,
+    response: Response,
+    embedded: bool = False,
+    engine: Optional[str] = Query(None, regex="^(client|lookup)$"),
+    embed: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+    fields: Optional[str] = None,
+):
     """
     Given a Study ID, get the DAP record from metadata store.
     """
-    study = await get_study(study_id, embedded)
-    return study
+    not_modified = await check_document(
+        request, study_id, Study, embedded, embed, depth, fields
+    )
+    if not_modified is not None:
+        return not_modified
+    study = await get_study(
+        study_id, embedded, engine, embed, depth, versioned_fields(fields)
+    )
+    add_watermark_header(response, study)
+    study = add_version_headers(request, response, Study, study, fields)
+    return read_response(study, response, fields, request)
+
+
+@studies_router.post(
+    "/studies/batch_get",
+    response_model=List[BatchGetResult[Study]],
+    summary="Get many Studies",
+)
+async def get_studies_batch(  # pylint: disable=too-many-arguments
+    data: BatchGetRequest,
+    request: Request,
+    response: Response,
+    embedded: bool = False,
+    embed: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=0),
+):
+    """
+    Given a list of Study IDs, get the Study records from the metadata store.
+    Results are returned in request order and mark the IDs that were not found.
+    """
+    results = await batch_get_studies(data.ids, embedded, embed, depth)
+    return read_response(results, response, request=request)
 
 
 @studies_router.post("/studies", response_model=Study, summary="Add a Study")
@@ -57,6 +164,20 @@ async def add_studies(data: Study):
     return study
 
 
+@studies_router.post(
+    "/studies/bulk",
+    response_model=List[BulkCreateResult],
+    summary="Add many Studies",
+)
+async def add_studies_bulk(data: List[Study]):
+    """
+    Add many Study records to the metadata store. Records that cannot be
+    added are reported in the results without failing the others.
+    """
+    results = await bulk_add_studies(data)
+    return results
+
+
 @studies_router.put(
     "/studies/{study_id}", response_model=Study, summary="Update a Study"
 )
@@ -66,3 +187,15 @@ async def update_studies(study_id, data: Study):
     """
     study = await update_study(study_id, data)
     return study
+
+
+@studies_router.patch(
+    "/studies/{study_id}", response_model=Study, summary="Patch a Study"
+)
+async def patch_studies(study_id: str, data: PatchRequest):
+    """
+    Given a Study ID and a patch, update only the patched fields of the
+    Study record in metadata store.
+    """
+    study = await patch_study(study_id, data)
+    return study
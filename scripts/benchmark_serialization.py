@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+# Copyright 2021 Universität Tübingen, DKFZ and EMBL
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compares the per-record cost of serializing Datasets through the response
+model of a route and through the trusted read path"""
+
+import asyncio
+import time
+from typing import Callable, Dict, List
+import typer
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from metadata_service.core import serialization
+from metadata_service.models import Dataset
+
+
+def make_file(index: int) -> Dict:
+    """Make a File document as it is stored in the metadata store"""
+    return {
+        "id": f"FIL:{index:07}",
+        "name": f"file_{index}.cram",
+        "format": "cram",
+        "type": "sequence",
+        "size": "123456789",
+        "checksum": "d41d8cd98f00b204e9800998ecf8427e",
+        "category": "raw",
+        "xref": [f"EGAF{index:011}"],
+        "creation_date": "2021-06-01T12:00:00.000000",
+        "update_date": "2021-06-01T12:00:00.000000",
+    }
+
+
+def make_dataset(index: int, files: int, embedded: bool) -> Dict:
+    """Make a Dataset document with ``files`` files, either with references as
+    IDs or with all references embedded"""
+    file_docs = [make_file(index * files + i) for i in range(files)]
+    study = {
+        "id": f"STU:{index:07}",
+        "title": f"Study {index}",
+        "type": "Cancer Genomics",
+        "publications": [f"PUB:{index:07}"],
+        "has_experiment": f"EXP:{index:07}",
+    }
+    policy = {
+        "id": f"DAP:{index:07}",
+        "title": f"Data Access Policy {index}",
+        "has_data_access_committee": f"DAC:{index:07}",
+    }
+    return {
+        "id": f"DAT:{index:07}",
+        "title": f"Dataset {index}",
+        "description": "A dataset for benchmarking serialization",
+        "type": ["Whole genome sequencing"],
+        "files": file_docs if embedded else [doc["id"] for doc in file_docs],
+        "has_study": study if embedded else study["id"],
+        "has_data_access_policy": policy if embedded else policy["id"],
+        "xref": [f"EGAD{index:011}"],
+        "creation_date": "2021-06-01T12:00:00.000000",
+        "update_date": "2021-06-01T12:00:00.000000",
+    }
+
+
+def response_model_path(documents: List[Dict]) -> bytes:
+    """Validate and serialize like a route with ``response_model=List[Dataset]``"""
+    field = create_response_field(name="Response", type_=List[Dataset])
+    content = asyncio.run(serialize_response(field=field, response_content=documents))
+    return JSONResponse(content).body
+
+
+def trusted_path(documents: List[Dict]) -> bytes:
+    """Serialize like a route with the ``trusted_reads`` setting"""
+    return serialization.TrustedJSONResponse(documents).body
+
+
+def per_record_cost(
+    path: Callable[[List[Dict]], bytes], documents: List[Dict], repeat: int
+) -> float:
+    """Return the best per-record time of ``repeat`` runs in microseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        path(documents)
+        best = min(best, time.perf_counter() - start)
+    return best / len(documents) * 1e6
+
+
+def main(records: int = 1000, files: int = 20, repeat: int = 5):
+    """Compare the serialization paths for flat and embedded Datasets"""
+
+    encoder = "orjson" if serialization.orjson is not None else "json"
+    typer.echo(f"{records} Datasets with {files} files each, encoder: {encoder}")
+    typer.echo(f"{'':10}{'response_model':>16}{'trusted':>12}{'speedup':>10}")
+    for label, embedded in (("flat", False), ("embedded", True)):
+        documents = [make_dataset(i, files, embedded) for i in range(records)]
+        validated = per_record_cost(response_model_path, documents, repeat)
+        trusted = per_record_cost(trusted_path, documents, repeat)
+        typer.echo(
+            f"{label:10}{validated:14.1f}us{trusted:10.1f}us"
+            f"{validated / trusted:9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -20,7 +20,7 @@
 import os
 import json
 from pathlib import Path
-from typing import Literal, get_args
+from typing import Literal, Optional, get_args
 import requests
 from requests.models import Response
 import typer
@@ -45,19 +45,24 @@ def populate_record(
     example_dir: Path,
     record_type: RecordTypes,
     exit_on_error: bool = True,
-) -> Response:
-    """Populate the database with data for a specific record type"""
+) -> Optional[Response]:
+    """Populate the database with data for a specific record type,
+    adding all its records with a single bulk request"""
 
     file = os.path.join(example_dir, f"{record_type}.json")
     if os.path.exists(file):
         with open(file) as records_file:
             records = json.load(records_file)
-        route = f"{base_url}/{record_type}"
-        for record in records[record_type]:
-            response = requests.post(route, json=record)
-            if exit_on_error:
-                # If non-2xx status code, will raise an exception:
-                response.raise_for_status()
+        route = f"{base_url}/{record_type}/bulk"
+        response = requests.post(route, json=records[record_type])
+        if exit_on_error:
+            # If non-2xx status code, will raise an exception:
+            response.raise_for_status()
+        for result in response.json() if response.ok else []:
+            if not result["created"]:
+                typer.echo(f"  - could not add {result['id']}: {result['error']}")
+                if exit_on_error:
+                    raise typer.Exit(code=1)
         return response
     return None
 
@@ -1,7 +1,10 @@
 """
 Test Dataset routes
 """
+import json
 import pytest
+from metadata_service.config import get_config
+from metadata_service.core.cache import get_cache
 from tests.fixtures import initialize_test_db, api_client
 
 
@@ -42,8 +45,371 @@ def test_update_dataset_route(initialize_test_db, api_client):
         json={"id": "DAT:0000002", "title": "Modified Dataset 2"},
     )
     assert response.status_code == 200
+    assert response.json()["title"] == "Modified Dataset 2"
 
     response = api_client.get("/datasets/DAT:0000002")
     assert response.status_code == 200
     dataset = response.json()
     assert dataset["title"] == "Modified Dataset 2"
+
+    response = api_client.put(
+        "/datasets/DAT:9999999", json={"title": "Missing Dataset"}
+    )
+    assert response.status_code == 404
+
+
+def test_get_dataset_route_selective_embedding(initialize_test_db, api_client):
+    """Test embedding only selected references of a dataset record"""
+    response = api_client.get(
+        "/datasets/DAT:0000001",
+        params={"embed": "has_study,has_data_access_policy", "depth": 1},
+    )
+    assert response.status_code == 200
+    dataset = response.json()
+    assert all(isinstance(file, str) for file in dataset["files"])
+    assert dataset["has_study"]["id"] == "STU:0000001"
+    assert isinstance(
+        dataset["has_data_access_policy"]["has_data_access_committee"], str
+    )
+
+    response = api_client.get("/datasets/DAT:0000001", params={"embed": "unknown"})
+    assert response.status_code == 422
+
+
+def test_get_dataset_route_pagination(initialize_test_db, api_client):
+    """Test paging through dataset records with a cursor"""
+    response = api_client.get("/datasets")
+    all_ids = sorted(x["id"] for x in response.json())
+
+    paged_ids = []
+    params = {"limit": 1}
+    while True:
+        response = api_client.get("/datasets", params=params)
+        assert response.status_code == 200
+        paged_ids.extend(x["id"] for x in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        assert 'rel="next"' in response.headers["Link"]
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert paged_ids == all_ids
+
+
+def test_get_dataset_route_ndjson(initialize_test_db, api_client):
+    """Test streaming dataset records as newline delimited JSON"""
+    response = api_client.get("/datasets")
+    all_ids = sorted(x["id"] for x in response.json())
+
+    response = api_client.get("/datasets", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    datasets = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(x["id"] for x in datasets) == all_ids
+
+
+def test_get_dataset_route_fields(initialize_test_db, api_client):
+    """Test fetching only selected fields of dataset records"""
+    response = api_client.get("/datasets", params={"fields": "title,type"})
+    assert response.status_code == 200
+    assert all(set(x) <= {"id", "title", "type"} for x in response.json())
+
+    response = api_client.get(
+        "/datasets/DAT:0000001",
+        params={"fields": "title,has_study", "embedded": True},
+    )
+    assert response.status_code == 200
+    dataset = response.json()
+    assert set(dataset) == {"id", "title", "has_study"}
+    assert dataset["has_study"]["id"] == "STU:0000001"
+
+    response = api_client.get("/datasets", params={"fields": "unknown"})
+    assert response.status_code == 422
+
+
+def test_get_dataset_route_filters(initialize_test_db, api_client):
+    """Test filtering dataset records on the server side"""
+    response = api_client.get("/datasets", params={"has_study": "STU:0000001"})
+    assert response.status_code == 200
+    assert [x["id"] for x in response.json()] == ["DAT:0000001"]
+
+    response = api_client.get(
+        "/datasets", params={"type": "genomic", "has_study": "STU:0000002"}
+    )
+    assert [x["id"] for x in response.json()] == ["DAT:0000002"]
+
+    response = api_client.get("/datasets", params={"type": "unknown"})
+    assert response.json() == []
+
+
+def test_get_dataset_route_batch(initialize_test_db, api_client):
+    """Test fetching many dataset records by ID in one request"""
+    ids = ["DAT:0000002", "DAT:9999999", "DAT:0000001"]
+    response = api_client.post(
+        "/datasets/batch_get", json={"ids": ids}, params={"embed": "has_study"}
+    )
+    assert response.status_code == 200
+    results = response.json()
+    assert [x["id"] for x in results] == ids
+    assert [x["found"] for x in results] == [True, False, True]
+    assert results[1]["record"] is None
+    assert results[0]["record"]["has_study"]["id"] == "STU:0000002"
+    assert isinstance(results[0]["record"]["has_data_access_policy"], str)
+
+
+def test_patch_dataset_route(initialize_test_db, api_client):
+    """Test partially updating a dataset record in metadata store"""
+    response = api_client.get("/datasets/DAT:0000001")
+    files = response.json()["files"]
+
+    response = api_client.patch(
+        "/datasets/DAT:0000001",
+        json={
+            "set": {"title": "Patched Dataset 1"},
+            "add_to_set": {"files": ["FIL:0000099", files[0]]},
+        },
+    )
+    assert response.status_code == 200
+    dataset = response.json()
+    assert dataset["title"] == "Patched Dataset 1"
+    assert dataset["files"] == files + ["FIL:0000099"]
+
+    response = api_client.patch(
+        "/datasets/DAT:0000001", json={"pull": {"files": ["FIL:0000099"]}}
+    )
+    assert response.json()["files"] == files
+
+    response = api_client.patch(
+        "/datasets/DAT:0000001", json={"add_to_set": {"title": ["x"]}}
+    )
+    assert response.status_code == 422
+
+    for patch in (
+        {"set": {"files": "FIL:0000001"}},
+        {"set": {"files": [{"id": "FIL:0000001"}]}},
+        {"set": {"has_study": ["STU:0000001"]}},
+        {"add_to_set": {"files": "FIL:0000001"}},
+        {"pull": {"xref": None}},
+    ):
+        response = api_client.patch("/datasets/DAT:0000001", json=patch)
+        assert response.status_code == 422
+    assert api_client.get("/datasets/DAT:0000001").json()["files"] == files
+
+    response = api_client.patch("/datasets/DAT:9999999", json={"set": {"title": "x"}})
+    assert response.status_code == 404
+
+
+def test_get_dataset_route_cache(initialize_test_db, api_client):
+    """Test that repeated reads are served from the cache until a write"""
+    api_client.get("/datasets/DAT:0000002")
+    hits = api_client.get("/health/cache").json()["hits"]
+    response = api_client.get("/datasets/DAT:0000002")
+    assert response.status_code == 200
+    assert api_client.get("/health/cache").json()["hits"] == hits + 1
+
+    api_client.patch("/datasets/DAT:0000002", json={"set": {"title": "Cached"}})
+    response = api_client.get("/datasets/DAT:0000002")
+    assert response.json()["title"] == "Cached"
+
+
+def test_get_route_negative_cache(initialize_test_db, api_client):
+    """Test that lookups of missing IDs are suppressed until the ID is added"""
+    assert api_client.get("/files/FIL:NEGATIVE").status_code == 404
+    suppressed = api_client.get("/health/cache").json()["negative"]["hits"]
+    assert api_client.get("/files/FIL:NEGATIVE").status_code == 404
+    assert api_client.get("/health/cache").json()["negative"]["hits"] == suppressed + 1
+
+    response = api_client.post("/files", json={"id": "FIL:NEGATIVE"})
+    assert response.status_code == 200
+    assert api_client.get("/files/FIL:NEGATIVE").status_code == 200
+
+
+def test_conditional_get_dataset_route(initialize_test_db, api_client):
+    """Test conditional GETs of dataset records with ETags and Last-Modified"""
+    response = api_client.get("/datasets/DAT:0000001")
+    etag = response.headers["etag"]
+    study_id = response.json()["has_study"]
+    response = api_client.get(
+        "/datasets/DAT:0000001", headers={"If-None-Match": f'"x", {etag}'}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert not response.content
+
+    response = api_client.get("/datasets/DAT:0000001?embedded=true")
+    embedded_etag = response.headers["etag"]
+    assert embedded_etag != etag
+
+    api_client.patch(f"/studies/{study_id}", json={"set": {"title": "Patched"}})
+    response = api_client.get("/datasets/DAT:0000001", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    response = api_client.get(
+        "/datasets/DAT:0000001?embedded=true",
+        headers={"If-None-Match": embedded_etag},
+    )
+    assert response.status_code == 200
+    assert response.json()["has_study"]["title"] == "Patched"
+    last_modified = response.headers["last-modified"]
+    response = api_client.get(
+        "/datasets/DAT:0000001?embedded=true",
+        headers={"If-Modified-Since": last_modified},
+    )
+    assert response.status_code == 304
+
+    response = api_client.get("/datasets?limit=2")
+    etag = response.headers["etag"]
+    api_client.patch("/datasets/DAT:0000001", json={"set": {"title": "Patched"}})
+    response = api_client.get("/datasets?limit=2", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    response = api_client.get(
+        "/datasets?limit=2", headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert response.status_code == 304
+
+
+def test_conditional_get_served_version(initialize_test_db, api_client):
+    """Test that ETags describe the documents that were actually served"""
+    response = api_client.get("/datasets/DAT:0000002?fields=title")
+    assert "update_date" not in response.json()
+    response = api_client.get(
+        "/datasets/DAT:0000002?fields=title",
+        headers={"If-None-Match": response.headers["etag"]},
+    )
+    assert response.status_code == 304
+    response = api_client.get("/datasets?limit=2&fields=title")
+    assert all("update_date" not in dataset for dataset in response.json())
+    response = api_client.get(
+        "/datasets?limit=2&fields=title",
+        headers={"If-None-Match": response.headers["etag"]},
+    )
+    assert response.status_code == 304
+
+    dataset = api_client.get("/datasets/DAT:0000002").json()
+    stale = {**dataset, "title": "Stale", "update_date": "2020-01-01T00:00:00"}
+    get_cache().put(("dataset", "DAT:0000002"), stale)
+    response = api_client.get("/datasets/DAT:0000002")
+    assert response.json()["title"] == "Stale"
+    assert response.headers["last-modified"] == "Wed, 01 Jan 2020 00:00:00 GMT"
+    response = api_client.get(
+        "/datasets/DAT:0000002", headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert response.status_code == 200
+    get_cache().invalidate(("dataset", "DAT:0000002"))
+
+
+def test_trusted_reads_dataset_route(initialize_test_db, api_client, monkeypatch):
+    """Test that trusted reads return the documents as stored"""
+    validated = api_client.get("/datasets/DAT:0000001?embedded=true").json()
+    monkeypatch.setattr(get_config(), "trusted_reads", True)
+    trusted = api_client.get("/datasets/DAT:0000001?embedded=true").json()
+    assert trusted["title"] == validated["title"]
+    assert trusted["has_study"]["id"] == validated["has_study"]["id"]
+    assert [f["id"] for f in trusted["files"]] == [f["id"] for f in validated["files"]]
+    assert None not in trusted.values()
+    response = api_client.get("/datasets?limit=2")
+    assert [dataset["id"] for dataset in response.json()] == [
+        "DAT:0000001",
+        "DAT:0000002",
+    ]
+
+
+def test_msgpack_dataset_route(initialize_test_db, api_client):
+    """Test reading dataset records as MessagePack"""
+    msgpack = pytest.importorskip("msgpack")
+    headers = {"Accept": "application/msgpack"}
+    expected = api_client.get("/datasets/DAT:0000001?embedded=true").json()
+    response = api_client.get("/datasets/DAT:0000001?embedded=true", headers=headers)
+    assert response.headers["content-type"] == "application/msgpack"
+    dataset = msgpack.unpackb(response.content)
+    assert dataset["title"] == expected["title"]
+    assert [f["id"] for f in dataset["files"]] == [f["id"] for f in expected["files"]]
+
+    response = api_client.get("/datasets?limit=2", headers=headers)
+    assert [x["id"] for x in msgpack.unpackb(response.content)] == [
+        "DAT:0000001",
+        "DAT:0000002",
+    ]
+    response = api_client.post(
+        "/datasets/batch_get", json={"ids": ["DAT:0000001"]}, headers=headers
+    )
+    assert msgpack.unpackb(response.content)[0]["found"]
+
+
+def test_count_dataset_route(initialize_test_db, api_client):
+    """Test counting dataset records with the count route and HEAD"""
+    total = len(api_client.get("/datasets").json())
+    response = api_client.get("/datasets/count")
+    assert response.status_code == 200
+    assert response.json() == {"count": total, "exact": True}
+    response = api_client.get("/datasets/count", params={"exact": "false"})
+    assert response.json() == {"count": total, "exact": False}
+
+    study_id = api_client.get("/datasets/DAT:0000001").json()["has_study"]
+    expected = len(api_client.get("/datasets", params={"has_study": study_id}).json())
+    response = api_client.get(
+        "/datasets/count", params={"has_study": study_id, "exact": "false"}
+    )
+    assert response.json() == {"count": expected, "exact": True}
+
+    response = api_client.head("/datasets")
+    assert response.status_code == 200
+    assert response.headers["x-total-count"] == str(total)
+    assert not response.content
+    response = api_client.head("/datasets", params={"has_study": study_id})
+    assert response.headers["x-total-count"] == str(expected)
+
+
+def test_lookup_engine_dataset_route(initialize_test_db, api_client):
+    """Test that the $lookup engine embeds the same documents as the client"""
+    url = "/datasets/DAT:0000001?embedded=true"
+    expected = api_client.get(url, params={"engine": "client"}).json()
+    response = api_client.get(url, params={"engine": "lookup", "fields": "files"})
+    assert response.status_code == 200
+    dataset = response.json()
+    assert [f["id"] for f in dataset["files"]] == [f["id"] for f in expected["files"]]
+    assert all("_id" not in f for f in dataset["files"])
+    response = api_client.get(url, params={"engine": "lookup"})
+    assert response.json() == expected
+
+
+def test_materialized_dataset_route(initialize_test_db, api_client, monkeypatch):
+    """Test that embedded datasets are served from the materialized view and
+    refreshed when an embedded document changes"""
+    monkeypatch.setattr(get_config(), "materialized_views", ["dataset"])
+    url = "/datasets/DAT:0000001?embedded=true"
+    response = api_client.get(url)
+    assert response.status_code == 200
+    materialized_at = response.headers["x-materialized-at"]
+    dataset = response.json()
+    assert "_materialized_at" not in dataset
+
+    study_id = dataset["has_study"]["id"]
+    api_client.patch(f"/studies/{study_id}", json={"set": {"title": "Refreshed"}})
+    response = api_client.get(url)
+    assert response.json()["has_study"]["title"] == "Refreshed"
+    assert response.headers["x-materialized-at"] > materialized_at
+
+    response = api_client.get("/datasets/DAT:0000001")
+    assert "x-materialized-at" not in response.headers
+
+
+def test_patch_new_dataset_route(initialize_test_db, api_client):
+    """Test patching the list fields of a dataset that was added without them"""
+    response = api_client.post("/datasets", json={"title": "New Dataset"})
+    dataset_id = response.json()["id"]
+
+    response = api_client.patch(
+        f"/datasets/{dataset_id}",
+        json={"add_to_set": {"files": ["FIL:0000001", "FIL:0000002"]}},
+    )
+    assert response.status_code == 200
+    assert response.json()["files"] == ["FIL:0000001", "FIL:0000002"]
+
+    response = api_client.patch(
+        f"/datasets/{dataset_id}", json={"pull": {"xref": ["x"]}}
+    )
+    assert response.status_code == 200
+    assert response.json()["xref"] == []
+
+    response = api_client.patch(
+        f"/datasets/{dataset_id}", json={"set": {"description": "$title"}}
+    )
+    assert response.json()["description"] == "$title"
@@ -43,3 +43,20 @@ def test_update_experiment_route(initialize_test_db, api_client):
     assert response.status_code == 200
     experiment = response.json()
     assert experiment["name"] == "Modified Experiment 2"
+
+
+def test_add_experiment_route_bulk(initialize_test_db, api_client):
+    """Test adding many experiment records to metadata store at once"""
+    response = api_client.post(
+        "/experiments/bulk",
+        json=[{"name": "Bulk Experiment 1"}, {"name": "Bulk Experiment 2"}],
+    )
+    assert response.status_code == 200
+    results = response.json()
+    assert [x["created"] for x in results] == [True, True]
+    first, second = (int(x["id"].split(":")[1]) for x in results)
+    assert second == first + 1
+
+    response = api_client.get(f"/experiments/{results[1]['id']}")
+    assert response.status_code == 200
+    assert response.json()["name"] == "Bulk Experiment 2"
@@ -43,3 +43,22 @@ def test_update_study_route(initialize_test_db, api_client):
     assert response.status_code == 200
     study = response.json()
     assert study["title"] == "Modified Study 2"
+
+
+def test_get_study_route_fields(initialize_test_db, api_client):
+    """Test fetching only selected fields of study records"""
+    response = api_client.get("/studies", params={"fields": "title"})
+    assert response.status_code == 200
+    studies = response.json()
+    assert studies
+    assert all(set(x) == {"id", "title"} for x in studies)
+
+
+def test_lookup_engine_study_route(initialize_test_db, api_client):
+    """Test that the $lookup engine embeds leaf references like the client engine"""
+    for study_id in ("STU:0000001", "STU:0000002"):
+        lookup = api_client.get(f"/studies/{study_id}?embedded=true&engine=lookup")
+        client = api_client.get(f"/studies/{study_id}?embedded=true&engine=client")
+        assert lookup.status_code == 200
+        assert lookup.json() == client.json()
+        assert lookup.json()["has_experiment"]["id"].startswith("EXP:")
@@ -0,0 +1,46 @@
+"""
+Test compilation of embedding aggregation pipelines
+"""
+from metadata_service.core.aggregation import build_embed_pipeline, stitch_references
+from metadata_service.models import Dataset, Study
+
+
+def test_build_embed_pipeline():
+    """Test that nested references compile into nested $lookup stages"""
+    pipeline = build_embed_pipeline(Dataset)
+    lookups = {
+        stage["$lookup"]["from"]: stage["$lookup"]
+        for stage in pipeline
+        if "$lookup" in stage
+    }
+    assert set(lookups) == {"file", "study", "data_access_policy"}
+    assert lookups["file"]["localField"] == "files"
+    assert lookups["file"]["foreignField"] == "id"
+    assert pipeline[-1] == {"$project": {"__files._id": 0}}
+    assert lookups["study"]["let"] == {"refs": "$has_study"}
+    assert lookups["study"]["pipeline"][1] == {"$project": {"_id": 0}}
+    nested = [
+        stage["$lookup"]["from"]
+        for stage in lookups["study"]["pipeline"]
+        if "$lookup" in stage
+    ]
+    assert sorted(nested) == ["experiment", "publication"]
+
+
+def test_stitch_references():
+    """Test that looked up documents replace references in their original order"""
+    document = {
+        "id": "STU:0000001",
+        "publications": ["PMID:0000002", "PMID:0000001", "PMID:0000003"],
+        "has_experiment": "EXP:0000001",
+        "__publications": [{"id": "PMID:0000001"}, {"id": "PMID:0000002"}],
+        "__has_experiment": [{"id": "EXP:0000001"}],
+    }
+    study = stitch_references(document, Study)
+    assert study["publications"] == [
+        {"id": "PMID:0000002"},
+        {"id": "PMID:0000001"},
+        None,
+    ]
+    assert study["has_experiment"] == {"id": "EXP:0000001"}
+    assert "__publications" not in study and "__has_experiment" not in study
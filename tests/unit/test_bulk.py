@@ -0,0 +1,34 @@
+"""
+Test the error reporting of bulk inserts
+"""
+import asyncio
+
+from pymongo.errors import BulkWriteError
+
+from metadata_service.core.bulk import DUPLICATE_ID_MESSAGE, _insert_many
+
+
+class FailingCollection:
+    """A collection whose bulk inserts fail for some documents"""
+
+    async def insert_many(self, documents, ordered=True):
+        """Reject the second document as a duplicate and the third as invalid"""
+        raise BulkWriteError(
+            {
+                "writeErrors": [
+                    {
+                        "index": 1,
+                        "code": 11000,
+                        "errmsg": 'E11000 duplicate key error index: id_1 dup key: { id: "FIL:1" }',
+                    },
+                    {"index": 2, "code": 121, "errmsg": "Document failed validation"},
+                ]
+            }
+        )
+
+
+def test_insert_many_error_messages():
+    """Test that clients get stable messages instead of the raw errors"""
+    documents = [{"id": f"FIL:{i}"} for i in range(3)]
+    errors = asyncio.run(_insert_many(FailingCollection(), documents))
+    assert errors == {1: DUPLICATE_ID_MESSAGE, 2: "The record could not be added"}
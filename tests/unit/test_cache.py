@@ -0,0 +1,51 @@
+"""
+Test the in-process document cache
+"""
+from metadata_service.core.cache import DocumentCache
+
+
+class Clock:
+    """A clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_lru_eviction():
+    """Test that the least recently used entry is evicted first"""
+    cache = DocumentCache(max_size=2, ttl=60)
+    cache.put(("file", "1"), {"id": "1"})
+    cache.put(("file", "2"), {"id": "2"})
+    assert cache.get(("file", "1")) == {"id": "1"}
+    cache.put(("file", "3"), {"id": "3"})
+    assert cache.get(("file", "2")) is None
+    assert cache.get(("file", "1")) == {"id": "1"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_ttl_and_invalidation():
+    """Test that entries expire after the TTL and on invalidation"""
+    clock = Clock()
+    cache = DocumentCache(max_size=10, ttl=5, clock=clock)
+    cache.put(("file", "1"), {"id": "1"})
+    cache.put(("file", "2"), {"id": "2"})
+    clock.now = 4
+    assert cache.get(("file", "1")) is not None
+    cache.invalidate(("file", "1"))
+    assert cache.get(("file", "1")) is None
+    clock.now = 5
+    assert cache.get(("file", "2")) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert (stats["expirations"], stats["invalidations"]) == (1, 1)
+
+
+def test_cache_returns_copies():
+    """Test that changing a returned document does not change the cache"""
+    cache = DocumentCache(max_size=10, ttl=60)
+    cache.put(("file", "1"), {"id": "1", "name": "a"})
+    cache.get(("file", "1"))["name"] = "b"
+    assert cache.get(("file", "1"))["name"] == "a"
@@ -0,0 +1,56 @@
+"""
+Test the watermark of the cache invalidation feed
+"""
+import asyncio
+
+from metadata_service.config import get_config
+from metadata_service.core import changes
+from metadata_service.core.changes import ChangeFeed
+
+
+def test_change_feed_watermark_waits_for_gaps():
+    """Test that the watermark only advances over contiguous changes"""
+    now = [0.0]
+    feed = ChangeFeed(clock=lambda: now[0])
+    feed.seen = {1, 2, 4}
+    feed._advance()  # pylint: disable=protected-access
+    assert feed.watermark == 2
+    assert feed.seen == {4}
+
+    feed.seen.add(3)
+    feed._advance()  # pylint: disable=protected-access
+    assert feed.watermark == 4
+    assert not feed.seen
+
+
+def test_change_feed_watermark_skips_stale_gaps():
+    """Test that a gap that stays open for longer than the TTL is skipped"""
+    now = [0.0]
+    feed = ChangeFeed(clock=lambda: now[0])
+    feed.seen = {3, 4}
+    feed._advance()  # pylint: disable=protected-access
+    assert feed.watermark == 0
+
+    now[0] = get_config().cache_ttl
+    feed._advance()  # pylint: disable=protected-access
+    assert feed.watermark == 4
+    assert not feed.seen
+
+
+def test_change_feed_starts_for_negative_cache(monkeypatch):
+    """Test that the feed also runs if only the negative cache is enabled"""
+    started = []
+
+    async def start(interval):
+        started.append(interval)
+
+    feed = changes._FEED  # pylint: disable=protected-access
+    monkeypatch.setattr(feed, "start", start)
+    config = get_config()
+    monkeypatch.setattr(config, "cache_max_size", 0)
+    asyncio.run(changes.start_change_feed())
+    assert started == [config.changes_poll_interval]
+
+    monkeypatch.setattr(config, "negative_cache_max_size", 0)
+    asyncio.run(changes.start_change_feed())
+    assert len(started) == 1
@@ -0,0 +1,54 @@
+"""
+Test the negotiated response compression
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from metadata_service.core import compression
+from metadata_service.core.compression import CompressionMiddleware, negotiate_encoding
+
+
+@pytest.mark.parametrize(
+    "accept_encoding,expected",
+    [
+        ("", None),
+        ("gzip", "gzip"),
+        ("deflate, gzip;q=0.5", "deflate"),
+        ("gzip, deflate", "gzip"),
+        ("gzip;q=0, identity", None),
+        ("*", "gzip"),
+        ("*, gzip;q=0", "deflate"),
+    ],
+)
+def test_negotiate_encoding(monkeypatch, accept_encoding, expected):
+    """Test choosing a content coding from the Accept-Encoding header"""
+    monkeypatch.setattr(compression, "zstandard", None)
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+def test_compression_middleware_streams():
+    """Test that streamed responses are compressed chunk by chunk and that
+    small responses are sent uncompressed"""
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("x" * 10, headers={"ETag": '"abc"'})
+
+    @app.get("/stream")
+    async def stream():
+        chunks = (f"line {i}\n".encode() for i in range(1000))
+        return StreamingResponse(chunks, headers={"ETag": '"abc"'})
+
+    client = TestClient(app)
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"abc"'
+
+    response = client.get("/stream", headers={"Accept-Encoding": "deflate"})
+    assert response.headers["content-encoding"] == "deflate"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"abc"'
+    assert response.content == b"".join(f"line {i}\n".encode() for i in range(1000))
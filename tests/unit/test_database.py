@@ -0,0 +1,88 @@
+"""
+Test the generation of document IDs
+"""
+import asyncio
+
+import pytest
+
+from metadata_service.config import get_config
+from metadata_service.database import DBConnect
+
+
+class CounterCollection:
+    """An in-memory counter collection that yields to other tasks on every
+    update, like a round trip to the metadata store"""
+
+    def __init__(self):
+        self.values = {}
+        self.updates = 0
+
+    async def find_one_and_update(self, query, update, **kwargs):
+        """Increment a counter atomically"""
+        await asyncio.sleep(0)
+        key = query["_id"]
+        value = self.values[key] = self.values.get(key, 0) + update["$inc"]["value"]
+        self.updates += 1
+        await asyncio.sleep(0)
+        return {"_id": key, "value": value}
+
+
+@pytest.fixture
+def counter(monkeypatch):
+    """Serve the counter from memory and reset the ID blocks"""
+    collection = CounterCollection()
+
+    async def get_collection(self, collection_name):
+        return collection
+
+    monkeypatch.setattr(DBConnect, "get_collection", get_collection)
+    monkeypatch.setattr(DBConnect, "_id_blocks", {})
+    monkeypatch.setattr(DBConnect, "_id_locks", {})
+    return collection
+
+
+@pytest.mark.parametrize("block_size", [1, 4])
+def test_concurrent_ids_are_unique_and_contiguous(counter, monkeypatch, block_size):
+    """Test that concurrent calls never hand out the same ID"""
+    monkeypatch.setattr(get_config(), "id_block_size", block_size)
+
+    async def main():
+        db_connect = DBConnect()
+        return await asyncio.gather(
+            *(db_connect.get_next_id("dataset", "DAT") for _ in range(10))
+        )
+
+    ids = asyncio.run(main())
+    assert sorted(ids) == [f"DAT:{i:07}" for i in range(1, 11)]
+    assert counter.updates == (10 if block_size == 1 else 3)
+
+
+def test_id_block_refill(counter, monkeypatch):
+    """Test that a new block is reserved once the current one is exhausted"""
+    monkeypatch.setattr(get_config(), "id_block_size", 3)
+
+    async def main():
+        db_connect = DBConnect()
+        ids = [await db_connect.get_next_id("file", "FIL") for _ in range(3)]
+        assert counter.updates == 1
+        ids.append(await db_connect.get_next_id("file", "FIL"))
+        assert counter.updates == 2
+        return ids
+
+    assert asyncio.run(main()) == [f"FIL:{i:07}" for i in range(1, 5)]
+    assert counter.values["file"] == 6
+
+
+def test_reserve_ids_matches_counter(counter):
+    """Test that a reserved range ends at the new counter value"""
+
+    async def main():
+        db_connect = DBConnect()
+        first = await db_connect.reserve_ids("study", 5)
+        second = await db_connect.reserve_ids("study", 2)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == range(1, 6)
+    assert second == range(6, 8)
+    assert counter.values["study"] == second[-1]
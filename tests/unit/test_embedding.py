@@ -0,0 +1,204 @@
+"""
+Test embedding of references
+"""
+import asyncio
+from typing import Optional, Set
+
+import pytest
+from fastapi.exceptions import HTTPException
+from pydantic import BaseModel
+
+from metadata_service.config import get_config
+from metadata_service.core import utils
+from metadata_service.core.cache import get_cache, invalidate, mark_missing
+from metadata_service.core.utils import embed_documents, resolve_embed_paths
+from metadata_service.database import DBConnect
+from metadata_service.models import Dataset
+
+
+class Node(BaseModel):
+    """
+    A model that references itself
+    """
+
+    __references__: Set = set()
+    __collection__: str = "node"
+    id: Optional[str] = None
+    parent: Optional[str] = None
+
+
+Node.__references__ = {("parent", Node)}
+
+
+def mock_store(monkeypatch, store):
+    """Serve references from ``store`` and record every queried ID"""
+    queried = []
+
+    async def get_references(document_ids, collection_name, use_cache=True):
+        document_ids = list(document_ids)
+        queried.extend(document_ids)
+        return {i: store[i] for i in document_ids if i in store}
+
+    monkeypatch.setattr(utils, "_get_references", get_references)
+    return queried
+
+
+def test_embed_cyclic_references(monkeypatch):
+    """Test that cyclic references terminate and are left as IDs"""
+    store = {
+        "N:1": {"id": "N:1", "parent": "N:2"},
+        "N:2": {"id": "N:2", "parent": "N:1"},
+    }
+    queried = mock_store(monkeypatch, store)
+    document = dict(store["N:1"])
+    asyncio.run(embed_documents([document], Node))
+    assert document["parent"]["id"] == "N:2"
+    assert document["parent"]["parent"] == "N:1"
+    assert queried == ["N:2"]
+
+
+def test_embed_shared_references(monkeypatch):
+    """Test that a document referenced many times is fetched and embedded once"""
+    store = {"N:0": {"id": "N:0", "parent": None}}
+    queried = mock_store(monkeypatch, store)
+    documents = [{"id": f"N:{i}", "parent": "N:0"} for i in range(1, 100)]
+    asyncio.run(embed_documents(documents, Node))
+    assert queried == ["N:0"]
+    assert all(doc["parent"] is documents[0]["parent"] for doc in documents)
+
+
+def test_resolve_embed_paths():
+    """Test parsing of dotted reference paths into a tree of fields"""
+    paths = resolve_embed_paths(
+        Dataset, "has_study, has_data_access_policy.has_data_access_committee"
+    )
+    assert paths == {
+        "has_study": {},
+        "has_data_access_policy": {"has_data_access_committee": {}},
+    }
+    assert resolve_embed_paths(Dataset, None) is None
+    with pytest.raises(HTTPException):
+        resolve_embed_paths(Dataset, "has_study.files")
+
+
+DATASET_STORE = {
+    "dataset": {
+        "DAT:1": {
+            "id": "DAT:1",
+            "files": [f"FIL:{i}" for i in range(5)],
+            "has_study": "STU:1",
+            "has_data_access_policy": "DAP:1",
+        }
+    },
+    "file": {f"FIL:{i}": {"id": f"FIL:{i}"} for i in range(5)},
+    "study": {"STU:1": {"id": "STU:1", "has_experiment": "EXP:1"}},
+    "experiment": {"EXP:1": {"id": "EXP:1"}},
+    "data_access_policy": {
+        "DAP:1": {"id": "DAP:1", "has_data_access_committee": "DAC:1"}
+    },
+    "data_access_committee": {"DAC:1": {"id": "DAC:1"}},
+}
+
+
+def mock_collections(monkeypatch, store):
+    """Serve references from the collections in ``store``, taking a round trip
+    per query, and record every query"""
+    queries = []
+
+    async def get_references(document_ids, collection_name, use_cache=True):
+        queries.append((collection_name, sorted(document_ids)))
+        await asyncio.sleep(0.01)
+        docs = store[collection_name]
+        return {i: dict(docs[i]) for i in document_ids if i in docs}
+
+    monkeypatch.setattr(utils, "_get_references", get_references)
+    return queries
+
+
+def test_embed_one_query_per_collection_and_level(monkeypatch):
+    """Test that all files of a dataset are fetched with one query and every
+    referenced collection is queried once"""
+    queries = mock_collections(monkeypatch, DATASET_STORE)
+    document = dict(DATASET_STORE["dataset"]["DAT:1"])
+    asyncio.run(embed_documents([document], Dataset))
+
+    assert sorted(collection for collection, _ in queries) == [
+        "data_access_committee",
+        "data_access_policy",
+        "experiment",
+        "file",
+        "study",
+    ]
+    assert ("file", [f"FIL:{i}" for i in range(5)]) in queries
+    assert [f["id"] for f in document["files"]] == [f"FIL:{i}" for i in range(5)]
+    assert document["has_study"]["has_experiment"]["id"] == "EXP:1"
+
+
+def test_embed_sibling_fields_concurrently(monkeypatch):
+    """Test that the sibling reference fields of a dataset are fetched at the
+    same time, bounded by ``embed_concurrency``"""
+    mock_collections(monkeypatch, DATASET_STORE)
+    fetch = utils._get_references
+    in_flight = {"now": 0, "max": 0}
+
+    async def get_references(document_ids, collection_name, use_cache=True):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        try:
+            return await fetch(document_ids, collection_name, use_cache)
+        finally:
+            in_flight["now"] -= 1
+
+    monkeypatch.setattr(utils, "_get_references", get_references)
+    asyncio.run(embed_documents([dict(DATASET_STORE["dataset"]["DAT:1"])], Dataset))
+    assert in_flight["max"] == 3
+
+    monkeypatch.setattr(get_config(), "embed_concurrency", 1)
+    in_flight["max"] = 0
+    asyncio.run(embed_documents([dict(DATASET_STORE["dataset"]["DAT:1"])], Dataset))
+    assert in_flight["max"] == 1
+
+
+class StudyCollection:
+    """A study collection that is ahead of the caches of this worker"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection):
+        """Find the documents with the queried IDs"""
+        docs = [dict(doc) for doc in self.docs if doc["id"] in query["id"]["$in"]]
+
+        class Cursor:  # pylint: disable=too-few-public-methods
+            """A cursor over the found documents"""
+
+            async def to_list(self, length):
+                """Return all found documents"""
+                return docs
+
+        return Cursor()
+
+
+def test_get_references_without_cache(monkeypatch):
+    """Test that reads whose result is persisted bypass the stale caches"""
+    collection = StudyCollection(
+        [{"id": "STU:9", "title": "Fresh"}, {"id": "STU:8", "title": "New"}]
+    )
+
+    async def get_collection(self, collection_name):
+        return collection
+
+    monkeypatch.setattr(DBConnect, "get_collection", get_collection)
+    get_cache().put(("study", "STU:9"), {"id": "STU:9", "title": "Stale"})
+    mark_missing("study", "STU:8")
+    try:
+        cached = asyncio.run(utils._get_references(["STU:9", "STU:8"], "study"))
+        assert cached == {"STU:9": {"id": "STU:9", "title": "Stale"}}
+        fresh = asyncio.run(
+            utils._get_references(["STU:9", "STU:8"], "study", use_cache=False)
+        )
+        assert fresh["STU:9"]["title"] == "Fresh"
+        assert fresh["STU:8"]["title"] == "New"
+    finally:
+        invalidate("study", "STU:9")
+        invalidate("study", "STU:8")
@@ -0,0 +1,43 @@
+"""
+Test the indexes that serve the filters of list endpoints
+"""
+import pytest
+
+from metadata_service.core.indexes import (
+    expected_indexes,
+    filter_index_keys,
+    reference_index_keys,
+)
+from metadata_service.core.retrieval import filter_query
+from metadata_service.models import Dataset, File, Study
+
+
+def test_filter_index_keys():
+    """Test that every filter field is indexed together with the ID"""
+    assert filter_index_keys(File) == [
+        [("category", 1), ("id", 1)],
+        [("format", 1), ("id", 1)],
+        [("type", 1), ("id", 1)],
+    ]
+
+
+def test_filter_query():
+    """Test translating filter values into a query"""
+    assert filter_query(File, {"format": "bam", "category": None}) == {"format": "bam"}
+    with pytest.raises(ValueError):
+        filter_query(File, {"name": "x"})
+
+
+def test_reference_index_keys():
+    """Test that reference fields not covered by a filter index are indexed"""
+    assert reference_index_keys(Dataset) == [[("files", 1)]]
+    assert reference_index_keys(Study) == [[("publications", 1)]]
+
+
+def test_expected_indexes():
+    """Test that every collection gets a unique index on the ID"""
+    indexes = expected_indexes([File])
+    assert set(indexes) == {"file", "changes"}
+    id_index = indexes["file"][0].document
+    assert list(id_index["key"].items()) == [("id", 1)]
+    assert id_index["unique"] is True
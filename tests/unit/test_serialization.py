@@ -0,0 +1,28 @@
+"""
+Test the serialization of documents on the trusted read path
+"""
+import datetime
+import json
+from metadata_service.core import serialization
+
+
+def test_dumps_with_and_without_orjson(monkeypatch):
+    """Test that both encoders produce the same JSON"""
+    document = {
+        "id": "DAT:0000001",
+        "title": "Dataset Ä",
+        "files": [{"id": "FIL:0000001"}, "FIL:0000002"],
+        "at": datetime.datetime(2021, 6, 1, 12, 0),
+    }
+    expected = {**document, "at": "2021-06-01T12:00:00"}
+    assert json.loads(serialization.dumps(document)) == expected
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert json.loads(serialization.dumps(document)) == expected
+
+
+def test_trusted_response_strips_ids():
+    """Test that ObjectIds are removed from trusted responses"""
+    response = serialization.trusted_response(
+        [{"_id": "x", "id": "DAT:0000001"}], serialization.JSONResponse()
+    )
+    assert json.loads(response.body) == [{"id": "DAT:0000001"}]
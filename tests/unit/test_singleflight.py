@@ -0,0 +1,51 @@
+"""
+Test coalescing of concurrent identical reads
+"""
+import asyncio
+
+from metadata_service.core.singleflight import SingleFlight
+
+
+def test_single_flight_shares_calls():
+    """Test that concurrent calls with the same key run once"""
+    calls = []
+
+    async def read(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return {"id": key}
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(
+            *(flight.run(("a",), lambda: read("a")) for _ in range(10)),
+            flight.run(("b",), lambda: read("b")),
+        )
+        assert not flight.calls
+        return results
+
+    results = asyncio.run(main())
+    assert calls == ["a", "b"]
+    assert all(result == {"id": "a"} for result in results[:10])
+    assert results[0] is not results[1]
+
+
+def test_single_flight_forget():
+    """Test that callers after ``forget`` do not join the call in flight"""
+    calls = []
+
+    async def read():
+        calls.append(len(calls))
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.run(("a", 1), read))
+        await asyncio.sleep(0)
+        flight.forget(("a",))
+        second = await flight.run(("a", 1), read)
+        return await first, second
+
+    assert asyncio.run(main()) == (2, 2)
+    assert calls == [0, 1]
@@ -0,0 +1,58 @@
+"""
+Test the bookkeeping of materialized views
+"""
+import asyncio
+
+from metadata_service.config import get_config
+from metadata_service.core import views
+from metadata_service.core.views import reverse_references, view_name
+from metadata_service.models import MODELS, DataAccessPolicy, Dataset, Study
+
+
+def test_reverse_references():
+    """Test that references are inverted from the referenced collection"""
+    referenced_by = reverse_references()
+    assert referenced_by["study"] == [(Dataset, "has_study")]
+    assert referenced_by["data_access_committee"] == [
+        (DataAccessPolicy, "has_data_access_committee")
+    ]
+    assert sorted(
+        (model.__name__, field) for model, field in referenced_by["experiment"]
+    ) == [("Study", "has_experiment")]
+    assert "dataset" not in referenced_by
+    assert sum(len(refs) for refs in referenced_by.values()) == sum(
+        len(model.__references__) for model in MODELS
+    )
+    assert reverse_references([Study])["publication"] == [(Study, "publications")]
+
+
+def test_view_name():
+    """Test the name of the view collection"""
+    assert view_name("dataset") == "dataset_embedded"
+
+
+def test_refresh_views_batch(monkeypatch):
+    """Test that the views of many changed documents are refreshed with one
+    query per referencing field and level"""
+    queried = []
+    materialized = []
+
+    async def referencing_documents(collection_name, document_ids, referenced_by):
+        queried.append((collection_name, sorted(document_ids)))
+        parents = {"FIL:1": "DAT:1", "FIL:2": "DAT:1", "FIL:3": "DAT:2"}
+        if collection_name != "file":
+            return []
+        return [("dataset", parents[document_id]) for document_id in document_ids]
+
+    async def materialize(document_ids, document_type):
+        materialized.append((document_type, sorted(document_ids)))
+
+    monkeypatch.setattr(get_config(), "materialized_views", ["dataset"])
+    monkeypatch.setattr(views, "_referencing_documents", referencing_documents)
+    monkeypatch.setattr(views, "materialize", materialize)
+    asyncio.run(views.refresh_views("file", ["FIL:1", "FIL:2", "FIL:3"]))
+    assert queried == [
+        ("file", ["FIL:1", "FIL:2", "FIL:3"]),
+        ("dataset", ["DAT:1", "DAT:2"]),
+    ]
+    assert materialized == [(Dataset, ["DAT:1", "DAT:2"])]